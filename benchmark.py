@@ -0,0 +1,169 @@
+"""Benchmarks dos caminhos críticos da Lanchonete em várias escalas de dados.
+
+Gera (e reaproveita) arquivos sintéticos com gerar_dados.py e mede carregar/salvar,
+criação de pedidos, mudança de status e relatórios. Os resultados podem ser gravados
+em JSON e comparados com uma execução anterior.
+
+Exemplos:
+    python benchmark.py --escalas 1000,10000,100000
+    python benchmark.py --escalas 10000 --saida antes.json
+    python benchmark.py --escalas 10000 --comparar antes.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from gerar_dados import VERSAO_FORMATO, gerar_arquivo
+from lanchonete import Lanchonete
+
+PASTA_CACHE = os.path.join(tempfile.gettempdir(), "lanchonete_benchmark")
+
+
+def caminho_dados(pedidos: int, semente: int) -> str:
+    """Arquivo sintético da escala, gerado uma única vez por semente e versão do formato."""
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    produtos = min(5000, max(100, pedidos // 100))
+    clientes = min(50000, max(200, pedidos // 20))
+    caminho = os.path.join(PASTA_CACHE, f"dados_v{VERSAO_FORMATO}_{pedidos}_{produtos}_{clientes}_{semente}.json")
+    if not os.path.exists(caminho):
+        gerar_arquivo(caminho, pedidos, produtos, clientes, semente)
+    return caminho
+
+
+class Contexto:
+    """Instância da Lanchonete sobre uma cópia do arquivo sintético (o original não é alterado)."""
+
+    def __init__(self, origem: str, pasta: str):
+        self.arquivo = os.path.join(pasta, "lanchonete_dados.json")
+        shutil.copyfile(origem, self.arquivo)
+        self.lanchonete = Lanchonete("Benchmark", arquivo_dados=self.arquivo)
+        self.cliente = next(iter(self.lanchonete.clientes))
+        self.produtos = [p.id_produto for p in self.lanchonete.cardapio.values() if p.disponivel and p.estoque >= 50][:3]
+        # Repõe estoque dos produtos usados para que as repetições não esgotem o disponível
+        for id_produto in self.produtos:
+            self.lanchonete.cardapio[id_produto].estoque += 100000
+        self.fim = max((p.data_hora_criacao for p in self.lanchonete.pedidos.values()), default=datetime.now())
+
+    def novo_pedido(self) -> str:
+        _, _, pedido = self.lanchonete.criar_pedido(self.cliente)
+        for id_produto in self.produtos:
+            self.lanchonete.adicionar_item_a_pedido(pedido.id_pedido, id_produto, 1)
+        return pedido.id_pedido
+
+
+# Cada caso: (nome, preparo por repetição (não medido), operação medida)
+def _carregar(ctx):
+    Lanchonete("Benchmark", arquivo_dados=ctx.arquivo)
+
+
+def _status_entregue(ctx, id_pedido):
+    ctx.lanchonete.atualizar_status_pedido(id_pedido, "Entregue")
+
+
+CASOS = [
+    ("carregar_dados", None, _carregar),
+    ("salvar_dados", None, lambda ctx: ctx.lanchonete.salvar_dados()),
+    ("criar_pedido + adicionar_item_a_pedido x3", None, lambda ctx: ctx.novo_pedido()),
+    ("atualizar_status_pedido (Entregue)", lambda ctx: ctx.novo_pedido(), _status_entregue),
+    ("relatorio_total_vendas_por_periodo (tudo)", None,
+     lambda ctx: ctx.lanchonete.relatorio_total_vendas_por_periodo()),
+    ("relatorio_total_vendas_por_periodo (30 dias)", None,
+     lambda ctx: ctx.lanchonete.relatorio_total_vendas_por_periodo(ctx.fim - timedelta(days=30), ctx.fim)),
+    ("relatorio_produtos_mais_vendidos", None, lambda ctx: ctx.lanchonete.relatorio_produtos_mais_vendidos(10)),
+    ("relatorio_pedidos_por_cliente", None, lambda ctx: ctx.lanchonete.relatorio_pedidos_por_cliente(ctx.cliente)),
+    # Mesma consulta pelo caminho que o planejador escolhe e pela varredura completa
+    ("consulta por cliente (índice)", None,
+     lambda ctx: ctx.lanchonete.consulta().onde(id_cliente=ctx.cliente).listar()),
+    ("consulta por cliente (varredura)", None,
+     lambda ctx: ctx.lanchonete.consulta().onde(id_cliente=ctx.cliente).usando("varredura").listar()),
+    ("consulta Entregue 30 dias (índice)", None,
+     lambda ctx: ctx.lanchonete.consulta().onde(status="Entregue", inicio=ctx.fim - timedelta(days=30),
+                                               fim=ctx.fim).somar("valor_centavos")),
+    ("consulta Entregue 30 dias (varredura)", None,
+     lambda ctx: ctx.lanchonete.consulta().onde(status="Entregue", inicio=ctx.fim - timedelta(days=30),
+                                               fim=ctx.fim).usando("varredura").somar("valor_centavos")),
+]
+
+
+def medir(ctx: Contexto, preparo, operacao, repeticoes: int) -> list[float]:
+    tempos = []
+    for _ in range(repeticoes):
+        argumentos = (preparo(ctx),) if preparo else ()
+        inicio = time.perf_counter()
+        operacao(ctx, *argumentos)
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def executar(escalas: list[int], repeticoes: int, semente: int, filtro: str = None) -> list[dict]:
+    resultados = []
+    for pedidos in escalas:
+        origem = caminho_dados(pedidos, semente)
+        with tempfile.TemporaryDirectory() as pasta:
+            ctx = Contexto(origem, pasta)
+            for nome, preparo, operacao in CASOS:
+                if filtro and filtro not in nome:
+                    continue
+                tempos = medir(ctx, preparo, operacao, repeticoes)
+                resultado = {
+                    "escala": pedidos,
+                    "operacao": nome,
+                    "mediana_ms": statistics.median(tempos) * 1000,
+                    "minimo_ms": min(tempos) * 1000,
+                    "maximo_ms": max(tempos) * 1000,
+                    "repeticoes": repeticoes,
+                }
+                resultados.append(resultado)
+                print(f"{pedidos:>9} | {nome:<46} | mediana {resultado['mediana_ms']:>10.2f} ms"
+                      f" | mín {resultado['minimo_ms']:>10.2f} ms", flush=True)
+    return resultados
+
+
+def comparar(resultados: list[dict], caminho_anterior: str):
+    with open(caminho_anterior, 'r', encoding='utf-8') as f:
+        anteriores = {(r["escala"], r["operacao"]): r for r in json.load(f)["resultados"]}
+    print("\nComparação com", caminho_anterior)
+    for r in resultados:
+        anterior = anteriores.get((r["escala"], r["operacao"]))
+        if not anterior:
+            continue
+        razao = r["mediana_ms"] / anterior["mediana_ms"] if anterior["mediana_ms"] else float("inf")
+        print(f"{r['escala']:>9} | {r['operacao']:<46} | {anterior['mediana_ms']:>10.2f} -> {r['mediana_ms']:>10.2f} ms"
+              f" ({razao:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks da Lanchonete.")
+    parser.add_argument("--escalas", default="1000,10000,100000",
+                        help="Quantidades de pedidos separadas por vírgula (ex.: 1000,10000,100000,1000000).")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--filtro", help="Executa só as operações cujo nome contém este texto.")
+    parser.add_argument("--saida", help="Grava os resultados em JSON.")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar.")
+    args = parser.parse_args()
+
+    escalas = [int(e) for e in args.escalas.split(",") if e.strip()]
+    resultados = executar(escalas, args.repeticoes, args.semente, args.filtro)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({
+                "data": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "semente": args.semente,
+                "resultados": resultados,
+            }, f, indent=4, ensure_ascii=False)
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
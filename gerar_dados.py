@@ -0,0 +1,126 @@
+"""Gerador determinístico de dados sintéticos compatíveis com lanchonete_dados.json.
+
+Exemplo:
+    python gerar_dados.py --pedidos 100000 --produtos 2000 --clientes 5000 --saida dados_100k.json
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+
+from lanchonete import formatar_id_pedido
+
+# Muda sempre que o formato gerado muda (2: valores em centavos); entra no nome dos arquivos em cache
+VERSAO_FORMATO = 2
+
+NOMES_PRODUTO = ["X-Burguer", "X-Salada", "X-Bacon", "Misto Quente", "Hot Dog", "Pastel", "Coxinha",
+                 "Refrigerante", "Suco Natural", "Água", "Batata Frita", "Açaí", "Milkshake", "Café", "Pão de Queijo"]
+ESTACOES = ["Chapa", "Fritadeira", "Bebidas", "Sobremesas"]
+NOMES_CLIENTE = ["Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+                 "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Thiago", "Vitória", "William"]
+SOBRENOMES = ["Silva", "Souza", "Oliveira", "Santos", "Pereira", "Lima", "Costa", "Gomes", "Ribeiro", "Almeida"]
+
+# Pedidos antigos já foram entregues ou cancelados; só os mais recentes ainda estão em andamento
+PESOS_STATUS_HISTORICO = {"Entregue": 95, "Cancelado": 5}
+PESOS_STATUS_RECENTE = {"Pendente": 30, "Em Preparo": 20, "Pronto": 10, "Entregue": 35, "Cancelado": 5}
+
+
+def gerar_produtos(rng: random.Random, quantidade: int) -> list[dict]:
+    produtos = []
+    for i in range(1, quantidade + 1):
+        produtos.append({
+            "id_produto": f"P{i:06d}",
+            "nome": f"{rng.choice(NOMES_PRODUTO)} {i}",
+            "preco_centavos": rng.randint(250, 6000),
+            "disponivel": rng.random() > 0.05,
+            "estoque": rng.randint(0, 500),
+            "estacao": rng.choice(ESTACOES),
+        })
+    return produtos
+
+
+def gerar_clientes(rng: random.Random, quantidade: int) -> list[dict]:
+    clientes = []
+    for i in range(1, quantidade + 1):
+        clientes.append({
+            "id_cliente": f"C{i:07d}",
+            "nome": f"{rng.choice(NOMES_CLIENTE)} {rng.choice(SOBRENOMES)}",
+            "telefone": f"{rng.randint(11, 99)}9{rng.randint(10000000, 99999999)}",
+            "endereco": f"Rua {rng.choice(SOBRENOMES)}, {rng.randint(1, 2000)}",
+        })
+    return clientes
+
+
+def gerar_pedidos(rng: random.Random, quantidade: int, produtos: list[dict], clientes: list[dict],
+                  inicio: datetime, fim: datetime):
+    """Gera pedidos em ordem cronológica, sem manter todos em memória."""
+    precos = [(p["id_produto"], p["preco_centavos"]) for p in produtos]
+    ids_clientes = [c["id_cliente"] for c in clientes]
+    intervalo = (fim - inicio).total_seconds()
+    recente = fim - timedelta(hours=2)
+    status_hist, pesos_hist = list(PESOS_STATUS_HISTORICO), list(PESOS_STATUS_HISTORICO.values())
+    status_rec, pesos_rec = list(PESOS_STATUS_RECENTE), list(PESOS_STATUS_RECENTE.values())
+
+    for numero in range(1, quantidade + 1):
+        data_hora = inicio + timedelta(seconds=intervalo * numero / (quantidade + 1) + rng.uniform(0, 30))
+        if data_hora >= recente:
+            status = rng.choices(status_rec, pesos_rec)[0]
+        else:
+            status = rng.choices(status_hist, pesos_hist)[0]
+
+        itens = []
+        escolhidos = rng.sample(precos, min(len(precos), rng.randint(1, 5)))
+        for id_produto, preco in escolhidos:
+            quantidade_item = rng.randint(1, 4)
+            itens.append({"produto_id": id_produto, "quantidade": quantidade_item,
+                          "subtotal_centavos": preco * quantidade_item})
+
+        yield {
+            "id_pedido": formatar_id_pedido(numero),
+            "id_cliente": rng.choice(ids_clientes),
+            "itens": itens,
+            "status": status,
+            "data_hora_criacao": data_hora.isoformat(),
+            "valor_total_centavos": sum(item["subtotal_centavos"] for item in itens),
+            "prioritario": rng.random() < 0.03,
+        }
+
+
+def gerar_arquivo(caminho: str, pedidos: int, produtos: int, clientes: int, semente: int = 42,
+                  dias: int = 365, fim: datetime = None):
+    """Grava um arquivo de dados completo. A mesma semente sempre produz o mesmo arquivo."""
+    rng = random.Random(semente)
+    fim = fim or datetime(2025, 6, 30, 22, 0, 0)
+    inicio = fim - timedelta(days=dias)
+    lista_produtos = gerar_produtos(rng, produtos)
+    lista_clientes = gerar_clientes(rng, clientes)
+
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write('{\n"cardapio": ')
+        json.dump(lista_produtos, f, ensure_ascii=False)
+        f.write(',\n"clientes": ')
+        json.dump(lista_clientes, f, ensure_ascii=False)
+        f.write(',\n"pedidos": [\n')
+        for i, pedido in enumerate(gerar_pedidos(rng, pedidos, lista_produtos, lista_clientes, inicio, fim)):
+            if i:
+                f.write(',\n')
+            f.write(json.dumps(pedido, ensure_ascii=False))
+        f.write(f'\n],\n"next_pedido_id": {pedidos}\n}}\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos para a Lanchonete.")
+    parser.add_argument("--pedidos", type=int, default=1000)
+    parser.add_argument("--produtos", type=int, default=200)
+    parser.add_argument("--clientes", type=int, default=500)
+    parser.add_argument("--dias", type=int, default=365, help="Período coberto pelo histórico de pedidos.")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default="lanchonete_dados_sinteticos.json")
+    args = parser.parse_args()
+
+    gerar_arquivo(args.saida, args.pedidos, args.produtos, args.clientes, args.semente, args.dias)
+    print(f"{args.pedidos} pedidos, {args.produtos} produtos e {args.clientes} clientes gravados em '{args.saida}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,528 @@
 import tkinter as tk
-from tkinter import messagebox, ttk
+from tkinter import filedialog, messagebox, ttk
+import abc
+import argparse
+import array
+import bisect
+import cProfile
+import csv
+import functools
+import gc
+import gzip
 import json
-from datetime import datetime
+import math
+import mmap
+import operator
+import os
+import pstats
+import queue
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 import re 
+import socket
+import sys
+import heapq
+import itertools
+import threading
+import time
+import tracemalloc
+import unicodedata
+import uuid
+import zlib
+from collections import OrderedDict, deque
+
+try:
+    import numpy as np
+except ImportError: # Opcional: previsão de reposição e verificação de consistência em bloco
+    np = None
+
+# Padrões de validação compilados uma vez e reutilizados nas validações individuais e em lote
+PADRAO_ID = re.compile(r'[a-zA-Z0-9]+')
+PADRAO_TELEFONE = re.compile(r'\d{8,15}')
+PADRAO_ID_PEDIDO = re.compile(r'PED\d+')
+STATUS_VALIDOS = ("Pendente", "Em Preparo", "Pronto", "Entregue", "Cancelado")
+LARGURA_ID_PEDIDO = 8 # Novos IDs: PED00000001. IDs antigos (PED0001) continuam válidos.
+
+
+def centavos(valor) -> int:
+    """Converte um valor em reais (float, texto com vírgula ou ponto, Decimal) para centavos inteiros."""
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        return valor * 100
+    try:
+        reais = Decimal(str(valor).strip().replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"Valor monetário inválido: '{valor}'.")
+    if not reais.is_finite():
+        raise ValueError(f"Valor monetário inválido: '{valor}'.")
+    return int((reais * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def formatar_centavos(valor_centavos: int) -> str:
+    """Texto para a interface: 1250 -> '12.50'."""
+    sinal = "-" if valor_centavos < 0 else ""
+    reais, resto = divmod(abs(valor_centavos), 100)
+    return f"{sinal}{reais}.{resto:02d}"
+
+
+def formatar_id_pedido(numero: int) -> str:
+    return f"PED{numero:0{LARGURA_ID_PEDIDO}d}"
+
+
+def numero_do_id_pedido(id_pedido: str) -> int:
+    """Extrai a parte numérica de um ID de pedido (aceita PED0001 e PED00000001)."""
+    digitos = re.search(r'\d+$', id_pedido)
+    return int(digitos.group()) if digitos else 0
+
+
+_ESPACO_JSON = re.compile(r'[ \t\n\r]*')
+
+
+def ler_json_em_partes(caminho: str):
+    """Lê um documento JSON decodificando listas e objetos de fora para dentro, um elemento por vez.
+
+    Um json.load do arquivo inteiro é uma única chamada em C que segura o GIL: lido numa thread
+    de trabalho, o histórico grande pararia a thread da interface até o fim. Em partes, as threads
+    se revezam entre um elemento e outro. Listas são divididas até o terceiro nível (ex.: as
+    entradas do feed) e objetos até o segundo; cada pedido é decodificado de uma vez.
+    """
+    with open(caminho, 'r', encoding='utf-8') as f:
+        texto = "".join(iter(lambda: f.read(1 << 20), ""))
+    # Sem coletas durante a leitura: cada coleta completa percorreria tudo o que já foi lido, parando
+    # as duas threads. No fim, o que foi lido vai para a geração permanente, fora das próximas coletas.
+    gc.disable()
+    try:
+        return _decodificar_em_partes(texto)
+    finally:
+        gc.freeze()
+        gc.enable()
+
+
+def _decodificar_em_partes(texto: str):
+    decodificador = json.JSONDecoder()
+
+    def simbolo(pos: int, esperados: tuple) -> tuple[str, int]:
+        pos = _ESPACO_JSON.match(texto, pos).end()
+        if texto[pos:pos + 1] not in esperados:
+            raise json.JSONDecodeError(f"Esperado {' ou '.join(map(repr, esperados))}", texto, pos)
+        return texto[pos], pos + 1
+
+    def valor(pos: int, nivel: int):
+        pos = _ESPACO_JSON.match(texto, pos).end()
+        inicio = texto[pos:pos + 1]
+        if not ((inicio == "[" and nivel < 3) or (inicio == "{" and nivel < 2)):
+            return decodificador.raw_decode(texto, pos)
+        lista, fim = inicio == "[", "]" if inicio == "[" else "}"
+        resultado = [] if lista else {}
+        pos = _ESPACO_JSON.match(texto, pos + 1).end()
+        if texto.startswith(fim, pos):
+            return resultado, pos + 1
+        while True:
+            if lista:
+                elemento, pos = valor(pos, nivel + 1)
+                resultado.append(elemento)
+            else:
+                chave, pos = valor(pos, 3)
+                if not isinstance(chave, str):
+                    raise json.JSONDecodeError("Chave de objeto deve ser texto", texto, pos)
+                _, pos = simbolo(pos, (":",))
+                resultado[chave], pos = valor(pos, nivel + 1)
+            separador, pos = simbolo(pos, (",", fim))
+            if separador == fim:
+                return resultado, pos
+
+    dados, pos = valor(0, 0)
+    if _ESPACO_JSON.match(texto, pos).end() != len(texto):
+        raise json.JSONDecodeError("Extra data", texto, pos)
+    return dados
+
+
+# --- Alocação de IDs de Pedido ---
+class AlocadorIdsPedido(abc.ABC):
+    """Interface dos alocadores de números de pedido.
+
+    proximo() devolve um número nunca usado por este alocador; observar() informa
+    números já existentes (ex.: lidos do arquivo) para que não sejam reutilizados.
+    """
+    @abc.abstractmethod
+    def proximo(self) -> int:
+        ...
+
+    @abc.abstractmethod
+    def observar(self, numero: int):
+        ...
+
+    @abc.abstractmethod
+    def ultimo(self) -> int:
+        ...
+
+
+class AlocadorSequencial(AlocadorIdsPedido):
+    """Contador local e seguro entre threads, para um único terminal."""
+    def __init__(self, inicio: int = 0):
+        self._trava = threading.Lock()
+        self._atual = inicio
+
+    def proximo(self) -> int:
+        with self._trava:
+            self._atual += 1
+            return self._atual
+
+    def observar(self, numero: int):
+        with self._trava:
+            if numero > self._atual:
+                self._atual = numero
+
+    def ultimo(self) -> int:
+        return self._atual
+
+
+class ArquivoConcessoes:
+    """Contador compartilhado entre terminais, guardado num arquivo JSON.
+
+    Só é acessado para conceder um bloco inteiro de números. O acesso é serializado
+    por um arquivo de trava criado de forma atômica.
+    """
+    ESPERA_TRAVA = 10.0 # segundos até considerar uma trava abandonada
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.caminho_trava = caminho + ".lock"
+
+    def _adquirir_trava(self):
+        inicio = time.monotonic()
+        while True:
+            try:
+                fd = os.open(self.caminho_trava, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.caminho_trava) > self.ESPERA_TRAVA:
+                        os.remove(self.caminho_trava)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() - inicio > self.ESPERA_TRAVA * 2:
+                    raise TimeoutError(f"Não foi possível obter a trava '{self.caminho_trava}'.")
+                time.sleep(0.01)
+
+    def conceder(self, tamanho: int, minimo: int = 1) -> tuple[int, int]:
+        """Reserva o intervalo [inicio, fim) de números para o chamador."""
+        self._adquirir_trava()
+        try:
+            try:
+                with open(self.caminho, 'r', encoding='utf-8') as f:
+                    proximo = json.load(f).get("proximo", 1)
+            except (FileNotFoundError, json.JSONDecodeError):
+                proximo = 1
+            inicio = max(proximo, minimo)
+            fim = inicio + tamanho
+            temporario = self.caminho + ".tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump({"proximo": fim}, f)
+            os.replace(temporario, self.caminho)
+            return inicio, fim
+        finally:
+            os.remove(self.caminho_trava)
+
+
+class AlocadorPorBlocos(AlocadorIdsPedido):
+    """Aloca números localmente a partir de blocos concedidos por um ArquivoConcessoes.
+
+    Cada terminal só coordena com os demais ao esgotar o bloco, de modo que IDs nunca
+    colidem entre terminais e crescem monotonicamente dentro de cada terminal.
+    """
+    def __init__(self, concessoes: ArquivoConcessoes, tamanho_bloco: int = 100):
+        self.concessoes = concessoes
+        self.tamanho_bloco = tamanho_bloco
+        self._trava = threading.Lock()
+        self._proximo = 0
+        self._fim = 0
+        self._maior_observado = 0
+
+    def proximo(self) -> int:
+        with self._trava:
+            if self._proximo >= self._fim:
+                self._proximo, self._fim = self.concessoes.conceder(self.tamanho_bloco, self._maior_observado + 1)
+            numero = self._proximo
+            self._proximo += 1
+            return numero
+
+    def observar(self, numero: int):
+        with self._trava:
+            if numero > self._maior_observado:
+                self._maior_observado = numero
+            if self._proximo <= numero < self._fim:
+                self._proximo = numero + 1
+
+    def ultimo(self) -> int:
+        return max(self._proximo - 1, self._maior_observado)
+
+
+# --- Instrumentação ---
+class Metricas:
+    """Contagem de chamadas e latências recentes por operação.
+
+    As últimas amostras de cada operação ficam num buffer circular, do qual saem os
+    percentis (p50/p95/p99) e o histograma por faixas. Desativada, a instrumentação
+    custa só a verificação de `ativo`.
+    """
+    TAMANHO_BUFFER = 2048
+    FAIXAS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self, ativo: bool = True):
+        self.ativo = ativo
+        self._trava = threading.Lock()
+        self._amostras = {}
+        self._chamadas = {}
+        self._total = {}
+
+    def registrar(self, nome: str, duracao: float):
+        with self._trava:
+            amostras = self._amostras.get(nome)
+            if amostras is None:
+                amostras = self._amostras[nome] = deque(maxlen=self.TAMANHO_BUFFER)
+            amostras.append(duracao)
+            self._chamadas[nome] = self._chamadas.get(nome, 0) + 1
+            self._total[nome] = self._total.get(nome, 0.0) + duracao
+
+    def limpar(self):
+        with self._trava:
+            self._amostras.clear()
+            self._chamadas.clear()
+            self._total.clear()
+
+    @staticmethod
+    def _percentil(ordenadas: list, fracao: float) -> float:
+        indice = max(0, math.ceil(fracao * len(ordenadas)) - 1)
+        return ordenadas[indice]
+
+    def histograma(self, nome: str) -> list[tuple[str, int]]:
+        with self._trava:
+            amostras = list(self._amostras.get(nome, ()))
+        contagem = [0] * (len(self.FAIXAS_MS) + 1)
+        for duracao in amostras:
+            ms = duracao * 1000
+            for i, limite in enumerate(self.FAIXAS_MS):
+                if ms <= limite:
+                    contagem[i] += 1
+                    break
+            else:
+                contagem[-1] += 1
+        rotulos = [f"<= {limite} ms" for limite in self.FAIXAS_MS] + [f"> {self.FAIXAS_MS[-1]} ms"]
+        return list(zip(rotulos, contagem))
+
+    def resumo(self) -> list[dict]:
+        with self._trava:
+            copias = {nome: sorted(amostras) for nome, amostras in self._amostras.items()}
+            chamadas = dict(self._chamadas)
+            total = dict(self._total)
+        resultado = []
+        for nome, ordenadas in copias.items():
+            if not ordenadas:
+                continue
+            resultado.append({
+                "operacao": nome,
+                "chamadas": chamadas[nome],
+                "total_ms": total[nome] * 1000,
+                "p50_ms": self._percentil(ordenadas, 0.50) * 1000,
+                "p95_ms": self._percentil(ordenadas, 0.95) * 1000,
+                "p99_ms": self._percentil(ordenadas, 0.99) * 1000,
+                "max_ms": ordenadas[-1] * 1000,
+            })
+        resultado.sort(key=lambda r: r["total_ms"], reverse=True)
+        return resultado
+
+    def gravar(self, caminho: str):
+        dados = {
+            "gerado_em": datetime.now().isoformat(),
+            "operacoes": self.resumo(),
+            "histogramas": {nome: self.histograma(nome) for nome in list(self._amostras)},
+        }
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, indent=4, ensure_ascii=False)
+
+
+METRICAS = Metricas(ativo=os.environ.get("LANCHONETE_METRICAS", "1") != "0")
+
+
+def instrumentado(funcao):
+    """Mede a duração de cada chamada em METRICAS (nome: Classe.metodo)."""
+    nome = funcao.__qualname__
+
+    @functools.wraps(funcao)
+    def medida(*args, **kwargs):
+        if not METRICAS.ativo:
+            return funcao(*args, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            METRICAS.registrar(nome, time.perf_counter() - inicio)
+    return medida
+
+
+class SessaoPerfil:
+    """Perfil opcional de uma sessão da interface (cProfile e, se pedido, tracemalloc).
+
+    O perfil cobre a sessão inteira, da criação da janela ao fechamento. Os callbacks
+    escolhidos são medidos um a um e, com memória ativada, cada chamada registra as
+    linhas que mais alocaram. Ao final são gravados em `pasta`:
+    sessao_<data>.prof (abrir com pstats ou snakeviz), sessao_<data>.txt (resumo) e,
+    com memória, sessao_<data>.tracemalloc (tracemalloc.Snapshot.load).
+    """
+    CALLBACKS = ("finalizar_venda_pdv", "on_tab_change", "adicionar_item_ao_carrinho_pdv",
+                 "atualizar_status_pedido_gui", "gerar_relatorio_vendas_gui",
+                 "gerar_relatorio_top_produtos_gui", "gerar_relatorio_pedidos_cliente_gui")
+    MAX_REGISTROS_MEMORIA = 20 # por callback, os mais recentes
+
+    def __init__(self, pasta: str = "perfis", memoria: bool = False):
+        self.pasta = pasta
+        self.memoria = memoria
+        self.id_sessao = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.perfil = cProfile.Profile()
+        self._callbacks = {} # nome -> [chamadas, tempo total, maior tempo]
+        self._alocacoes = {} # nome -> deque de (instante, linhas de maior alocação)
+
+    def envolver(self, classe, nomes=CALLBACKS):
+        """Substitui os métodos da classe por versões medidas (antes de instanciar a interface)."""
+        for nome in nomes:
+            setattr(classe, nome, self._medir_callback(nome, getattr(classe, nome)))
+
+    def _medir_callback(self, nome: str, funcao):
+        @functools.wraps(funcao)
+        def medido(*args, **kwargs):
+            antes = tracemalloc.take_snapshot() if self.memoria and tracemalloc.is_tracing() else None
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                duracao = time.perf_counter() - inicio
+                registro = self._callbacks.setdefault(nome, [0, 0.0, 0.0])
+                registro[0] += 1
+                registro[1] += duracao
+                registro[2] = max(registro[2], duracao)
+                if antes is not None:
+                    diferencas = tracemalloc.take_snapshot().compare_to(antes, "lineno")[:10]
+                    self._alocacoes.setdefault(nome, deque(maxlen=self.MAX_REGISTROS_MEMORIA)).append(
+                        (datetime.now().strftime("%H:%M:%S"), [str(d) for d in diferencas]))
+        return medido
+
+    def __enter__(self):
+        if self.memoria:
+            tracemalloc.start(25)
+        self.perfil.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.perfil.disable()
+        self.gravar()
+        if self.memoria:
+            tracemalloc.stop()
+        return False
+
+    def gravar(self):
+        os.makedirs(self.pasta, exist_ok=True)
+        base = os.path.join(self.pasta, f"sessao_{self.id_sessao}")
+        self.perfil.dump_stats(base + ".prof")
+
+        with open(base + ".txt", 'w', encoding='utf-8') as f:
+            f.write(f"Sessão {self.id_sessao}\n\n--- Callbacks medidos ---\n")
+            for nome, (chamadas, total, maior) in sorted(self._callbacks.items(), key=lambda r: r[1][1], reverse=True):
+                f.write(f"{nome}: {chamadas} chamada(s), total {total * 1000:.1f} ms, "
+                        f"média {total / chamadas * 1000:.1f} ms, maior {maior * 1000:.1f} ms\n")
+
+            f.write("\n--- Funções por tempo acumulado (top 40) ---\n")
+            estatisticas = pstats.Stats(self.perfil, stream=f)
+            estatisticas.sort_stats("cumulative").print_stats(40)
+
+            if self._callbacks:
+                f.write("\n--- Chamadas feitas pelos callbacks medidos ---\n")
+                estatisticas.print_callees("|".join(self._callbacks))
+
+            if self._alocacoes:
+                f.write("\n--- Maiores alocações por chamada de callback ---\n")
+                for nome, registros in self._alocacoes.items():
+                    for instante, linhas in registros:
+                        f.write(f"{nome} às {instante}:\n")
+                        for linha in linhas:
+                            f.write(f"    {linha}\n")
+
+        if self.memoria and tracemalloc.is_tracing():
+            tracemalloc.take_snapshot().dump(base + ".tracemalloc")
+        print(f"Perfil da sessão gravado em '{base}.*'.")
+
 
 # --- Classes de Modelo (Produto, ItemPedido, Pedido, Cliente, Lanchonete) ---
 
 class Produto:
-    def __init__(self, id_produto: str, nome: str, preco: float, disponivel: bool = True, estoque: int = 0):
+    def __init__(self, id_produto: str, nome: str, preco_centavos: int, disponivel: bool = True, estoque: int = 0,
+                 estacao: str = "Cozinha", estoque_minimo: int = 0):
         self.id_produto = id_produto
         self.nome = nome
-        self.preco = preco
+        self.preco_centavos = preco_centavos # Dinheiro sempre em centavos inteiros; formatado só na interface
         self.disponivel = disponivel
         self.estoque = estoque
+        self.estacao = estacao # Estação da cozinha que prepara o produto
+        self.estoque_minimo = estoque_minimo # Ponto de reposição: alerta quando estoque <= estoque_minimo
 
     def __str__(self):
         status = "Disponível" if self.disponivel else "Indisponível"
-        return f"Produto: {self.nome} (ID: {self.id_produto}) - R${self.preco:.2f} - Estoque: {self.estoque} - Status: {status}"
+        return f"Produto: {self.nome} (ID: {self.id_produto}) - R${formatar_centavos(self.preco_centavos)} - Estoque: {self.estoque} - Status: {status}"
 
     def atualizar_disponibilidade(self, disponivel: bool):
         self.disponivel = disponivel
 
-    def atualizar_info(self, nome: str = None, preco: float = None, estoque: int = None):
+    def atualizar_info(self, nome: str = None, preco_centavos: int = None, estoque: int = None, estacao: str = None,
+                       estoque_minimo: int = None):
         if nome:
             self.nome = nome
-        if preco is not None:
-            self.preco = preco
+        if preco_centavos is not None:
+            self.preco_centavos = preco_centavos
         if estoque is not None:
             self.estoque = estoque
+        if estacao:
+            self.estacao = estacao
+        if estoque_minimo is not None:
+            self.estoque_minimo = estoque_minimo
         return True
 
     def to_dict(self):
         return {
             "id_produto": self.id_produto,
             "nome": self.nome,
-            "preco": self.preco,
+            "preco_centavos": self.preco_centavos,
             "disponivel": self.disponivel,
-            "estoque": self.estoque
+            "estoque": self.estoque,
+            "estacao": self.estacao,
+            "estoque_minimo": self.estoque_minimo
         }
 
     @classmethod
     def from_dict(cls, data: dict):
-        return cls(data["id_produto"], data["nome"], data["preco"], data["disponivel"], data.get("estoque", 0))
+        # Arquivos antigos gravavam "preco" em reais (float)
+        preco_centavos = data["preco_centavos"] if "preco_centavos" in data else centavos(data["preco"])
+        return cls(data["id_produto"], data["nome"], preco_centavos, data["disponivel"], data.get("estoque", 0),
+                   data.get("estacao", "Cozinha"), data.get("estoque_minimo", 0))
 
 class ItemPedido:
-    def __init__(self, produto: Produto, quantidade: int):
+    def __init__(self, produto: Produto, quantidade: int, subtotal_centavos: int = None):
         if quantidade <= 0:
             raise ValueError("A quantidade do item deve ser maior que zero.")
         self.produto = produto
         self.quantidade = quantidade
-        self.subtotal = produto.preco * quantidade
+        # Subtotal gravado vale sobre o preço atual (o produto pode ter mudado de preço ou ter tido promoção)
+        self.subtotal_centavos = produto.preco_centavos * quantidade if subtotal_centavos is None else subtotal_centavos
 
     def __str__(self):
-        return f"{self.produto.nome} (x{self.quantidade}) - R${self.subtotal:.2f}"
+        return f"{self.produto.nome} (x{self.quantidade}) - R${formatar_centavos(self.subtotal_centavos)}"
 
     def to_dict(self):
         return {
             "produto_id": self.produto.id_produto,
             "quantidade": self.quantidade,
-            "subtotal": self.subtotal
+            "subtotal_centavos": self.subtotal_centavos
         }
 
     @classmethod
@@ -66,27 +530,38 @@ class ItemPedido:
         produto = cardapio_ref.get(data["produto_id"])
         if not produto:
             raise ValueError(f"Produto com ID {data['produto_id']} não encontrado no cardápio durante carregamento do pedido.")
-        return cls(produto, data["quantidade"])
+        return cls(produto, data["quantidade"], data.get("subtotal_centavos"))
 
 class Pedido:
-    _id_counter = 0
-
-    def __init__(self, id_cliente: str, id_pedido: str = None, status: str = "Pendente",
-                 data_hora_criacao: datetime = None, valor_total: float = 0.0):
-        if id_pedido:
-            self.id_pedido = id_pedido
-            numeric_id = int(id_pedido[3:])
-            if numeric_id >= Pedido._id_counter:
-                Pedido._id_counter = numeric_id
-        else:
-            Pedido._id_counter += 1
-            self.id_pedido = f"PED{Pedido._id_counter:04d}"
-
+    def __init__(self, id_cliente: str, id_pedido: str, status: str = "Pendente",
+                 data_hora_criacao: datetime = None, valor_total_centavos: int = 0, prioritario: bool = False):
+        self.id_pedido = id_pedido # Novos IDs vêm do alocador da Lanchonete (Lanchonete.criar_pedido)
         self.id_cliente = id_cliente
-        self.itens = []
+        self._linhas = {} # id_produto -> ItemPedido, na ordem em que as linhas foram criadas
         self.status = status
         self.data_hora_criacao = data_hora_criacao if data_hora_criacao else datetime.now()
-        self.valor_total = valor_total
+        self.valor_total_centavos = valor_total_centavos
+        self.prioritario = prioritario
+        self.transicoes = () # ((índice em STATUS_VALIDOS, segundos desde a criação), ...)
+
+    @property
+    def itens(self) -> list[ItemPedido]:
+        return list(self._linhas.values())
+
+    @itens.setter
+    def itens(self, itens):
+        """Substitui todas as linhas; itens repetidos do mesmo produto são somados numa linha só."""
+        self._linhas = {}
+        for item in itens:
+            existente = self._linhas.get(item.produto.id_produto)
+            if existente:
+                existente.quantidade += item.quantidade
+                existente.subtotal_centavos += item.subtotal_centavos # Soma o que foi cobrado, sem recalcular pelo preço atual
+            else:
+                self._linhas[item.produto.id_produto] = item
+
+    def linha(self, id_produto: str) -> ItemPedido | None:
+        return self._linhas.get(id_produto)
 
     def adicionar_item(self, produto: Produto, quantidade: int):
         if not produto.disponivel:
@@ -96,39 +571,69 @@ class Pedido:
         if produto.estoque < quantidade:
             return False, f"Estoque insuficiente para '{produto.nome}'. Disponível: {produto.estoque}"
 
-        for item in self.itens:
-            if item.produto.id_produto == produto.id_produto:
-                if produto.estoque < (item.quantidade + quantidade):
-                    return False, f"Adicionar mais '{produto.nome}' excede o estoque. Disponível: {produto.estoque}"
-                
-                self.valor_total -= item.subtotal
-                item.quantidade += quantidade
-                item.subtotal = item.produto.preco * item.quantidade
-                self.valor_total += item.subtotal
-                return True, ""
+        item = self._linhas.get(produto.id_produto)
+        if item:
+            if produto.estoque < (item.quantidade + quantidade):
+                return False, f"Adicionar mais '{produto.nome}' excede o estoque. Disponível: {produto.estoque}"
+            self.valor_total_centavos -= item.subtotal_centavos
+            item.quantidade += quantidade
+            item.subtotal_centavos = item.produto.preco_centavos * item.quantidade
+            self.valor_total_centavos += item.subtotal_centavos
+            return True, ""
         
         item = ItemPedido(produto, quantidade)
-        self.itens.append(item)
-        self.valor_total += item.subtotal
+        self._linhas[produto.id_produto] = item
+        self.valor_total_centavos += item.subtotal_centavos
         return True, ""
 
+    def alterar_quantidade(self, id_produto: str, quantidade: int):
+        """Define a quantidade de uma linha existente; zero remove a linha."""
+        item = self._linhas.get(id_produto)
+        if not item:
+            return False
+        if quantidade <= 0:
+            return self.remover_item(id_produto)
+        self.valor_total_centavos -= item.subtotal_centavos
+        item.quantidade = quantidade
+        item.subtotal_centavos = item.produto.preco_centavos * quantidade
+        self.valor_total_centavos += item.subtotal_centavos
+        return True
+
+    def aplicar_precos(self, subtotais: dict):
+        """Troca o subtotal de preço de tabela das linhas pelo calculado fora (ex.: promoções do PDV)."""
+        for id_produto, subtotal in subtotais.items():
+            item = self._linhas.get(id_produto)
+            if item:
+                self.valor_total_centavos += subtotal - item.subtotal_centavos
+                item.subtotal_centavos = subtotal
+
     def remover_item(self, id_produto: str):
-        item_removido = None
-        for item in self.itens:
-            if item.produto.id_produto == id_produto:
-                self.itens.remove(item)
-                self.valor_total -= item.subtotal
-                item_removido = item
-                break
+        item_removido = self._linhas.pop(id_produto, None)
+        if item_removido:
+            self.valor_total_centavos -= item_removido.subtotal_centavos
         return True if item_removido else False
 
-    def atualizar_status(self, novo_status: str):
-        status_validos = ["Pendente", "Em Preparo", "Pronto", "Entregue", "Cancelado"]
-        if novo_status in status_validos:
+    def atualizar_status(self, novo_status: str, momento: datetime = None):
+        if novo_status in STATUS_VALIDOS:
+            if novo_status != self.status:
+                segundos = max(0, round(((momento or datetime.now()) - self.data_hora_criacao).total_seconds()))
+                # Tupla nova a cada mudança: o diário da transação guarda só a referência anterior
+                self.transicoes = self.transicoes + ((STATUS_VALIDOS.index(novo_status), segundos),)
             self.status = novo_status
             return True
         return False
 
+    def entrada_no_status(self) -> datetime | None:
+        """Quando o pedido entrou no status atual (None se foi antes de as mudanças serem registradas)."""
+        if self.transicoes:
+            return self.data_hora_criacao + timedelta(seconds=self.transicoes[-1][1])
+        return self.data_hora_criacao if self.status == "Pendente" else None
+
+    def linha_do_tempo(self) -> list[tuple[str, datetime]]:
+        return [("Pendente", self.data_hora_criacao)] + [
+            (STATUS_VALIDOS[codigo], self.data_hora_criacao + timedelta(seconds=segundos))
+            for codigo, segundos in self.transicoes]
+
     def to_dict(self):
         return {
             "id_pedido": self.id_pedido,
@@ -136,9 +641,16 @@ class Pedido:
             "itens": [item.to_dict() for item in self.itens],
             "status": self.status,
             "data_hora_criacao": self.data_hora_criacao.isoformat(),
-            "valor_total": self.valor_total
+            "valor_total_centavos": self.valor_total_centavos,
+            "prioritario": self.prioritario,
+            **({"transicoes": [list(t) for t in self.transicoes]} if self.transicoes else {})
         }
 
+    @staticmethod
+    def _valor_total_centavos(data: dict) -> int:
+        # Arquivos antigos gravavam "valor_total" em reais (float)
+        return data["valor_total_centavos"] if "valor_total_centavos" in data else centavos(data["valor_total"])
+
     @classmethod
     def from_dict(cls, data: dict, cardapio_ref: dict):
         pedido = cls(
@@ -146,12 +658,14 @@ class Pedido:
             id_pedido=data["id_pedido"],
             status=data["status"],
             data_hora_criacao=datetime.fromisoformat(data["data_hora_criacao"]),
-            valor_total=data["valor_total"]
+            valor_total_centavos=cls._valor_total_centavos(data),
+            prioritario=data.get("prioritario", False)
         )
+        pedido.transicoes = tuple((codigo, segundos) for codigo, segundos in data.get("transicoes", ()))
         for item_data in data["itens"]:
             produto = cardapio_ref.get(item_data["produto_id"])
             if produto:
-                pedido.itens.append(ItemPedido(produto, item_data["quantidade"]))
+                pedido._linhas[produto.id_produto] = ItemPedido(produto, item_data["quantidade"], item_data.get("subtotal_centavos"))
             else:
                 print(f"Aviso: Produto com ID {item_data['produto_id']} não encontrado no cardápio durante carregamento do pedido.")
         return pedido
@@ -187,73 +701,1957 @@ class Cliente:
     def from_dict(cls, data: dict):
         return cls(data["id_cliente"], data["nome"], data["telefone"], data["endereco"])
 
+class ErroTransacao(Exception):
+    """Aborta a transação em andamento da Lanchonete, desfazendo as alterações em memória."""
+
+
+_AUSENTE = object()
+
+
+class ReservaEstoque:
+    """Livro de reservas de estoque: em estoque, reservado e disponível por produto.
+
+    Cada reserva pertence a um titular (um carrinho do PDV ou um pedido) e é tomada
+    sob a trava do produto, de modo que vendedores de produtos diferentes não disputam
+    a mesma trava. Reservas com prazo expiram sozinhas.
+    """
+    TTL_CARRINHO = 15 * 60 # segundos
+
+    def __init__(self, cardapio: dict):
+        self.cardapio = cardapio
+        self._travas = {}
+        self._trava_travas = threading.Lock()
+        self._trava_titulares = threading.Lock()
+        self._reservado = {}
+        self._reservas = {} # titular -> {id_produto: quantidade}
+        self._expira_em = {} # titular -> instante (time.monotonic) ou ausente
+        self._vencimentos = [] # heap de (expira_em, titular)
+
+    def _trava(self, id_produto: str) -> threading.Lock:
+        trava = self._travas.get(id_produto)
+        if trava is None:
+            with self._trava_travas:
+                trava = self._travas.setdefault(id_produto, threading.Lock())
+        return trava
+
+    def em_estoque(self, id_produto: str) -> int:
+        produto = self.cardapio.get(id_produto)
+        return produto.estoque if produto else 0
+
+    def reservado(self, id_produto: str) -> int:
+        return self._reservado.get(id_produto, 0)
+
+    def disponivel(self, id_produto: str) -> int:
+        self.expirar_vencidas()
+        return self.em_estoque(id_produto) - self.reservado(id_produto)
+
+    def saldo(self, id_produto: str) -> dict:
+        self.expirar_vencidas()
+        em_estoque = self.em_estoque(id_produto)
+        reservado = self.reservado(id_produto)
+        return {"em_estoque": em_estoque, "reservado": reservado, "disponivel": em_estoque - reservado}
+
+    def quantidade_reservada(self, titular: str, id_produto: str) -> int:
+        return self._reservas.get(titular, {}).get(id_produto, 0)
+
+    def linhas(self, titular: str) -> dict:
+        return dict(self._reservas.get(titular, {}))
+
+    def titulares(self) -> dict:
+        """Cópia de todas as reservas: {titular: {id_produto: quantidade}}."""
+        with self._trava_titulares:
+            return {titular: dict(linhas) for titular, linhas in self._reservas.items()}
+
+    def reservado_por_produto(self) -> dict:
+        return dict(self._reservado)
+
+    def reservar(self, titular: str, id_produto: str, quantidade: int, ttl: float = None, forcar: bool = False) -> tuple[bool, str]:
+        if quantidade <= 0:
+            return False, "Erro: Quantidade a reservar deve ser maior que zero."
+        produto = self.cardapio.get(id_produto)
+        if not produto:
+            return False, f"Erro: Produto com ID '{id_produto}' não encontrado no cardápio."
+        self.expirar_vencidas()
+
+        with self._trava(id_produto):
+            disponivel = produto.estoque - self._reservado.get(id_produto, 0)
+            if quantidade > disponivel and not forcar:
+                return False, f"Estoque insuficiente para '{produto.nome}'. Disponível: {max(disponivel, 0)}"
+            self._reservado[id_produto] = self._reservado.get(id_produto, 0) + quantidade
+            with self._trava_titulares:
+                linhas = self._reservas.setdefault(titular, {})
+                linhas[id_produto] = linhas.get(id_produto, 0) + quantidade
+        if ttl is not None:
+            self.renovar(titular, ttl)
+        return True, ""
+
+    def renovar(self, titular: str, ttl: float = TTL_CARRINHO):
+        expira_em = time.monotonic() + ttl
+        with self._trava_titulares:
+            self._expira_em[titular] = expira_em
+            heapq.heappush(self._vencimentos, (expira_em, titular))
+
+    def liberar(self, titular: str, id_produto: str = None, quantidade: int = None) -> int:
+        """Devolve ao disponível a reserva do titular (uma linha ou todas). Retorna a quantidade liberada."""
+        with self._trava_titulares:
+            linhas = self._reservas.get(titular)
+            if not linhas:
+                return 0
+            if id_produto is None:
+                alvo = self._reservas.pop(titular)
+                self._expira_em.pop(titular, None)
+            else:
+                reservada = linhas.get(id_produto, 0)
+                if not reservada:
+                    return 0
+                liberar = reservada if quantidade is None else min(quantidade, reservada)
+                if liberar == reservada:
+                    del linhas[id_produto]
+                else:
+                    linhas[id_produto] = reservada - liberar
+                if not linhas:
+                    self._reservas.pop(titular)
+                    self._expira_em.pop(titular, None)
+                alvo = {id_produto: liberar}
+
+        total = 0
+        for id_prod, qtd in alvo.items():
+            with self._trava(id_prod):
+                self._reservado[id_prod] = self._reservado.get(id_prod, 0) - qtd
+            total += qtd
+        return total
+
+    def transferir(self, origem: str, destino: str, ttl: float = None):
+        """Passa as reservas de um titular para outro (ex.: do carrinho para o pedido) sem alterar o disponível."""
+        with self._trava_titulares:
+            linhas = self._reservas.pop(origem, None)
+            self._expira_em.pop(origem, None)
+            if not linhas:
+                return
+            destino_linhas = self._reservas.setdefault(destino, {})
+            for id_produto, qtd in linhas.items():
+                destino_linhas[id_produto] = destino_linhas.get(id_produto, 0) + qtd
+            if ttl is None:
+                self._expira_em.pop(destino, None)
+        if ttl is not None:
+            self.renovar(destino, ttl)
+
+    def confirmar(self, titular: str) -> tuple[bool, str]:
+        """Baixa do estoque as reservas do titular (entrega do pedido).
+
+        Cada produto é conferido e baixado sob a mesma trava; se algum faltar, as baixas
+        já feitas são devolvidas e as reservas voltam para o titular.
+        """
+        with self._trava_titulares:
+            linhas = self._reservas.pop(titular, {})
+            expira_em = self._expira_em.pop(titular, None)
+        baixados = []
+        erro = None
+        for id_produto, qtd in linhas.items():
+            produto = self.cardapio.get(id_produto)
+            if not produto:
+                erro = f"Erro: Produto '{id_produto}' não encontrado no cardápio para dedução de estoque."
+                break
+            with self._trava(id_produto):
+                if produto.estoque < qtd:
+                    erro = f"Erro: Estoque insuficiente de '{produto.nome}' para finalizar pedido. Restam {produto.estoque}, pedido requer {qtd}."
+                    break
+                produto.estoque -= qtd
+                self._reservado[id_produto] = self._reservado.get(id_produto, 0) - qtd
+            baixados.append((produto, qtd))
+        if erro is None:
+            return True, ""
+
+        for produto, qtd in baixados:
+            with self._trava(produto.id_produto):
+                produto.estoque += qtd
+                self._reservado[produto.id_produto] = self._reservado.get(produto.id_produto, 0) + qtd
+        with self._trava_titulares:
+            destino = self._reservas.setdefault(titular, {})
+            for id_produto, qtd in linhas.items():
+                destino[id_produto] = destino.get(id_produto, 0) + qtd
+            if expira_em is not None:
+                self._expira_em[titular] = expira_em
+        return False, erro
+
+    def expirar_vencidas(self, agora: float = None) -> int:
+        """Libera as reservas cujo prazo venceu. Retorna quantos titulares expiraram."""
+        agora = time.monotonic() if agora is None else agora
+        if not self._vencimentos or self._vencimentos[0][0] > agora:
+            return 0
+        vencidos = []
+        with self._trava_titulares:
+            while self._vencimentos and self._vencimentos[0][0] <= agora:
+                expira_em, titular = heapq.heappop(self._vencimentos)
+                # Entradas antigas do heap (prazo renovado ou titular já liberado) são ignoradas
+                if self._expira_em.get(titular) == expira_em:
+                    vencidos.append(titular)
+        for titular in vencidos:
+            self.liberar(titular)
+        return len(vencidos)
+
+class FilaCozinha:
+    """Fila da cozinha: pedidos "Pendente" e "Em Preparo" ordenados por prioridade e horário.
+
+    Cada etapa é um heap com remoção preguiçosa, de modo que entrar, sair ou mudar de
+    etapa custa O(log n). A contagem de itens por estação é mantida incrementalmente.
+    """
+    ETAPAS = ("Pendente", "Em Preparo")
+
+    def __init__(self):
+        self._heaps = {etapa: [] for etapa in self.ETAPAS}
+        self._entradas = {} # id_pedido -> [prioridade, criado_em, seq, id_pedido, etapa, valida]
+        self._invalidas = {etapa: 0 for etapa in self.ETAPAS}
+        self._itens_por_pedido = {} # id_pedido -> {estacao: quantidade}
+        self._itens_por_estacao = {etapa: {} for etapa in self.ETAPAS}
+        self._seq = itertools.count()
+        self.versao = 0 # Incrementada a cada mudança; a tela só redesenha quando muda
+
+    @staticmethod
+    def _itens_do_pedido(pedido: Pedido) -> dict:
+        contagem = {}
+        for item in pedido.itens:
+            estacao = item.produto.estacao
+            contagem[estacao] = contagem.get(estacao, 0) + item.quantidade
+        return contagem
+
+    def _ajustar_estacoes(self, etapa: str, contagem: dict, sinal: int):
+        totais = self._itens_por_estacao[etapa]
+        for estacao, quantidade in contagem.items():
+            novo = totais.get(estacao, 0) + sinal * quantidade
+            if novo:
+                totais[estacao] = novo
+            else:
+                totais.pop(estacao, None)
+
+    def _retirar(self, id_pedido: str):
+        entrada = self._entradas.pop(id_pedido, None)
+        if entrada is None:
+            return
+        etapa = entrada[4]
+        entrada[5] = False
+        self._invalidas[etapa] += 1
+        self._ajustar_estacoes(etapa, self._itens_por_pedido.pop(id_pedido, {}), -1)
+        # Compacta o heap quando metade das entradas já foi invalidada
+        heap = self._heaps[etapa]
+        if self._invalidas[etapa] > len(heap) // 2:
+            self._heaps[etapa] = [e for e in heap if e[5]]
+            heapq.heapify(self._heaps[etapa])
+            self._invalidas[etapa] = 0
+
+    def atualizar(self, pedido: Pedido):
+        """Posiciona o pedido conforme seu status atual (entra, muda de etapa ou sai da fila)."""
+        etapa = pedido.status if pedido.status in self.ETAPAS else None
+        prioridade = 0 if pedido.prioritario else 1
+        criado_em = pedido.data_hora_criacao.timestamp()
+        entrada = self._entradas.get(pedido.id_pedido)
+
+        if entrada is not None and entrada[4] == etapa and entrada[0] == prioridade:
+            # Mesma posição: só a composição de itens pode ter mudado
+            antiga = self._itens_por_pedido.get(pedido.id_pedido, {})
+            nova = self._itens_do_pedido(pedido)
+            if nova != antiga:
+                self._ajustar_estacoes(etapa, antiga, -1)
+                self._ajustar_estacoes(etapa, nova, 1)
+                self._itens_por_pedido[pedido.id_pedido] = nova
+                self.versao += 1
+            return
+
+        self._retirar(pedido.id_pedido)
+        if etapa is not None:
+            entrada = [prioridade, criado_em, next(self._seq), pedido.id_pedido, etapa, True]
+            self._entradas[pedido.id_pedido] = entrada
+            heapq.heappush(self._heaps[etapa], entrada)
+            contagem = self._itens_do_pedido(pedido)
+            self._itens_por_pedido[pedido.id_pedido] = contagem
+            self._ajustar_estacoes(etapa, contagem, 1)
+        self.versao += 1
+
+    def remover(self, id_pedido: str):
+        if id_pedido in self._entradas:
+            self._retirar(id_pedido)
+            self.versao += 1
+
+    def proximo(self, etapa: str = "Pendente") -> str | None:
+        heap = self._heaps[etapa]
+        while heap and not heap[0][5]:
+            heapq.heappop(heap)
+            self._invalidas[etapa] -= 1
+        return heap[0][3] if heap else None
+
+    def listar(self, etapa: str, limite: int = 50) -> list[str]:
+        validas = (e for e in self._heaps[etapa] if e[5])
+        return [e[3] for e in heapq.nsmallest(limite, validas)]
+
+    def tamanho(self, etapa: str) -> int:
+        return len(self._heaps[etapa]) - self._invalidas[etapa]
+
+    def itens_por_estacao(self) -> dict:
+        """Retorna {estacao: {etapa: quantidade}} dos pedidos ainda na fila."""
+        resultado = {}
+        for etapa, totais in self._itens_por_estacao.items():
+            for estacao, quantidade in totais.items():
+                resultado.setdefault(estacao, {e: 0 for e in self.ETAPAS})[etapa] = quantidade
+        return resultado
+
+class VigiaEstoque:
+    """Produtos com estoque no ponto de reposição ou abaixo dele.
+
+    É atualizado produto a produto quando o estoque muda, então o alerta nunca percorre o cardápio.
+    """
+
+    def __init__(self):
+        self._alertas = {} # id_produto -> Produto
+        self.versao = 0 # Incrementada a cada mudança; o aviso só é redesenhado quando muda
+
+    def verificar(self, produto: Produto):
+        if produto.estoque <= produto.estoque_minimo:
+            self._alertas[produto.id_produto] = produto
+            self.versao += 1
+        elif self._alertas.pop(produto.id_produto, None) is not None:
+            self.versao += 1
+
+    def remover(self, id_produto: str):
+        if self._alertas.pop(id_produto, None) is not None:
+            self.versao += 1
+
+    def quantidade(self) -> int:
+        return len(self._alertas)
+
+    def alertas(self, limite: int = None) -> list[Produto]:
+        """Os mais críticos primeiro: maior falta em relação ao mínimo."""
+        ordenados = sorted(self._alertas.values(), key=lambda p: (p.estoque - p.estoque_minimo, p.nome))
+        return ordenados[:limite] if limite else ordenados
+
+
+class QuantilP2:
+    """Estimativa de um quantil em fluxo contínuo (algoritmo P² de Jain e Chlamtac).
+
+    Guarda só cinco marcadores, qualquer que seja o número de amostras: cada amostra
+    custa O(1) e nenhuma é mantida.
+    """
+    __slots__ = ("p", "n", "alturas", "posicoes", "desejadas")
+
+    def __init__(self, p: float):
+        self.p = p
+        self.n = 0
+        self.alturas = [] # Até a 5ª amostra, as próprias amostras
+        self.posicoes = None
+        self.desejadas = None
+
+    def _incrementos(self) -> tuple:
+        p = self.p
+        return (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def adicionar(self, x: float):
+        self.n += 1
+        q = self.alturas
+        if self.n <= 5:
+            q.append(x)
+            if self.n == 5:
+                q.sort()
+                p = self.p
+                self.posicoes = [1, 2, 3, 4, 5]
+                self.desejadas = [1.0, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5.0]
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x, 1, 4) - 1
+        n = self.posicoes
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i, incremento in enumerate(self._incrementos()):
+            self.desejadas[i] += incremento
+
+        for i in (1, 2, 3):
+            d = self.desejadas[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                # Interpolação parabólica; se sair da ordem dos vizinhos, linear
+                altura = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < altura < q[i + 1]:
+                    altura = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = altura
+                n[i] += d
+
+    def valor(self) -> float | None:
+        if not self.n:
+            return None
+        if self.n < 5:
+            ordenadas = sorted(self.alturas)
+            return ordenadas[max(0, math.ceil(self.p * len(ordenadas)) - 1)]
+        return self.alturas[2]
+
+    def to_dict(self):
+        return [self.p, self.n, self.alturas, self.posicoes, self.desejadas]
+
+    @classmethod
+    def from_dict(cls, data: list):
+        quantil = cls(data[0])
+        quantil.n, quantil.alturas, quantil.posicoes, quantil.desejadas = data[1], list(data[2]), data[3], data[4]
+        return quantil
+
+
+class TemposPorStatus:
+    """Tempo que os pedidos passam em cada status, por hora do dia e por mix de estações.
+
+    Cada grupo tem contagem, soma e estimativas P² de mediana e p90, atualizadas a cada
+    mudança de status; o relatório sai daqui sem percorrer o histórico de pedidos.
+    """
+    QUANTIS = (0.5, 0.9)
+    AGRUPAMENTOS = ("hora", "mix")
+
+    def __init__(self):
+        self._grupos = {} # (status, agrupamento, valor) -> [contagem, soma_s, [QuantilP2, ...]]
+        self.versao = 0
+
+    @staticmethod
+    def mix_do_pedido(pedido: Pedido) -> str:
+        """Estações envolvidas no pedido (ex.: "Bebidas+Chapa")."""
+        return "+".join(sorted({item.produto.estacao for item in pedido.itens})) or "(sem itens)"
+
+    def registrar(self, status: str, entrada: datetime, duracao_s: float, mix: str):
+        for chave in ((status, "hora", entrada.hour), (status, "mix", mix), (status, "total", None)):
+            grupo = self._grupos.get(chave)
+            if grupo is None:
+                grupo = self._grupos[chave] = [0, 0.0, [QuantilP2(p) for p in self.QUANTIS]]
+            grupo[0] += 1
+            grupo[1] += duracao_s
+            for quantil in grupo[2]:
+                quantil.adicionar(duracao_s)
+        self.versao += 1
+
+    def resumo(self, agrupamento: str = "hora") -> list[dict]:
+        """Linhas {status, grupo, pedidos, media_s, p50_s, p90_s}, na ordem dos status e dos grupos."""
+        linhas = []
+        for (status, tipo, valor), (contagem, soma, quantis) in self._grupos.items():
+            if tipo not in (agrupamento, "total"):
+                continue
+            linhas.append({
+                "status": status,
+                "grupo": "Todos" if tipo == "total" else f"{valor:02d}h" if tipo == "hora" else valor,
+                "pedidos": contagem,
+                "media_s": soma / contagem,
+                "p50_s": quantis[0].valor(),
+                "p90_s": quantis[1].valor(),
+                "_ordem": (STATUS_VALIDOS.index(status), tipo == "total", valor),
+            })
+        linhas.sort(key=lambda linha: linha.pop("_ordem"))
+        return linhas
+
+    def to_dict(self):
+        return [[status, tipo, valor, contagem, soma, [q.to_dict() for q in quantis]]
+                for (status, tipo, valor), (contagem, soma, quantis) in self._grupos.items()]
+
+    @classmethod
+    def from_dict(cls, data: list):
+        tempos = cls()
+        for status, tipo, valor, contagem, soma, quantis in data:
+            tempos._grupos[(status, tipo, valor)] = [contagem, soma, [QuantilP2.from_dict(q) for q in quantis]]
+        return tempos
+
+
+class PainelVendas:
+    """Contadores do painel de vendas: janelas móveis por minuto e acumulados do dia.
+
+    Cada minuto da última hora ocupa uma posição de um buffer circular, reaproveitada
+    quando o minuto sai da janela. Registrar um evento e montar o resumo custam o mesmo,
+    qualquer que seja o tamanho do histórico.
+    """
+    JANELA_MINUTOS = 60
+    MINUTOS_RECENTES = 15
+
+    def __init__(self):
+        n = self.JANELA_MINUTOS
+        self._minuto = [-1] * n # Minuto (desde a época) que ocupa cada posição
+        self._criados = [0] * n
+        self._itens = [0] * n # Itens de pedidos entregues
+        self._receita = [0] * n # Centavos de pedidos entregues
+        self.dia = None
+        self._dia = {"criados": 0, "entregues": 0, "itens": 0, "receita": 0}
+        self.versao = 0
+
+    @staticmethod
+    def _minuto_de(momento: datetime) -> int:
+        return int(momento.timestamp() // 60)
+
+    def _posicao(self, momento: datetime) -> int | None:
+        minuto = self._minuto_de(momento)
+        i = minuto % self.JANELA_MINUTOS
+        if self._minuto[i] != minuto:
+            if self._minuto[i] > minuto:
+                return None # Já saiu da janela
+            self._minuto[i] = minuto
+            self._criados[i] = self._itens[i] = self._receita[i] = 0
+        return i
+
+    def _posicao_existente(self, momento: datetime) -> int | None:
+        """Posição do minuto do momento, se ele ainda está no buffer (sem reaproveitar a posição)."""
+        minuto = self._minuto_de(momento)
+        i = minuto % self.JANELA_MINUTOS
+        return i if self._minuto[i] == minuto else None
+
+    def _contar_no_dia(self, momento: datetime) -> bool:
+        dia = momento.date()
+        if self.dia is None or dia > self.dia:
+            self.dia = dia
+            self._dia = dict.fromkeys(self._dia, 0)
+        return dia == self.dia
+
+    def pedido_criado(self, momento: datetime, sinal: int = 1):
+        i = self._posicao(momento)
+        if i is not None:
+            self._criados[i] += sinal
+        if self._contar_no_dia(momento):
+            self._dia["criados"] += sinal
+        self.versao += 1
+
+    def pedido_entregue(self, pedido: Pedido, momento: datetime, sinal: int = 1):
+        """Entrada (sinal 1) ou saída (sinal -1) do pedido do status "Entregue".
+
+        Na saída, momento é o horário da entrega: o pedido só é descontado do minuto e do dia
+        que ainda o contam. Devolve a função que desfaz exatamente o que foi aplicado.
+        """
+        itens = sinal * sum(item.quantidade for item in pedido.itens)
+        receita = sinal * pedido.valor_total_centavos
+        if sinal > 0:
+            i, no_dia = self._posicao(momento), self._contar_no_dia(momento)
+        else:
+            i, no_dia = self._posicao_existente(momento), self.dia == momento.date()
+        self._aplicar_entrega(i, no_dia, sinal, itens, receita)
+        return lambda: self._aplicar_entrega(i, no_dia, -sinal, -itens, -receita)
+
+    def _aplicar_entrega(self, i: int | None, no_dia: bool, entregues: int, itens: int, receita: int):
+        if i is not None:
+            self._itens[i] += itens
+            self._receita[i] += receita
+        if no_dia:
+            self._dia["entregues"] += entregues
+            self._dia["itens"] += itens
+            self._dia["receita"] += receita
+        self.versao += 1
+
+    def semear(self, pedidos, agora: datetime = None):
+        """Conta pedidos carregados do arquivo que ainda caem nas janelas (criados ou entregues há pouco)."""
+        agora = agora or datetime.now()
+        inicio = datetime.combine(agora.date(), datetime.min.time()) - timedelta(days=1)
+        entregue = STATUS_VALIDOS.index("Entregue")
+        for pedido in pedidos:
+            if pedido.data_hora_criacao < inicio:
+                continue
+            self.pedido_criado(pedido.data_hora_criacao)
+            if pedido.status == "Entregue":
+                # Sem o registro da transição (arquivos antigos), vale o horário de criação
+                momento = next((pedido.data_hora_criacao + timedelta(seconds=segundos)
+                                for codigo, segundos in reversed(pedido.transicoes) if codigo == entregue),
+                               pedido.data_hora_criacao)
+                self.pedido_entregue(pedido, momento)
+
+    def _somar(self, valores: list, minutos: int, agora: datetime) -> int:
+        atual = self._minuto_de(agora)
+        total = 0
+        for minuto in range(atual - minutos + 1, atual + 1):
+            i = minuto % self.JANELA_MINUTOS
+            if self._minuto[i] == minuto:
+                total += valores[i]
+        return total
+
+    def resumo(self, agora: datetime = None) -> dict:
+        agora = agora or datetime.now()
+        hoje = self._dia if self.dia == agora.date() else dict.fromkeys(self._dia, 0)
+        return {
+            "pedidos_recentes": self._somar(self._criados, self.MINUTOS_RECENTES, agora),
+            "itens_ultima_hora": self._somar(self._itens, self.JANELA_MINUTOS, agora),
+            "receita_ultima_hora_centavos": self._somar(self._receita, self.JANELA_MINUTOS, agora),
+            "pedidos_hoje": hoje["criados"],
+            "entregues_hoje": hoje["entregues"],
+            "receita_hoje_centavos": hoje["receita"],
+            "ticket_medio_centavos": hoje["receita"] // hoje["entregues"] if hoje["entregues"] else 0,
+            "pedidos_por_minuto": [self._somar(self._criados, 1, agora - timedelta(minutes=m))
+                                   for m in range(self.MINUTOS_RECENTES - 1, -1, -1)],
+        }
+
+
+class FeedAlteracoes:
+    """Registro versionado das entidades alteradas (produtos, clientes e pedidos).
+
+    Cada entidade aparece uma vez só, com a versão da sua última alteração; a ordem do
+    OrderedDict é a ordem das versões, então "o que mudou desde N" lê apenas o final.
+    """
+    TIPOS = ("produto", "cliente", "pedido") # Ordem de aplicação: pedidos dependem de produtos e clientes
+
+    def __init__(self, id_origem: str = None):
+        self.id_origem = id_origem or uuid.uuid4().hex # Identifica esta instância para quem recebe os lotes
+        self.versao = 0
+        self._entradas = OrderedDict() # (tipo, chave) -> (versão, origem); origem None = alteração local
+        self._suspenso = 0
+
+    def registrar(self, tipo: str, chave: str, origem: str = None):
+        if self._suspenso:
+            return
+        self.versao += 1
+        self._entradas[(tipo, chave)] = (self.versao, origem)
+        self._entradas.move_to_end((tipo, chave))
+
+    @property
+    def ativo(self) -> bool:
+        return not self._suspenso
+
+    def estado(self) -> tuple:
+        """Cópia da versão e das entradas, para restaurar() se um commit falhar depois de registrar."""
+        return self.versao, self._entradas.copy()
+
+    def restaurar(self, estado: tuple):
+        self.versao, self._entradas = estado[0], estado[1].copy()
+
+    @contextmanager
+    def suspenso(self):
+        """Alterações feitas dentro do bloco não entram no feed (ex.: compactação local do histórico)."""
+        self._suspenso += 1
+        try:
+            yield
+        finally:
+            self._suspenso -= 1
+
+    def desde(self, versao: int, excluir_origem: str = None) -> list[tuple[str, str, int]]:
+        alteracoes = []
+        for (tipo, chave), (versao_entrada, origem) in reversed(self._entradas.items()):
+            if versao_entrada <= versao:
+                break
+            if excluir_origem is None or origem != excluir_origem:
+                alteracoes.append((tipo, chave, versao_entrada))
+        alteracoes.reverse()
+        return alteracoes
+
+    def to_dict(self):
+        return {
+            "id_origem": self.id_origem,
+            "versao": self.versao,
+            "entradas": [[tipo, chave, versao, origem] for (tipo, chave), (versao, origem) in self._entradas.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        feed = cls(data["id_origem"])
+        feed.versao = data.get("versao", 0)
+        for tipo, chave, versao, origem in data.get("entradas", []):
+            feed._entradas[(tipo, chave)] = (versao, origem)
+        return feed
+
+
+class ArquivoPedidos:
+    """Arquivo colunar compactado de pedidos fechados, lido por mmap sem criar objetos Pedido.
+
+    Layout: assinatura, tamanho do cabeçalho (4 bytes), cabeçalho JSON e os blocos. Cada bloco guarda
+    até LINHAS_POR_BLOCO pedidos, em ordem de data, com uma coluna de largura fixa (array) comprimida
+    com zlib para cada campo. O cabeçalho traz os dicionários (produtos, clientes, status) e, por bloco,
+    o intervalo de datas e o total entregue, então relatórios de período pulam ou somam blocos inteiros
+    sem descomprimir nada.
+    """
+    ASSINATURA = b"LANCOL01"
+    LINHAS_POR_BLOCO = 65536
+    EPOCA = datetime(1970, 1, 1)
+    COLUNAS_PEDIDO = (("numero", "q"), ("criado_us", "q"), ("cliente", "i"), ("status", "b"),
+                      ("valor_centavos", "q"), ("prioritario", "b"), ("fim_itens", "i"))
+    COLUNAS_ITEM = (("produto", "i"), ("quantidade", "i"), ("subtotal_centavos", "q"))
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._arquivo = open(caminho, 'rb')
+        self._mapa = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mapa[:len(self.ASSINATURA)] != self.ASSINATURA:
+            self.fechar()
+            raise ValueError(f"'{caminho}' não é um arquivo de pedidos.")
+        inicio = len(self.ASSINATURA)
+        tamanho = int.from_bytes(self._mapa[inicio:inicio + 4], "little")
+        self.cabecalho = json.loads(self._mapa[inicio + 4:inicio + 4 + tamanho].decode("utf-8"))
+        self._inicio_dados = inicio + 4 + tamanho
+        self._tipos = dict(self.COLUNAS_PEDIDO + self.COLUNAS_ITEM)
+        self._inverter_bytes = self.cabecalho["ordem_bytes"] != sys.byteorder
+        self.nomes_produtos = dict(zip(self.cabecalho["produtos"], self.cabecalho["nomes_produtos"]))
+
+    def fechar(self):
+        self._mapa.close()
+        self._arquivo.close()
+
+    @classmethod
+    def _microssegundos(cls, data_hora: datetime) -> int:
+        return (data_hora - cls.EPOCA) // timedelta(microseconds=1)
+
+    @classmethod
+    def gravar(cls, caminho: str, pedidos: list[Pedido]):
+        pedidos = sorted(pedidos, key=lambda p: p.data_hora_criacao)
+        produtos, clientes = {}, {}
+        nomes_produtos = []
+        ids_fora_do_padrao = {}
+        blocos, dados = [], bytearray()
+        for inicio_bloco in range(0, len(pedidos), cls.LINHAS_POR_BLOCO):
+            colunas = {nome: array.array(tipo) for nome, tipo in cls.COLUNAS_PEDIDO + cls.COLUNAS_ITEM}
+            total_entregue = 0
+            for linha, pedido in enumerate(pedidos[inicio_bloco:inicio_bloco + cls.LINHAS_POR_BLOCO], inicio_bloco):
+                numero = numero_do_id_pedido(pedido.id_pedido)
+                if formatar_id_pedido(numero) != pedido.id_pedido:
+                    ids_fora_do_padrao[str(linha)] = pedido.id_pedido # Ex.: IDs antigos como PED0001
+                colunas["numero"].append(numero)
+                colunas["criado_us"].append(cls._microssegundos(pedido.data_hora_criacao))
+                colunas["cliente"].append(clientes.setdefault(pedido.id_cliente, len(clientes)))
+                colunas["status"].append(STATUS_VALIDOS.index(pedido.status))
+                colunas["valor_centavos"].append(pedido.valor_total_centavos)
+                colunas["prioritario"].append(1 if pedido.prioritario else 0)
+                for item in pedido.itens:
+                    id_produto = item.produto.id_produto
+                    if id_produto not in produtos:
+                        produtos[id_produto] = len(produtos)
+                        nomes_produtos.append(item.produto.nome)
+                    colunas["produto"].append(produtos[id_produto])
+                    colunas["quantidade"].append(item.quantidade)
+                    colunas["subtotal_centavos"].append(item.subtotal_centavos)
+                colunas["fim_itens"].append(len(colunas["produto"]))
+                if pedido.status == "Entregue":
+                    total_entregue += pedido.valor_total_centavos
+            posicoes = {}
+            for nome, valores in colunas.items():
+                comprimido = zlib.compress(valores.tobytes(), 6)
+                posicoes[nome] = [len(dados), len(comprimido)]
+                dados += comprimido
+            blocos.append({
+                "linhas": len(colunas["numero"]),
+                "primeira_linha": inicio_bloco,
+                "criado_min_us": colunas["criado_us"][0],
+                "criado_max_us": colunas["criado_us"][-1],
+                "total_entregue_centavos": total_entregue,
+                "colunas": posicoes,
+            })
+        cabecalho = json.dumps({
+            "versao": 1,
+            "ordem_bytes": sys.byteorder,
+            "pedidos": len(pedidos),
+            "produtos": list(produtos),
+            "nomes_produtos": nomes_produtos,
+            "clientes": list(clientes),
+            "status": list(STATUS_VALIDOS),
+            "ids_fora_do_padrao": ids_fora_do_padrao,
+            "blocos": blocos,
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        with open(caminho, 'wb') as f:
+            f.write(cls.ASSINATURA)
+            f.write(len(cabecalho).to_bytes(4, "little"))
+            f.write(cabecalho)
+            f.write(dados)
+
+    def coluna(self, bloco: dict, nome: str) -> array.array:
+        deslocamento, tamanho = bloco["colunas"][nome]
+        inicio = self._inicio_dados + deslocamento
+        valores = array.array(self._tipos[nome])
+        valores.frombytes(zlib.decompress(self._mapa[inicio:inicio + tamanho]))
+        if self._inverter_bytes:
+            valores.byteswap()
+        return valores
+
+    def blocos(self, inicio_us: int = None, fim_us: int = None):
+        """Blocos com algum pedido no intervalo (em microssegundos desde EPOCA), pelos limites do cabeçalho."""
+        for bloco in self.cabecalho["blocos"]:
+            if inicio_us is not None and bloco["criado_max_us"] < inicio_us:
+                continue
+            if fim_us is not None and bloco["criado_min_us"] > fim_us:
+                continue
+            yield bloco
+
+    def total_entregue(self, data_inicio: datetime = None, data_fim: datetime = None) -> int:
+        inicio_us = self._microssegundos(data_inicio) if data_inicio else None
+        fim_us = self._microssegundos(data_fim) if data_fim else None
+        entregue = self.cabecalho["status"].index("Entregue")
+        total = 0
+        for bloco in self.blocos(inicio_us, fim_us):
+            if (inicio_us is None or bloco["criado_min_us"] >= inicio_us) and (fim_us is None or bloco["criado_max_us"] <= fim_us):
+                total += bloco["total_entregue_centavos"] # Bloco inteiro dentro do período
+                continue
+            criado = self.coluna(bloco, "criado_us")
+            status = self.coluna(bloco, "status")
+            valores = self.coluna(bloco, "valor_centavos")
+            for c, s, v in zip(criado, status, valores):
+                if s == entregue and (inicio_us is None or c >= inicio_us) and (fim_us is None or c <= fim_us):
+                    total += v
+        return total
+
+    def itens_entregues(self, data_inicio: datetime = None, data_fim: datetime = None):
+        """Gera (data_hora_criacao, id_produto, quantidade) dos itens de pedidos entregues no período."""
+        inicio_us = self._microssegundos(data_inicio) if data_inicio else None
+        fim_us = self._microssegundos(data_fim) if data_fim else None
+        entregue = self.cabecalho["status"].index("Entregue")
+        ids = self.cabecalho["produtos"]
+        for bloco in self.blocos(inicio_us, fim_us):
+            criado = self.coluna(bloco, "criado_us")
+            status = self.coluna(bloco, "status")
+            fim_itens = self.coluna(bloco, "fim_itens")
+            produtos = self.coluna(bloco, "produto")
+            quantidades = self.coluna(bloco, "quantidade")
+            inicio = 0
+            for c, s, fim in zip(criado, status, fim_itens):
+                if s == entregue and (inicio_us is None or c >= inicio_us) and (fim_us is None or c <= fim_us):
+                    data_hora = self.EPOCA + timedelta(microseconds=c)
+                    for i in range(inicio, fim):
+                        yield data_hora, ids[produtos[i]], quantidades[i]
+                inicio = fim
+
+    def pedidos_do_cliente(self, id_cliente: str, cardapio: dict) -> list[Pedido]:
+        """Recria como Pedido só os pedidos do cliente (itens de produtos fora do cardápio são omitidos)."""
+        try:
+            indice_cliente = self.cabecalho["clientes"].index(id_cliente)
+        except ValueError:
+            return []
+        ids_produtos = self.cabecalho["produtos"]
+        especiais = self.cabecalho["ids_fora_do_padrao"]
+        pedidos = []
+        for bloco in self.blocos():
+            clientes = self.coluna(bloco, "cliente")
+            if indice_cliente not in clientes:
+                continue
+            colunas = {nome: self.coluna(bloco, nome) for nome, _ in self.COLUNAS_PEDIDO + self.COLUNAS_ITEM}
+            for linha, cliente in enumerate(clientes):
+                if cliente != indice_cliente:
+                    continue
+                linha_arquivo = str(bloco["primeira_linha"] + linha)
+                pedido = Pedido(id_cliente, especiais.get(linha_arquivo) or formatar_id_pedido(colunas["numero"][linha]),
+                                self.cabecalho["status"][colunas["status"][linha]],
+                                self.EPOCA + timedelta(microseconds=colunas["criado_us"][linha]),
+                                colunas["valor_centavos"][linha], bool(colunas["prioritario"][linha]))
+                inicio = colunas["fim_itens"][linha - 1] if linha else 0
+                itens = []
+                for i in range(inicio, colunas["fim_itens"][linha]):
+                    produto = cardapio.get(ids_produtos[colunas["produto"][i]])
+                    if produto:
+                        item = ItemPedido(produto, colunas["quantidade"][i])
+                        item.subtotal_centavos = colunas["subtotal_centavos"][i] # Preço da época da venda
+                        itens.append(item)
+                pedido.itens = itens
+                pedidos.append(pedido)
+        return pedidos
+
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas e sem acentos, para buscas: 'João' -> 'joao'."""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+class IndiceClientes:
+    """Busca incremental de clientes por prefixo do ID, prefixo/sufixo do telefone e palavras do nome.
+
+    Cada chave fica numa lista ordenada de (chave, id_cliente); uma consulta é uma busca binária
+    mais a leitura dos resultados, sem percorrer todos os clientes.
+    """
+
+    def __init__(self):
+        self._ids = [] # (id normalizado, id)
+        self._telefones = [] # (telefone, id)
+        self._telefones_invertidos = [] # (telefone ao contrário, id) para buscar pelo final
+        self._palavras = [] # (palavra do nome normalizada, id)
+        self._chaves = {} # id -> chaves indexadas, para remover/atualizar
+
+    @staticmethod
+    def _chaves_do_cliente(cliente: Cliente) -> tuple:
+        telefone = "".join(c for c in cliente.telefone if c.isdigit())
+        palavras = tuple(sorted(set(normalizar_texto(cliente.nome).split())))
+        return normalizar_texto(cliente.id_cliente), telefone, palavras
+
+    def _entradas(self, id_cliente: str, chaves: tuple):
+        id_normalizado, telefone, palavras = chaves
+        yield self._ids, (id_normalizado, id_cliente)
+        if telefone:
+            yield self._telefones, (telefone, id_cliente)
+            yield self._telefones_invertidos, (telefone[::-1], id_cliente)
+        for palavra in palavras:
+            yield self._palavras, (palavra, id_cliente)
+
+    def adicionar(self, cliente: Cliente):
+        if cliente.id_cliente in self._chaves:
+            self.remover(cliente.id_cliente)
+        chaves = self._chaves_do_cliente(cliente)
+        self._chaves[cliente.id_cliente] = chaves
+        for lista, entrada in self._entradas(cliente.id_cliente, chaves):
+            bisect.insort(lista, entrada)
+
+    def adicionar_varios(self, clientes):
+        """Inserção em massa (carga e importação): acrescenta tudo e ordena uma vez só."""
+        for cliente in clientes:
+            if cliente.id_cliente in self._chaves:
+                self.remover(cliente.id_cliente)
+            chaves = self._chaves_do_cliente(cliente)
+            self._chaves[cliente.id_cliente] = chaves
+            for lista, entrada in self._entradas(cliente.id_cliente, chaves):
+                lista.append(entrada)
+        for lista in (self._ids, self._telefones, self._telefones_invertidos, self._palavras):
+            lista.sort()
+
+    def remover(self, id_cliente: str):
+        chaves = self._chaves.pop(id_cliente, None)
+        if chaves is None:
+            return
+        for lista, entrada in self._entradas(id_cliente, chaves):
+            posicao = bisect.bisect_left(lista, entrada)
+            if posicao < len(lista) and lista[posicao] == entrada:
+                del lista[posicao]
+
+    def atualizar(self, cliente: Cliente):
+        if self._chaves.get(cliente.id_cliente) != self._chaves_do_cliente(cliente):
+            self.adicionar(cliente)
+
+    @staticmethod
+    def _faixa(lista: list, prefixo: str):
+        inicio = bisect.bisect_left(lista, (prefixo,))
+        for posicao in range(inicio, len(lista)):
+            chave, id_cliente = lista[posicao]
+            if not chave.startswith(prefixo):
+                return
+            yield id_cliente
+
+    def _tamanho_faixa(self, lista: list, prefixo: str) -> int:
+        return bisect.bisect_left(lista, (prefixo + "\uffff",)) - bisect.bisect_left(lista, (prefixo,))
+
+    def buscar(self, texto: str, limite: int = 20) -> list[str]:
+        """IDs de clientes que casam com o texto digitado, no máximo 'limite'."""
+        texto = normalizar_texto(texto.strip())
+        if not texto:
+            return []
+        encontrados = dict.fromkeys(self._faixa(self._ids, texto))
+        digitos = "".join(c for c in texto if c.isdigit())
+        if digitos and len(digitos) == len(texto.replace(" ", "").replace("-", "")):
+            fontes = [self._faixa(self._telefones, digitos), self._faixa(self._telefones_invertidos, digitos[::-1])]
+        else:
+            # Todas as palavras digitadas precisam casar; percorre a faixa da palavra mais seletiva
+            termos = texto.split()
+            mais_seletivo = min(termos, key=lambda termo: self._tamanho_faixa(self._palavras, termo))
+            outros = [termo for termo in termos if termo is not mais_seletivo]
+            fontes = [(id_cliente for id_cliente in self._faixa(self._palavras, mais_seletivo)
+                       if all(any(p.startswith(termo) for p in self._chaves[id_cliente][2]) for termo in outros))]
+        for fonte in fontes:
+            if len(encontrados) >= limite:
+                break
+            for id_cliente in fonte:
+                encontrados[id_cliente] = None
+                if len(encontrados) >= limite:
+                    break
+        return list(encontrados)[:limite]
+
+
+# --- Promoções ---
+class MotorPromocoes:
+    """Regras de preço (desconto por horário, faixas de quantidade e combos) compiladas em tabelas.
+
+    A cada mudança de regras, definir_regras monta por produto: o percentual de desconto de
+    cada uma das 168 horas da semana, as faixas de quantidade em ordem e o grupo de combos
+    de que o produto participa. Precificar uma linha vira consulta às tabelas, sem percorrer
+    as regras.
+    """
+    HORAS_SEMANA = 7 * 24
+    TIPOS = ("desconto", "quantidade", "combo")
+
+    def __init__(self, regras: list = None):
+        self.versao = 0
+        self.definir_regras(regras or [])
+
+    @staticmethod
+    def hora_da_semana(momento: datetime) -> int:
+        return momento.weekday() * 24 + momento.hour
+
+    @staticmethod
+    def _inteiro(valor) -> bool:
+        return isinstance(valor, int) and not isinstance(valor, bool)
+
+    @classmethod
+    def validar_regra(cls, regra: dict):
+        """Levanta ValueError com uma mensagem para o usuário se a regra estiver incompleta ou incoerente."""
+        if not isinstance(regra, dict):
+            raise ValueError("Cada promoção deve ser um objeto JSON ({...}).")
+        nome = regra.get("nome") or "(sem nome)"
+        tipo = regra.get("tipo")
+        inteiro = cls._inteiro
+        if tipo not in cls.TIPOS:
+            raise ValueError(f"Promoção '{nome}': tipo deve ser um de {', '.join(cls.TIPOS)}.")
+        if tipo == "desconto":
+            produtos = regra.get("produtos")
+            if not isinstance(produtos, list) or not produtos or not all(isinstance(p, str) for p in produtos):
+                raise ValueError(f"Promoção '{nome}': informe a lista de 'produtos' (IDs).")
+            percentual = regra.get("percentual", 0)
+            if not inteiro(percentual) or not 0 < percentual <= 100:
+                raise ValueError(f"Promoção '{nome}': 'percentual' deve ser um número inteiro entre 1 e 100.")
+            horas = regra.get("horas", [0, 24])
+            if not isinstance(horas, list) or len(horas) != 2 or not all(map(inteiro, horas)) \
+                    or not 0 <= horas[0] < horas[1] <= 24:
+                raise ValueError(f"Promoção '{nome}': 'horas' deve ser [início, fim) com inteiros entre 0 e 24.")
+            dias = regra.get("dias", list(range(7)))
+            if not isinstance(dias, list) or any(not inteiro(dia) or dia not in range(7) for dia in dias):
+                raise ValueError(f"Promoção '{nome}': 'dias' é uma lista de inteiros de 0 (segunda) a 6 (domingo).")
+        elif tipo == "quantidade":
+            minimo, preco = regra.get("minimo", 0), regra.get("preco_centavos", -1)
+            if not isinstance(regra.get("produto"), str) or not regra["produto"] or not inteiro(minimo) or minimo < 2 \
+                    or not inteiro(preco) or preco < 0:
+                raise ValueError(f"Promoção '{nome}': informe 'produto', 'minimo' (inteiro, 2 ou mais) e "
+                                 "'preco_centavos' unitário (inteiro).")
+        elif tipo == "combo":
+            itens = regra.get("itens") or {}
+            if not isinstance(itens, dict) or not all(inteiro(q) and q > 0 for q in itens.values()) \
+                    or sum(itens.values()) < 2:
+                raise ValueError(f"Promoção '{nome}': 'itens' precisa de pelo menos duas unidades "
+                                 "({id_produto: quantidade inteira}).")
+            preco = regra.get("preco_centavos", -1)
+            if not inteiro(preco) or preco < 0:
+                raise ValueError(f"Promoção '{nome}': informe 'preco_centavos' do combo (inteiro).")
+
+    def definir_regras(self, regras: list):
+        if not isinstance(regras, list):
+            raise ValueError("As promoções devem ser uma lista JSON ([...]).")
+        for regra in regras:
+            self.validar_regra(regra)
+        descontos = {} # id_produto -> bytearray(168) com o maior percentual de cada hora da semana
+        faixas = {} # id_produto -> ([mínimos em ordem], [preço unitário de cada faixa])
+        combos = []
+        for regra in regras:
+            if regra["tipo"] == "desconto":
+                inicio, fim = regra.get("horas", [0, 24])
+                for id_produto in regra["produtos"]:
+                    tabela = descontos.setdefault(id_produto, bytearray(self.HORAS_SEMANA))
+                    for dia in regra.get("dias", range(7)):
+                        for hora in range(dia * 24 + inicio, dia * 24 + fim):
+                            tabela[hora] = max(tabela[hora], regra["percentual"])
+            elif regra["tipo"] == "quantidade":
+                minimos, precos = faixas.setdefault(regra["produto"], ([], []))
+                posicao = bisect.bisect_left(minimos, regra["minimo"])
+                minimos.insert(posicao, regra["minimo"])
+                precos.insert(posicao, regra["preco_centavos"])
+            else:
+                combos.append((regra.get("nome") or f"Combo {len(combos) + 1}", dict(regra["itens"]), regra["preco_centavos"]))
+
+        # Combos que compartilham produtos disputam as mesmas unidades: formam um grupo avaliado junto
+        grupo_do_produto = {}
+        grupos = []
+        for combo in combos:
+            ligados = {grupo_do_produto[p] for p in combo[1] if p in grupo_do_produto}
+            novo = {"produtos": set(combo[1]), "combos": [combo]}
+            for indice in ligados:
+                novo["produtos"] |= grupos[indice]["produtos"]
+                novo["combos"] = grupos[indice]["combos"] + novo["combos"]
+                grupos[indice] = None
+            grupos.append(novo)
+            for id_produto in novo["produtos"]:
+                grupo_do_produto[id_produto] = len(grupos) - 1
+        self.regras = list(regras)
+        self._descontos = descontos
+        self._faixas = faixas
+        self._grupos = grupos
+        self._grupo_do_produto = grupo_do_produto
+        self.versao += 1
+
+    def grupo(self, id_produto: str) -> int | None:
+        return self._grupo_do_produto.get(id_produto)
+
+    def produtos_do_grupo(self, grupo: int) -> set:
+        return self._grupos[grupo]["produtos"]
+
+    def preco_na_hora(self, produto: Produto, hora_semana: int) -> int:
+        """Preço unitário com o desconto por horário (sem faixas de quantidade)."""
+        tabela = self._descontos.get(produto.id_produto)
+        percentual = tabela[hora_semana] if tabela else 0
+        if not percentual:
+            return produto.preco_centavos
+        return (produto.preco_centavos * (100 - percentual) + 50) // 100
+
+    def subtotal_linha(self, produto: Produto, quantidade: int, hora_semana: int) -> int:
+        """Melhor preço para o cliente entre o desconto do horário e a faixa de quantidade alcançada."""
+        unitario = self.preco_na_hora(produto, hora_semana)
+        faixa = self._faixas.get(produto.id_produto)
+        if faixa:
+            posicao = bisect.bisect_right(faixa[0], quantidade) - 1
+            if posicao >= 0:
+                unitario = min(unitario, faixa[1][posicao])
+        return unitario * quantidade
+
+    def aplicar_combos(self, grupo: int, linhas: dict, hora_semana: int) -> tuple[list, dict]:
+        """Monta combos com as unidades das linhas (id_produto -> (produto, quantidade)) de um grupo.
+
+        Os combos de maior economia são montados primeiro. Devolve [(nome, vezes, desconto, pesos)]
+        e as unidades usadas por produto; pesos reparte o desconto entre os produtos do combo.
+        """
+        restantes = {id_produto: quantidade for id_produto, (_, quantidade) in linhas.items()}
+        candidatos = []
+        for nome, itens, preco_combo in self._grupos[grupo]["combos"]:
+            if any(id_produto not in linhas for id_produto in itens):
+                continue
+            pesos = {id_produto: self.preco_na_hora(linhas[id_produto][0], hora_semana) * q for id_produto, q in itens.items()}
+            economia = sum(pesos.values()) - preco_combo
+            if economia > 0:
+                candidatos.append((economia, nome, itens, pesos))
+        candidatos.sort(key=lambda c: c[0], reverse=True)
+        aplicados = []
+        usados = {}
+        for economia, nome, itens, pesos in candidatos:
+            vezes = min(restantes[id_produto] // q for id_produto, q in itens.items())
+            if vezes <= 0:
+                continue
+            for id_produto, q in itens.items():
+                restantes[id_produto] -= q * vezes
+                usados[id_produto] = usados.get(id_produto, 0) + q * vezes
+            aplicados.append((nome, vezes, economia * vezes, pesos))
+        return aplicados, usados
+
+    def to_dict(self):
+        return self.regras
+
+
+class ContaCarrinho:
+    """Preço de um carrinho mantido incrementalmente pelo MotorPromocoes.
+
+    Mudar uma linha reprecifica só ela, ou o grupo de combos dela; o total é ajustado pela
+    diferença. Muda a hora ou as regras, a conta inteira é refeita na próxima alteração.
+    """
+    def __init__(self, motor: MotorPromocoes, agora=datetime.now):
+        self.motor = motor
+        self.agora = agora
+        self.linhas = {} # id_produto -> [produto, quantidade, subtotal_centavos]
+        self.combos = {} # grupo -> [(nome, vezes, desconto_centavos, pesos)]
+        self.total_centavos = 0
+        self._hora = self.motor.hora_da_semana(self.agora())
+        self._versao_regras = self.motor.versao
+
+    def _reprecificar_grupo(self, grupo: int):
+        linhas_grupo = {p: (self.linhas[p][0], self.linhas[p][1]) for p in self.motor.produtos_do_grupo(grupo) if p in self.linhas}
+        for nome, vezes, desconto, pesos in self.combos.pop(grupo, []):
+            self.total_centavos += desconto
+        aplicados, usados = self.motor.aplicar_combos(grupo, linhas_grupo, self._hora)
+        for id_produto, (produto, quantidade) in linhas_grupo.items():
+            em_combo = usados.get(id_produto, 0)
+            subtotal = (self.motor.preco_na_hora(produto, self._hora) * em_combo +
+                        self.motor.subtotal_linha(produto, quantidade - em_combo, self._hora))
+            self.total_centavos += subtotal - self.linhas[id_produto][2]
+            self.linhas[id_produto][2] = subtotal
+        if aplicados:
+            self.combos[grupo] = aplicados
+            self.total_centavos -= sum(desconto for _, _, desconto, _ in aplicados)
+        return set(linhas_grupo)
+
+    def _reprecificar_linha(self, id_produto: str) -> set:
+        grupo = self.motor.grupo(id_produto)
+        if grupo is not None:
+            return self._reprecificar_grupo(grupo)
+        linha = self.linhas[id_produto]
+        subtotal = self.motor.subtotal_linha(linha[0], linha[1], self._hora)
+        self.total_centavos += subtotal - linha[2]
+        linha[2] = subtotal
+        return {id_produto}
+
+    def atualizar_momento(self) -> bool:
+        """Refaz a conta se a hora da semana ou as regras mudaram. True se algo foi reprecificado."""
+        hora = self.motor.hora_da_semana(self.agora())
+        if hora == self._hora and self._versao_regras == self.motor.versao:
+            return False
+        self._hora = hora
+        self._versao_regras = self.motor.versao
+        self.combos = {}
+        self.total_centavos = 0
+        for linha in self.linhas.values():
+            linha[2] = 0
+        feitos = set()
+        for id_produto in self.linhas:
+            if id_produto not in feitos:
+                feitos |= self._reprecificar_linha(id_produto)
+        return True
+
+    def definir(self, produto: Produto, quantidade: int) -> set:
+        """Define a quantidade de um produto (0 remove). Devolve os produtos cujos subtotais mudaram."""
+        if self.atualizar_momento():
+            alterados = set(self.linhas)
+        else:
+            alterados = set()
+        id_produto = produto.id_produto
+        if quantidade <= 0:
+            linha = self.linhas.pop(id_produto, None)
+            if linha is None:
+                return alterados
+            self.total_centavos -= linha[2]
+            grupo = self.motor.grupo(id_produto)
+            return alterados | {id_produto} | (self._reprecificar_grupo(grupo) if grupo is not None else set())
+        linha = self.linhas.setdefault(id_produto, [produto, 0, 0])
+        linha[1] = quantidade
+        return alterados | self._reprecificar_linha(id_produto)
+
+    def descontos(self) -> list[tuple[str, int, int]]:
+        """(nome do combo, vezes, desconto em centavos) de cada combo montado."""
+        return [(nome, vezes, desconto) for aplicados in self.combos.values() for nome, vezes, desconto, _ in aplicados]
+
+    def subtotais_finais(self) -> dict[str, int]:
+        """Subtotal de cada linha com o desconto dos combos já repartido; a soma é exatamente o total."""
+        subtotais = {id_produto: linha[2] for id_produto, linha in self.linhas.items()}
+        for aplicados in self.combos.values():
+            for _, _, desconto, pesos in aplicados:
+                soma_pesos = sum(pesos.values())
+                restante = desconto
+                for i, (id_produto, peso) in enumerate(pesos.items()):
+                    parte = restante if i == len(pesos) - 1 else desconto * peso // soma_pesos
+                    subtotais[id_produto] -= parte
+                    restante -= parte
+        return subtotais
+
+
+# --- Verificação de Consistência ---
+class VerificadorConsistencia:
+    """Procura divergências nos dados: totais x itens, referências a cadastros e invariantes de estoque.
+
+    `executar` trabalha sobre cópias rasas tiradas no construtor e pode rodar numa thread de
+    trabalho: os dados viram colunas (uma linha por pedido, item ou produto) comparadas em
+    bloco, com NumPy se estiver instalado. Só os candidatos são detalhados. Como a interface
+    pode ter alterado algo no meio da leitura, `confirmar` refaz a conferência dos candidatos
+    na thread dona da Lanchonete e descarta o que era só uma alteração em andamento.
+    """
+    LIMITE_EXEMPLOS = 20
+    CATEGORIAS = {
+        "total_divergente": "Total do pedido diferente da soma dos itens",
+        "cliente_inexistente": "Pedido de cliente que não está cadastrado",
+        "produto_inexistente": "Item de produto que não está no cardápio",
+        "item_ignorado_na_carga": "Item descartado na carga (produto fora do cardápio)",
+        "estoque_negativo": "Produto com estoque negativo",
+        "reserva_acima_do_estoque": "Reservado maior que o estoque",
+        "reserva_divergente": "Reserva de pedido em aberto diferente dos itens do pedido",
+        "reserva_orfa": "Reserva presa a pedido já fechado",
+    }
+    FECHADOS = ("Entregue", "Cancelado")
+
+    def __init__(self, lanchonete):
+        self.lanchonete = lanchonete
+        self.pedidos = list(lanchonete.pedidos.values())
+        self.produtos = list(lanchonete.cardapio.values())
+        self.ids_produtos = set(lanchonete.cardapio)
+        self.ids_clientes = set(lanchonete.clientes)
+        self.titulares = lanchonete.reservas.titulares()
+        self.reservado = lanchonete.reservas.reservado_por_produto()
+        self.itens_ignorados = dict(lanchonete.itens_ignorados_carga)
+
+    # Conferência de um pedido ou produto (usada no detalhe dos candidatos e na confirmação)
+    def _anomalias_do_pedido(self, pedido: Pedido, ids_clientes, ids_produtos, titulares: dict) -> list[tuple]:
+        anomalias = []
+        itens = pedido.itens
+        soma = sum(item.subtotal_centavos for item in itens)
+        if soma != pedido.valor_total_centavos:
+            anomalias.append(("total_divergente", pedido.id_pedido,
+                              f"total R${formatar_centavos(pedido.valor_total_centavos)}, itens somam R${formatar_centavos(soma)}"))
+        if pedido.id_cliente not in ids_clientes:
+            anomalias.append(("cliente_inexistente", pedido.id_pedido, f"cliente {pedido.id_cliente}"))
+        for item in itens:
+            if item.produto.id_produto not in ids_produtos:
+                anomalias.append(("produto_inexistente", pedido.id_pedido, f"produto {item.produto.id_produto}"))
+        reservas = titulares.get(pedido.id_pedido, {})
+        if pedido.status not in self.FECHADOS:
+            esperado = {item.produto.id_produto: item.quantidade for item in itens}
+            if reservas != esperado:
+                anomalias.append(("reserva_divergente", pedido.id_pedido, f"reservado {reservas}, pedido tem {esperado}"))
+        elif reservas:
+            anomalias.append(("reserva_orfa", pedido.id_pedido, f"pedido '{pedido.status}' ainda reserva {reservas}"))
+        return anomalias
+
+    @staticmethod
+    def _anomalias_do_produto(produto: Produto, reservado: int) -> list[tuple]:
+        anomalias = []
+        if produto.estoque < 0:
+            anomalias.append(("estoque_negativo", produto.id_produto, f"{produto.nome}: estoque {produto.estoque}"))
+        if reservado > 0 and reservado > produto.estoque:
+            anomalias.append(("reserva_acima_do_estoque", produto.id_produto,
+                              f"{produto.nome}: reservado {reservado}, estoque {produto.estoque}"))
+        return anomalias
+
+    # Passagem em bloco
+    def _colunas(self):
+        """Uma linha por pedido (total, cliente, aberto?) e uma por item (pedido, produto, subtotal)."""
+        codigos_clientes, codigos_produtos = {}, {}
+        totais, clientes, abertos = array.array('q'), array.array('l'), array.array('b')
+        item_pedido, item_produto, item_subtotal = array.array('l'), array.array('l'), array.array('q')
+        for i, pedido in enumerate(self.pedidos):
+            totais.append(pedido.valor_total_centavos)
+            clientes.append(codigos_clientes.setdefault(pedido.id_cliente, len(codigos_clientes)))
+            abertos.append(pedido.status not in self.FECHADOS)
+            for item in pedido.itens:
+                item_pedido.append(i)
+                item_produto.append(codigos_produtos.setdefault(item.produto.id_produto, len(codigos_produtos)))
+                item_subtotal.append(item.subtotal_centavos)
+        cliente_ausente = array.array('b', (c not in self.ids_clientes for c in codigos_clientes))
+        produto_ausente = array.array('b', (p not in self.ids_produtos for p in codigos_produtos))
+        return totais, clientes, abertos, item_pedido, item_produto, item_subtotal, cliente_ausente, produto_ausente
+
+    def _candidatos_pedidos(self) -> set:
+        totais, clientes, abertos, item_pedido, item_produto, item_subtotal, cliente_ausente, produto_ausente = self._colunas()
+        # Pedidos fechados que ainda aparecem no livro de reservas
+        candidatos = {i for i, pedido in enumerate(self.pedidos)
+                      if pedido.id_pedido in self.titulares and not abertos[i]} if self.titulares else set()
+
+        if np is not None:
+            linhas_pedido = np.frombuffer(item_pedido, dtype=np.int64) if item_pedido.itemsize == 8 else np.asarray(item_pedido, dtype=np.int64)
+            somas = np.bincount(linhas_pedido, weights=np.asarray(item_subtotal, dtype=np.float64), minlength=len(totais))
+            suspeitos = np.rint(somas).astype(np.int64) != np.frombuffer(totais, dtype=np.int64)
+            if cliente_ausente.count(1):
+                suspeitos |= np.frombuffer(cliente_ausente, dtype=np.int8).astype(bool)[np.asarray(clientes, dtype=np.int64)]
+            if produto_ausente.count(1):
+                ausente = np.frombuffer(produto_ausente, dtype=np.int8).astype(bool)[np.asarray(item_produto, dtype=np.int64)]
+                suspeitos[linhas_pedido[ausente]] = True
+            candidatos.update(np.flatnonzero(suspeitos).tolist())
+        else:
+            somas = [0] * len(totais)
+            for i, subtotal, produto in zip(item_pedido, item_subtotal, item_produto):
+                somas[i] += subtotal
+                if produto_ausente[produto]:
+                    candidatos.add(i)
+            candidatos.update(i for i, (soma, total, cliente) in enumerate(zip(somas, totais, clientes))
+                              if soma != total or cliente_ausente[cliente])
+
+        # Pedidos em aberto: as reservas precisam bater com os itens
+        for i, aberto in enumerate(abertos):
+            if aberto and i not in candidatos:
+                pedido = self.pedidos[i]
+                if self.titulares.get(pedido.id_pedido, {}) != {item.produto.id_produto: item.quantidade for item in pedido.itens}:
+                    candidatos.add(i)
+        return candidatos
+
+    def _candidatos_produtos(self) -> list[int]:
+        reservado = [self.reservado.get(p.id_produto, 0) for p in self.produtos]
+        if np is not None:
+            estoque = np.fromiter((p.estoque for p in self.produtos), dtype=np.int64, count=len(self.produtos))
+            reservado = np.asarray(reservado, dtype=np.int64)
+            return np.flatnonzero((estoque < 0) | ((reservado > 0) & (reservado > estoque))).tolist()
+        return [i for i, (p, r) in enumerate(zip(self.produtos, reservado)) if p.estoque < 0 or 0 < r > p.estoque]
+
+    def executar(self) -> list[tuple]:
+        """Lista de (categoria, chave, detalhe) com tudo o que parece inconsistente."""
+        anomalias = []
+        for i in sorted(self._candidatos_pedidos()):
+            anomalias.extend(self._anomalias_do_pedido(self.pedidos[i], self.ids_clientes, self.ids_produtos, self.titulares))
+        for i in self._candidatos_produtos():
+            produto = self.produtos[i]
+            anomalias.extend(self._anomalias_do_produto(produto, self.reservado.get(produto.id_produto, 0)))
+        for id_pedido, ids_produtos in self.itens_ignorados.items():
+            for id_produto in ids_produtos:
+                anomalias.append(("item_ignorado_na_carga", id_pedido, f"produto {id_produto}"))
+        return anomalias
+
+    def confirmar(self, anomalias: list[tuple]) -> list[tuple]:
+        """Refaz a conferência dos candidatos com os dados atuais (chamar na thread dona da Lanchonete)."""
+        lanchonete = self.lanchonete
+        titulares = lanchonete.reservas.titulares()
+        reservado = lanchonete.reservas.reservado_por_produto()
+        categorias_produto = ("estoque_negativo", "reserva_acima_do_estoque")
+        confirmadas, vistos = [], set()
+        for categoria, chave, detalhe in anomalias:
+            if categoria == "item_ignorado_na_carga":
+                confirmadas.append((categoria, chave, detalhe))
+                continue
+            if (categoria in categorias_produto, chave) in vistos:
+                continue
+            vistos.add((categoria in categorias_produto, chave))
+            if categoria in categorias_produto:
+                produto = lanchonete.cardapio.get(chave)
+                if produto:
+                    confirmadas.extend(self._anomalias_do_produto(produto, reservado.get(chave, 0)))
+            else:
+                pedido = lanchonete.pedidos.get(chave)
+                if pedido:
+                    confirmadas.extend(self._anomalias_do_pedido(pedido, lanchonete.clientes, lanchonete.cardapio, titulares))
+        return confirmadas
+
+    @classmethod
+    def resumir(cls, anomalias: list[tuple], limite: int = None) -> dict:
+        """{categoria: {"descricao", "quantidade", "exemplos"}} só com as categorias que tiveram ocorrências."""
+        limite = cls.LIMITE_EXEMPLOS if limite is None else limite
+        resumo = {}
+        for categoria, chave, detalhe in anomalias:
+            grupo = resumo.setdefault(categoria, {"descricao": cls.CATEGORIAS[categoria], "quantidade": 0, "exemplos": []})
+            grupo["quantidade"] += 1
+            if len(grupo["exemplos"]) < limite:
+                grupo["exemplos"].append(f"{chave}: {detalhe}")
+        return {categoria: resumo[categoria] for categoria in cls.CATEGORIAS if categoria in resumo}
+
+
+# --- Consultas de Pedidos ---
+class IndicePedidos:
+    """Índices dos pedidos em memória: por data de criação, por status e por cliente.
+
+    O índice de data é uma lista ordenada com remoção preguiçosa: cada entrada leva o número
+    de sequência da inserção e só vale enquanto o pedido ainda tiver esse número; quando
+    metade das entradas fica obsoleta, a lista é refeita. Status e cliente são conjuntos de IDs.
+    """
+
+    def __init__(self):
+        self._datas = [] # data_hora_criacao, em ordem
+        self._ids = [] # id_pedido de cada entrada de _datas
+        self._seqs = array.array('q') # sequência de cada entrada de _datas
+        self._obsoletas = 0
+        self._estado = {} # id_pedido -> (data_hora_criacao, status, id_cliente, seq)
+        self._por_status = {}
+        self._por_cliente = {}
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._estado)
+
+    def reconstruir(self, pedidos: dict):
+        self.__init__()
+        for pedido in pedidos.values():
+            self._estado[pedido.id_pedido] = (pedido.data_hora_criacao, pedido.status, pedido.id_cliente, next(self._seq))
+            self._por_status.setdefault(pedido.status, set()).add(pedido.id_pedido)
+            self._por_cliente.setdefault(pedido.id_cliente, set()).add(pedido.id_pedido)
+        self._refazer_datas()
+
+    def _refazer_datas(self):
+        entradas = sorted((data, seq, id_pedido) for id_pedido, (data, _, _, seq) in self._estado.items())
+        self._datas = [e[0] for e in entradas]
+        self._seqs = array.array('q', (e[1] for e in entradas))
+        self._ids = [e[2] for e in entradas]
+        self._obsoletas = 0
+
+    def atualizar(self, id_pedido: str, pedido: Pedido | None):
+        """Reposiciona um pedido alterado (None = removido)."""
+        anterior = self._estado.pop(id_pedido, None)
+        if anterior is not None:
+            data, status, id_cliente, seq = anterior
+            self._por_status[status].discard(id_pedido)
+            self._por_cliente[id_cliente].discard(id_pedido)
+        if pedido is None:
+            if anterior is not None:
+                self._obsoletas += 1
+        elif anterior is not None and anterior[0] == pedido.data_hora_criacao:
+            self._estado[id_pedido] = (data, pedido.status, pedido.id_cliente, seq) # A entrada de data continua valendo
+        else:
+            if anterior is not None:
+                self._obsoletas += 1
+            seq = next(self._seq)
+            self._estado[id_pedido] = (pedido.data_hora_criacao, pedido.status, pedido.id_cliente, seq)
+            posicao = bisect.bisect_right(self._datas, pedido.data_hora_criacao) # Pedidos novos: no fim da lista
+            self._datas.insert(posicao, pedido.data_hora_criacao)
+            self._ids.insert(posicao, id_pedido)
+            self._seqs.insert(posicao, seq)
+        if pedido is not None:
+            self._por_status.setdefault(pedido.status, set()).add(id_pedido)
+            self._por_cliente.setdefault(pedido.id_cliente, set()).add(id_pedido)
+        if self._obsoletas > len(self._datas) // 2:
+            self._refazer_datas()
+
+    def _faixa(self, inicio: datetime = None, fim: datetime = None) -> tuple[int, int]:
+        baixo = bisect.bisect_left(self._datas, inicio) if inicio else 0
+        alto = bisect.bisect_right(self._datas, fim) if fim else len(self._datas)
+        return baixo, alto
+
+    # Estimativas de quantos pedidos cada caminho de acesso lê
+    def estimar_periodo(self, inicio: datetime = None, fim: datetime = None) -> int:
+        baixo, alto = self._faixa(inicio, fim)
+        return alto - baixo
+
+    def estimar_status(self, status) -> int:
+        return sum(len(self._por_status.get(s, ())) for s in status)
+
+    def estimar_cliente(self, id_cliente: str) -> int:
+        return len(self._por_cliente.get(id_cliente, ()))
+
+    # Caminhos de acesso (IDs candidatos; o executor confere todos os filtros no pedido)
+    def ids_no_periodo(self, inicio: datetime = None, fim: datetime = None) -> list[str]:
+        baixo, alto = self._faixa(inicio, fim)
+        estado = self._estado
+        return [id_pedido for id_pedido, seq in zip(self._ids[baixo:alto], self._seqs[baixo:alto])
+                if (atual := estado.get(id_pedido)) is not None and atual[3] == seq]
+
+    def ids_com_status(self, status) -> list[str]:
+        return [id_pedido for s in status for id_pedido in self._por_status.get(s, ())]
+
+    def ids_do_cliente(self, id_cliente: str) -> list[str]:
+        return list(self._por_cliente.get(id_cliente, ()))
+
+
+class ConsultaPedidos:
+    """Consulta declarativa sobre os pedidos em memória ou sobre os itens deles.
+
+    Exemplo: lanchonete.consulta().onde(status="Entregue", inicio=ontem).itens().agrupar("produto", "quantidade", top=5)
+
+    Cada `onde`/`itens`/`usando` devolve uma consulta nova. O planejador escolhe o caminho de acesso
+    que lê menos pedidos (índice de data, de status, de cliente ou varredura completa), conforme
+    as estimativas do IndicePedidos; os filtros são sempre conferidos de novo em cada pedido lido.
+    """
+    CAMINHOS = ("data", "status", "cliente", "varredura")
+    CUSTO_INDICE = 5 # Ler um pedido por índice (busca por ID fora de ordem) custa cerca de cinco passos da varredura
+    CHAVES_GRUPO = ("status", "cliente", "produto", "nome_produto", "dia", "mes", "hora")
+    MEDIDAS = ("contagem", "valor_centavos", "quantidade")
+
+    def __init__(self, lanchonete, filtros: dict = None, nivel: str = "pedidos", caminho: str = None):
+        self.lanchonete = lanchonete
+        self.filtros = filtros or {}
+        self.nivel = nivel
+        self.caminho = caminho
+
+    def _com(self, **mudancas) -> "ConsultaPedidos":
+        atributos = {"filtros": self.filtros, "nivel": self.nivel, "caminho": self.caminho}
+        atributos.update(mudancas)
+        return ConsultaPedidos(self.lanchonete, **atributos)
+
+    def onde(self, status=None, id_cliente: str = None, id_produto: str = None,
+             inicio: datetime = None, fim: datetime = None) -> "ConsultaPedidos":
+        """Filtros combinados com E. 'status' aceita um status ou vários; o período inclui início e fim."""
+        filtros = dict(self.filtros)
+        if status is not None:
+            filtros["status"] = (status,) if isinstance(status, str) else tuple(status)
+        for nome, valor in (("id_cliente", id_cliente), ("id_produto", id_produto), ("inicio", inicio), ("fim", fim)):
+            if valor is not None:
+                filtros[nome] = valor
+        return self._com(filtros=filtros)
+
+    def itens(self) -> "ConsultaPedidos":
+        """Passa a consultar as linhas (pedido, item); com id_produto, só as linhas desse produto."""
+        return self._com(nivel="itens")
+
+    def usando(self, caminho: str) -> "ConsultaPedidos":
+        """Força um caminho de acesso (comparações e benchmarks); o resultado é o mesmo."""
+        if caminho not in self.CAMINHOS:
+            raise ValueError(f"Caminho deve ser um de {', '.join(self.CAMINHOS)}.")
+        return self._com(caminho=caminho)
+
+    # --- Planejamento ---
+    def plano(self) -> tuple[str, int]:
+        """(caminho escolhido, pedidos que ele deve ler)."""
+        indice = self.lanchonete.indice_pedidos()
+        f = self.filtros
+        custos = {"varredura": (len(self.lanchonete.pedidos), len(self.lanchonete.pedidos))}
+        if "inicio" in f or "fim" in f:
+            lidos = indice.estimar_periodo(f.get("inicio"), f.get("fim"))
+            custos["data"] = (lidos * self.CUSTO_INDICE, lidos)
+        if "status" in f:
+            lidos = indice.estimar_status(f["status"])
+            custos["status"] = (lidos * self.CUSTO_INDICE, lidos)
+        if "id_cliente" in f:
+            lidos = indice.estimar_cliente(f["id_cliente"])
+            custos["cliente"] = (lidos * self.CUSTO_INDICE, lidos)
+        if self.caminho:
+            if self.caminho not in custos:
+                raise ValueError(f"A consulta não tem filtro para o caminho '{self.caminho}'.")
+            return self.caminho, custos[self.caminho][1]
+        caminho = min(custos, key=lambda c: custos[c][0])
+        return caminho, custos[caminho][1]
+
+    # --- Execução ---
+    def pedidos(self) -> list[Pedido]:
+        """Os pedidos que atendem a todos os filtros, na ordem do caminho de acesso."""
+        caminho, _ = self.plano()
+        indice = self.lanchonete.indice_pedidos()
+        todos = self.lanchonete.pedidos
+        f = self.filtros
+        if caminho == "varredura":
+            candidatos = todos.values()
+        else:
+            if caminho == "data":
+                ids = indice.ids_no_periodo(f.get("inicio"), f.get("fim"))
+            elif caminho == "status":
+                ids = indice.ids_com_status(f["status"])
+            else:
+                ids = indice.ids_do_cliente(f["id_cliente"])
+            candidatos = [pedido for id_pedido in ids if (pedido := todos.get(id_pedido)) is not None]
+
+        status, id_cliente, id_produto = f.get("status"), f.get("id_cliente"), f.get("id_produto")
+        inicio, fim = f.get("inicio"), f.get("fim")
+        if id_cliente is None and id_produto is None and inicio is None and fim is None:
+            # Caso mais comum (só status, ou nenhum filtro): um teste por pedido
+            if status is None:
+                return list(candidatos)
+            return [pedido for pedido in candidatos if pedido.status in status]
+        resultado = []
+        for pedido in candidatos:
+            if status is not None and pedido.status not in status:
+                continue
+            if id_cliente is not None and pedido.id_cliente != id_cliente:
+                continue
+            if inicio is not None and pedido.data_hora_criacao < inicio:
+                continue
+            if fim is not None and pedido.data_hora_criacao > fim:
+                continue
+            if id_produto is not None and pedido.linha(id_produto) is None:
+                continue
+            resultado.append(pedido)
+        return resultado
+
+    def _itens_de(self):
+        """Função pedido -> itens considerados (com id_produto, só a linha desse produto)."""
+        id_produto = self.filtros.get("id_produto")
+        if id_produto is None:
+            return operator.attrgetter("itens")
+        return lambda pedido: (pedido.linha(id_produto),)
+
+    def linhas(self):
+        """Gera (pedido, item) dos pedidos que atendem aos filtros."""
+        itens_de = self._itens_de()
+        for pedido in self.pedidos():
+            for item in itens_de(pedido):
+                yield pedido, item
+
+    def listar(self, mais_recentes_primeiro: bool = True, limite: int = None) -> list:
+        """Pedidos (ou linhas (pedido, item)) por data de criação."""
+        if self.nivel == "itens":
+            resultado = list(self.linhas())
+            resultado.sort(key=lambda linha: linha[0].data_hora_criacao, reverse=mais_recentes_primeiro)
+        else:
+            resultado = self.pedidos()
+            resultado.sort(key=operator.attrgetter("data_hora_criacao"), reverse=mais_recentes_primeiro)
+        return resultado[:limite] if limite else resultado
+
+    def _medida(self, medida: str):
+        """Valor somado por registro (pedido ou item); None = contagem."""
+        if medida not in self.MEDIDAS:
+            raise ValueError(f"Medida deve ser uma de {', '.join(self.MEDIDAS)}.")
+        if medida == "contagem":
+            return None
+        if self.nivel == "itens":
+            return operator.attrgetter("subtotal_centavos" if medida == "valor_centavos" else "quantidade")
+        if medida == "valor_centavos":
+            return operator.attrgetter("valor_total_centavos")
+        return lambda pedido: sum(item.quantidade for item in pedido.itens)
+
+    def contar(self) -> int:
+        return self.somar("contagem")
+
+    def _itens_dos(self, pedidos: list[Pedido]) -> list:
+        """Todos os itens considerados dos pedidos, na ordem dos pedidos."""
+        id_produto = self.filtros.get("id_produto")
+        if id_produto is None:
+            return list(itertools.chain.from_iterable(map(operator.attrgetter("itens"), pedidos)))
+        return [pedido.linha(id_produto) for pedido in pedidos]
+
+    def somar(self, medida: str) -> int:
+        medir = self._medida(medida)
+        registros = self.pedidos()
+        if self.nivel == "itens":
+            registros = self._itens_dos(registros)
+        return len(registros) if medir is None else sum(map(medir, registros))
+
+    def _grupo(self, chave: str):
+        """(grupo do pedido, grupo do item): só um dos dois é usado, conforme a chave."""
+        if chave not in self.CHAVES_GRUPO:
+            raise ValueError(f"Agrupamento deve ser um de {', '.join(self.CHAVES_GRUPO)}.")
+        if chave in ("produto", "nome_produto"):
+            if self.nivel != "itens":
+                raise ValueError(f"Agrupar por '{chave}' exige consultar os itens (.itens()).")
+            return None, operator.attrgetter("produto.id_produto" if chave == "produto" else "produto.nome")
+        return {
+            "status": operator.attrgetter("status"),
+            "cliente": operator.attrgetter("id_cliente"),
+            "dia": lambda pedido: pedido.data_hora_criacao.date().isoformat(),
+            "mes": lambda pedido: pedido.data_hora_criacao.strftime("%Y-%m"),
+            "hora": lambda pedido: pedido.data_hora_criacao.hour,
+        }[chave], None
+
+    def agrupar(self, chave: str, medida: str = "contagem", top: int = None) -> list[tuple]:
+        """[(grupo, total)] do maior para o menor total (empates pelo grupo); 'top' limita o tamanho."""
+        grupo_do_pedido, grupo_do_item = self._grupo(chave)
+        medir = self._medida(medida)
+        # Getters em C (attrgetter + map) em vez de um laço Python por linha
+        pedidos = self.pedidos()
+        if self.nivel == "pedidos":
+            registros, grupos = pedidos, map(grupo_do_pedido, pedidos)
+        else:
+            registros = self._itens_dos(pedidos)
+            if grupo_do_item:
+                grupos = map(grupo_do_item, registros)
+            else:
+                itens_de = self._itens_de()
+                grupos = (grupo for pedido in pedidos
+                          for grupo in itertools.repeat(grupo_do_pedido(pedido), len(itens_de(pedido))))
+        valores = itertools.repeat(1) if medir is None else map(medir, registros)
+        totais = {}
+        for grupo, valor in zip(grupos, valores):
+            totais[grupo] = totais.get(grupo, 0) + valor
+        ordenar = lambda par: (-par[1], par[0])
+        if top is not None:
+            return heapq.nsmallest(top, totais.items(), key=ordenar)
+        return sorted(totais.items(), key=ordenar)
+
 class Lanchonete:
-    def __init__(self, nome: str):
+    TAMANHO_LOTE_CARGA = 20000
+    ERRO_CARGA = 3 # Código de saída dos scripts quando o arquivo não carrega (o 2 é do argparse)
+
+    def __init__(self, nome: str, alocador_ids: AlocadorIdsPedido = None, arquivo_dados: str = "lanchonete_dados.json",
+                 carregar: bool = True):
         self.nome = nome
+        # Substituível, ex.: AlocadorPorBlocos para vários terminais
+        self.alocador_ids = alocador_ids if alocador_ids is not None else AlocadorSequencial()
         self.cardapio = {}
         self.clientes = {}
         self.pedidos = {}
-        self.ARQUIVO_DADOS = "lanchonete_dados.json"
-        self.carregar_dados()
+        self.resumos_diarios = {} # "AAAA-MM-DD" -> totais dos pedidos já compactados daquele dia
+        self.nomes_resumidos = {} # id_produto -> nome, para produtos dos resumos que saírem do cardápio
+        self.arquivos_pedidos = {} # caminho do arquivo colunar -> {"inicio", "fim", "pedidos"}
+        self._leitores_arquivo = {} # caminho -> ArquivoPedidos aberto (mmap), criado na primeira consulta
+        self.ARQUIVO_DADOS = arquivo_dados
+        self.reservas = ReservaEstoque(self.cardapio)
+        self.fila_cozinha = FilaCozinha()
+        self.indice_clientes = IndiceClientes()
+        self.vigia_estoque = VigiaEstoque()
+        self.promocoes = MotorPromocoes()
+        self.tempos_status = TemposPorStatus()
+        self.painel = PainelVendas()
+        self.itens_ignorados_carga = {} # id_pedido -> ids de produtos descartados na carga por não estarem no cardápio
+        self._indice_pedidos = IndicePedidos()
+        self._indice_pedidos_valido = True
+        self._pedidos_alterados = set() # Reindexados na próxima consulta
+        self.feed = FeedAlteracoes()
+        self._semeando_feed = False # Carga de arquivo sem feed: os pedidos entram no feed conforme chegam
+        self.versoes_origem = {} # id_origem de outra instância -> última versão do feed dela já aplicada aqui
+        self._origem_aplicada = None # Origem do lote sendo aplicado (as alterações entram no feed com ela)
+        self._diario = None # Registro de desfazer da transação em andamento (None fora de transação)
+        self._salvamento_pendente = False
+        # Com carregar=False quem cria a Lanchonete faz a carga (ex.: em segundo plano, com etapas_carga)
+        self.carga_em_andamento = True
+        self._salvar_apos_carga = False
+        if carregar:
+            self.carregar_dados()
+
+    # --- Transações ---
+    @contextmanager
+    def transacao(self, exigir_gravacao: bool = False):
+        """Agrupa alterações em memória e grava o arquivo uma única vez ao final.
+
+        Qualquer exceção dentro do bloco (por exemplo ErroTransacao) desfaz todas as
+        alterações feitas desde o início da transação. Transações aninhadas funcionam
+        como pontos de salvamento: desfazem só o próprio trecho e participam do commit
+        da transação mais externa. Com exigir_gravacao, a gravação do arquivo faz parte
+        do commit: se ela falhar, o OSError sobe e as alterações em memória são desfeitas.
+        """
+        if self._diario is not None:
+            marca = len(self._diario)
+            try:
+                yield self
+            except BaseException:
+                self._desfazer_ate(marca)
+                raise
+            return
+
+        self._diario = []
+        self._guardados = set()
+        self._salvamento_pendente = False
+        try:
+            yield self
+            self._validar_transacao()
+            # O feed só recebe as alterações confirmadas: um trecho desfeito não vira exclusão para quem sincroniza
+            alteracoes_feed = [registro[1:] for registro in self._diario if registro[0] == "feed"]
+            estado_feed = self.feed.estado() if exigir_gravacao and alteracoes_feed else None
+            for tipo, chave, origem in alteracoes_feed:
+                self.feed.registrar(tipo, chave, origem)
+            if exigir_gravacao and self._salvamento_pendente:
+                self._salvamento_pendente = False
+                try:
+                    self._gravar_dados()
+                except BaseException:
+                    if estado_feed is not None:
+                        self.feed.restaurar(estado_feed)
+                    raise
+        except BaseException:
+            self._desfazer_ate(0)
+            self._salvamento_pendente = False
+            raise
+        finally:
+            self._diario = None
+            self._guardados = set()
+
+        if self._salvamento_pendente:
+            self._salvamento_pendente = False
+            self.salvar_dados()
+
+    def _anotar_alteracao(self, colecao: dict, chave: str):
+        if colecao is self.pedidos:
+            self._pedidos_alterados.add(chave)
+        tipo = "produto" if colecao is self.cardapio else "cliente" if colecao is self.clientes else \
+            "pedido" if colecao is self.pedidos else None
+        if tipo:
+            self._registrar_no_feed(tipo, chave)
+
+    def _registrar_no_feed(self, tipo: str, chave: str):
+        """Dentro de uma transação, a alteração só entra no feed no commit."""
+        if self._diario is None:
+            self.feed.registrar(tipo, chave, self._origem_aplicada)
+        elif self.feed.ativo:
+            self._diario.append(("feed", tipo, chave, self._origem_aplicada))
+
+    def _guardar(self, objeto):
+        """Registra o estado de um objeto antes da primeira alteração dentro da transação."""
+        if isinstance(objeto, Produto):
+            self._registrar_no_feed("produto", objeto.id_produto)
+        elif isinstance(objeto, Cliente):
+            self._registrar_no_feed("cliente", objeto.id_cliente)
+        elif isinstance(objeto, Pedido):
+            self._registrar_no_feed("pedido", objeto.id_pedido)
+            self._pedidos_alterados.add(objeto.id_pedido)
+        if self._diario is None or id(objeto) in self._guardados:
+            return
+        self._guardados.add(id(objeto))
+        estado = dict(objeto.__dict__)
+        if isinstance(objeto, Pedido):
+            estado["_linhas"] = dict(objeto._linhas)
+            itens = [(item, dict(item.__dict__)) for item in objeto._linhas.values()]
+        else:
+            itens = []
+        self._diario.append(("objeto", objeto, estado, itens))
+
+    def _guardar_chave(self, colecao: dict, chave: str):
+        self._anotar_alteracao(colecao, chave)
+        if self._diario is not None:
+            self._diario.append(("chave", colecao, chave, colecao.get(chave, _AUSENTE)))
+
+    def _ao_desfazer(self, acao):
+        if self._diario is not None:
+            self._diario.append(("acao", acao))
+
+    def _validar_transacao(self):
+        for registro in self._diario:
+            if registro[0] != "objeto":
+                continue
+            objeto = registro[1]
+            if isinstance(objeto, Produto) and objeto.estoque < 0:
+                raise ErroTransacao(f"Estoque de '{objeto.nome}' ficaria negativo ({objeto.estoque}).")
+            if isinstance(objeto, Pedido) and objeto.id_pedido in self.pedidos and objeto.id_cliente not in self.clientes:
+                raise ErroTransacao(f"Pedido {objeto.id_pedido} referencia cliente inexistente '{objeto.id_cliente}'.")
+        for registro in self._diario:
+            if registro[0] == "chave" and registro[1] is self.pedidos:
+                pedido = self.pedidos.get(registro[2])
+                if pedido is not None and pedido.id_cliente not in self.clientes:
+                    raise ErroTransacao(f"Pedido {pedido.id_pedido} referencia cliente inexistente '{pedido.id_cliente}'.")
+
+    def _desfazer_ate(self, marca: int):
+        pedidos_afetados = set()
+        clientes_afetados = set()
+        produtos_afetados = set()
+        for registro in reversed(self._diario[marca:]):
+            tipo = registro[0]
+            if tipo == "objeto":
+                _, objeto, estado, itens = registro
+                self._guardados.discard(id(objeto))
+                objeto.__dict__.clear()
+                objeto.__dict__.update(estado)
+                for item, estado_item in itens:
+                    item.__dict__.clear()
+                    item.__dict__.update(estado_item)
+                if isinstance(objeto, Pedido):
+                    pedidos_afetados.add(objeto.id_pedido)
+                elif isinstance(objeto, Cliente):
+                    clientes_afetados.add(objeto.id_cliente)
+                elif isinstance(objeto, Produto):
+                    produtos_afetados.add(objeto.id_produto)
+            elif tipo == "chave":
+                _, colecao, chave, anterior = registro
+                if anterior is _AUSENTE:
+                    colecao.pop(chave, None)
+                else:
+                    colecao[chave] = anterior
+                if colecao is self.pedidos:
+                    pedidos_afetados.add(chave)
+                elif colecao is self.clientes:
+                    clientes_afetados.add(chave)
+                elif colecao is self.cardapio:
+                    produtos_afetados.add(chave)
+            elif tipo == "acao":
+                registro[1]() # Registros "feed" só valem no commit: basta descartá-los
+        # Números de pedido já alocados não são devolvidos: lacunas são aceitáveis, repetições não
+        del self._diario[marca:]
+        for id_pedido in pedidos_afetados:
+            pedido = self.pedidos.get(id_pedido)
+            if pedido is None:
+                self.fila_cozinha.remover(id_pedido)
+            else:
+                self.fila_cozinha.atualizar(pedido)
+        for id_cliente in clientes_afetados:
+            cliente = self.clientes.get(id_cliente)
+            if cliente is None:
+                self.indice_clientes.remover(id_cliente)
+            else:
+                self.indice_clientes.atualizar(cliente)
+        for id_produto in produtos_afetados:
+            produto = self.cardapio.get(id_produto)
+            if produto is None:
+                self.vigia_estoque.remover(id_produto)
+            else:
+                self.vigia_estoque.verificar(produto)
 
     # --- Validações ---
     def _validar_id(self, id_str: str) -> bool:
-        return bool(re.fullmatch(r'^[a-zA-Z0-9]+$', id_str))
+        return bool(PADRAO_ID.fullmatch(id_str))
 
     def _validar_telefone(self, tel_str: str) -> bool:
-        return bool(re.fullmatch(r'^\d{8,15}$', tel_str))
+        return bool(PADRAO_TELEFONE.fullmatch(tel_str))
 
     # --- Métodos de Produto ---
+    @instrumentado
     def adicionar_produto(self, produto: Produto):
         if not self._validar_id(produto.id_produto):
             return False, "Erro: ID do produto inválido. Use apenas caracteres alfanuméricos."
         if produto.id_produto in self.cardapio:
             return False, f"Erro: Produto com ID '{produto.id_produto}' já existe no cardápio."
-        if produto.preco <= 0:
+        if produto.preco_centavos <= 0:
             return False, "Erro: Preço do produto deve ser maior que zero."
         if produto.estoque < 0:
             return False, "Erro: Estoque inicial não pode ser negativo."
+        if produto.estoque_minimo < 0:
+            return False, "Erro: Estoque mínimo não pode ser negativo."
 
+        self._guardar_chave(self.cardapio, produto.id_produto)
         self.cardapio[produto.id_produto] = produto
+        self.vigia_estoque.verificar(produto)
         self.salvar_dados()
         return True, f"Produto '{produto.nome}' adicionado ao cardápio."
 
+    @instrumentado
     def remover_produto(self, id_produto: str):
         if id_produto in self.cardapio:
+            self._guardar_chave(self.cardapio, id_produto)
             produto_removido = self.cardapio.pop(id_produto)
+            self.vigia_estoque.remover(id_produto)
             self.salvar_dados()
             return True, f"Produto '{produto_removido.nome}' removido do cardápio."
         return False, f"Erro: Produto com ID '{id_produto}' não encontrado no cardápio."
 
-    def atualizar_produto_info(self, id_produto: str, nome: str = None, preco: float = None, estoque: int = None) -> tuple[bool, str]:
+    @instrumentado
+    def atualizar_produto_info(self, id_produto: str, nome: str = None, preco_centavos: int = None, estoque: int = None,
+                               estacao: str = None, estoque_minimo: int = None) -> tuple[bool, str]:
         produto = self.cardapio.get(id_produto)
         if produto:
             if nome is not None and not nome.strip():
                 return False, "Erro: Nome do produto não pode ser vazio."
-            if preco is not None and preco <= 0:
+            if preco_centavos is not None and preco_centavos <= 0:
                 return False, "Erro: Preço deve ser maior que zero."
             if estoque is not None and estoque < 0:
                 return False, "Erro: Estoque não pode ser negativo."
+            if estoque_minimo is not None and estoque_minimo < 0:
+                return False, "Erro: Estoque mínimo não pode ser negativo."
             
-            produto.atualizar_info(nome, preco, estoque)
+            self._guardar(produto)
+            produto.atualizar_info(nome, preco_centavos, estoque, estacao, estoque_minimo)
+            self.vigia_estoque.verificar(produto)
             self.salvar_dados()
             return True, f"Informações do produto '{produto.id_produto}' atualizadas."
         return False, f"Erro: Produto com ID '{id_produto}' não encontrado."
 
+    @instrumentado
     def atualizar_disponibilidade_produto(self, id_produto: str, disponivel: bool):
         produto = self.cardapio.get(id_produto)
         if produto:
+            self._guardar(produto)
             produto.atualizar_disponibilidade(disponivel)
             self.salvar_dados()
             return True, f"Disponibilidade de '{produto.nome}' atualizada para: {disponivel}"
         return False, f"Erro: Produto com ID '{id_produto}' não encontrado."
 
+    @instrumentado
     def exibir_cardapio(self):
         if not self.cardapio:
             return "Cardápio vazio."
         return "\n".join([str(p) for p in self.cardapio.values()])
 
     # --- Métodos de Cliente ---
+    @instrumentado
     def cadastrar_cliente(self, cliente: Cliente):
         if not self._validar_id(cliente.id_cliente):
             return False, "Erro: ID do cliente inválido. Use apenas caracteres alfanuméricos."
@@ -264,13 +2662,17 @@ class Lanchonete:
         if not self._validar_telefone(cliente.telefone):
             return False, "Erro: Telefone inválido. Use apenas dígitos (8 a 15 caracteres)."
 
+        self._guardar_chave(self.clientes, cliente.id_cliente)
         self.clientes[cliente.id_cliente] = cliente
+        self.indice_clientes.adicionar(cliente)
         self.salvar_dados()
         return True, f"Cliente '{cliente.nome}' cadastrado com sucesso."
 
+    @instrumentado
     def buscar_cliente(self, id_cliente: str):
         return self.clientes.get(id_cliente)
 
+    @instrumentado
     def atualizar_info_cliente(self, id_cliente: str, nome: str = None, telefone: str = None, endereco: str = None):
         cliente = self.buscar_cliente(id_cliente)
         if cliente:
@@ -279,25 +2681,34 @@ class Lanchonete:
             if telefone is not None and not self._validar_telefone(telefone):
                 return False, "Erro: Telefone inválido. Use apenas dígitos (8 a 15 caracteres)."
 
+            self._guardar(cliente)
             cliente.atualizar_info(nome, telefone, endereco)
+            self.indice_clientes.atualizar(cliente)
             self.salvar_dados()
             return True, f"Informações do cliente '{cliente.nome}' atualizadas."
         return False, f"Erro: Cliente com ID '{id_cliente}' não encontrado."
 
+    @instrumentado
     def listar_clientes(self):
         if not self.clientes:
             return "Nenhum cliente cadastrado."
         return "\n".join([str(c) for c in self.clientes.values()])
 
     # --- Métodos de Pedido ---
+    @instrumentado
     def criar_pedido(self, id_cliente: str) -> tuple[bool, str, Pedido | None]:
         if id_cliente not in self.clientes:
             return False, f"Erro: Cliente com ID '{id_cliente}' não encontrado.", None
-        novo_pedido = Pedido(id_cliente)
+        novo_pedido = Pedido(id_cliente, formatar_id_pedido(self.alocador_ids.proximo()))
+        self._guardar_chave(self.pedidos, novo_pedido.id_pedido)
         self.pedidos[novo_pedido.id_pedido] = novo_pedido
+        self.fila_cozinha.atualizar(novo_pedido)
+        self.painel.pedido_criado(novo_pedido.data_hora_criacao)
+        self._ao_desfazer(lambda: self.painel.pedido_criado(novo_pedido.data_hora_criacao, -1))
         self.salvar_dados()
         return True, f"Pedido {novo_pedido.id_pedido} criado para o cliente '{self.clientes[id_cliente].nome}'.", novo_pedido
 
+    @instrumentado
     def adicionar_item_a_pedido(self, id_pedido: str, id_produto: str, quantidade: int) -> tuple[bool, str]:
         pedido = self.pedidos.get(id_pedido)
         if not pedido:
@@ -309,142 +2720,1458 @@ class Lanchonete:
         if quantidade <= 0:
             return False, "Erro: Quantidade do item deve ser maior que zero."
 
+        reservar = pedido.status not in ("Entregue", "Cancelado")
+        if reservar:
+            reservado, message = self._reservar(id_pedido, id_produto, quantidade)
+            if not reservado:
+                return False, message
+
+        self._guardar(pedido)
         success, message = pedido.adicionar_item(produto, quantidade)
         if success:
+            self.fila_cozinha.atualizar(pedido)
             self.salvar_dados()
             return True, f"Item '{produto.nome}' (x{quantidade}) adicionado ao pedido {id_pedido}."
         else:
+            if reservar:
+                self._liberar(id_pedido, id_produto, quantidade)
             return False, message
 
+    @instrumentado
     def remover_item_de_pedido(self, id_pedido: str, id_produto: str) -> tuple[bool, str]:
         pedido = self.pedidos.get(id_pedido)
         if not pedido:
             return False, f"Erro: Pedido com ID '{id_pedido}' não encontrado."
+        self._guardar(pedido)
         if pedido.remover_item(id_produto):
+            self._liberar(id_pedido, id_produto)
+            self.fila_cozinha.atualizar(pedido)
             self.salvar_dados()
             return True, f"Item '{id_produto}' removido do pedido {id_pedido}."
         return False, f"Produto com ID '{id_produto}' não encontrado no pedido {id_pedido}."
 
+    @instrumentado
     def atualizar_status_pedido(self, id_pedido: str, novo_status: str) -> tuple[bool, str]:
         pedido = self.pedidos.get(id_pedido)
         if not pedido:
             return False, f"Erro: Pedido com ID '{id_pedido}' não encontrado."
+        status_anterior, entrada, agora = pedido.status, pedido.entrada_no_status(), datetime.now()
         
-        if novo_status == "Entregue" and pedido.status != "Entregue":
-            for item in pedido.itens:
-                produto = self.cardapio.get(item.produto.id_produto)
-                if produto:
-                    if produto.estoque < item.quantidade:
-                        return False, f"Erro: Estoque insuficiente de '{produto.nome}' para finalizar pedido. Restam {produto.estoque}, pedido requer {item.quantidade}."
-                    produto.estoque -= item.quantidade
-                else:
-                    return False, f"Erro: Produto '{item.produto.id_produto}' não encontrado no cardápio para dedução de estoque."
-            self.salvar_dados()
-        
-        if pedido.atualizar_status(novo_status):
-            self.salvar_dados()
-            return True, f"Status do pedido {id_pedido} atualizado para '{novo_status}'."
-        return False, f"Erro ao atualizar status: Status '{novo_status}' inválido."
+        # Baixa de estoque e mudança de status são aplicadas juntas ou não são aplicadas
+        try:
+            with self.transacao():
+                if novo_status == "Entregue" and pedido.status != "Entregue":
+                    # Garante que todas as linhas estão reservadas antes de baixar o estoque
+                    for item in pedido.itens:
+                        id_produto = item.produto.id_produto
+                        if id_produto not in self.cardapio:
+                            raise ErroTransacao(f"Erro: Produto '{id_produto}' não encontrado no cardápio para dedução de estoque.")
+                        faltante = item.quantidade - self.reservas.quantidade_reservada(id_pedido, id_produto)
+                        if faltante > 0:
+                            self._reservar(id_pedido, id_produto, faltante, forcar=True)
+                    success, message = self._confirmar_reservas(id_pedido)
+                    if not success:
+                        raise ErroTransacao(message)
+                elif novo_status == "Cancelado" and pedido.status != "Cancelado":
+                    self._liberar(id_pedido)
+                elif pedido.status == "Cancelado" and novo_status in ("Pendente", "Em Preparo", "Pronto"):
+                    for item in pedido.itens:
+                        success, message = self._reservar(id_pedido, item.produto.id_produto, item.quantidade)
+                        if not success:
+                            raise ErroTransacao(message)
+
+                self._guardar(pedido)
+                if not pedido.atualizar_status(novo_status, agora):
+                    raise ErroTransacao(f"Erro ao atualizar status: Status '{novo_status}' inválido.")
+                self.fila_cozinha.atualizar(pedido)
+                if (novo_status == "Entregue") != (status_anterior == "Entregue"):
+                    if novo_status == "Entregue":
+                        desfazer = self.painel.pedido_entregue(pedido, agora)
+                    else: # Sem o registro da transição (arquivos antigos), vale o horário de criação
+                        desfazer = self.painel.pedido_entregue(pedido, entrada or pedido.data_hora_criacao, -1)
+                    self._ao_desfazer(desfazer)
+                self.salvar_dados()
+        except ErroTransacao as e:
+            return False, str(e)
+        if novo_status != status_anterior and entrada is not None:
+            self.tempos_status.registrar(status_anterior, entrada, (agora - entrada).total_seconds(),
+                                         TemposPorStatus.mix_do_pedido(pedido))
+        return True, f"Status do pedido {id_pedido} atualizado para '{novo_status}'."
+
+    @instrumentado
+    def definir_prioridade_pedido(self, id_pedido: str, prioritario: bool) -> tuple[bool, str]:
+        pedido = self.pedidos.get(id_pedido)
+        if not pedido:
+            return False, f"Erro: Pedido com ID '{id_pedido}' não encontrado."
+        self._guardar(pedido)
+        pedido.prioritario = prioritario
+        self.fila_cozinha.atualizar(pedido)
+        self.salvar_dados()
+        return True, f"Pedido {id_pedido} {'marcado como prioritário' if prioritario else 'sem prioridade'}."
 
+    # --- Reservas de estoque (registradas para desfazer em transações) ---
+    def _reservar(self, titular: str, id_produto: str, quantidade: int, forcar: bool = False) -> tuple[bool, str]:
+        success, message = self.reservas.reservar(titular, id_produto, quantidade, forcar=forcar)
+        if success:
+            self._ao_desfazer(lambda: self.reservas.liberar(titular, id_produto, quantidade))
+        return success, message
+
+    def _liberar(self, titular: str, id_produto: str = None, quantidade: int = None):
+        if id_produto is None:
+            linhas = self.reservas.linhas(titular)
+            self.reservas.liberar(titular)
+        else:
+            linhas = {id_produto: self.reservas.liberar(titular, id_produto, quantidade)}
+        self._ao_desfazer(lambda: self._restaurar_reservas(titular, linhas))
+
+    def _restaurar_reservas(self, titular: str, linhas: dict):
+        for id_produto, quantidade in linhas.items():
+            if quantidade:
+                self.reservas.reservar(titular, id_produto, quantidade, forcar=True)
+
+    def _confirmar_reservas(self, titular: str) -> tuple[bool, str]:
+        linhas = self.reservas.linhas(titular)
+        for id_produto in linhas:
+            self._guardar(self.cardapio[id_produto])
+        success, message = self.reservas.confirmar(titular)
+        if success:
+            self._ao_desfazer(lambda: self._restaurar_reservas(titular, linhas))
+            for id_produto in linhas:
+                self.vigia_estoque.verificar(self.cardapio[id_produto])
+        return success, message
+
+    @instrumentado
+    def transferir_reservas(self, origem: str, destino: str):
+        linhas = self.reservas.linhas(origem)
+        self.reservas.transferir(origem, destino)
+        def desfazer():
+            for id_produto, quantidade in linhas.items():
+                self.reservas.liberar(destino, id_produto, quantidade)
+            self._restaurar_reservas(origem, linhas)
+        self._ao_desfazer(desfazer)
+
+    @instrumentado
     def buscar_pedido(self, id_pedido: str):
         return self.pedidos.get(id_pedido)
 
-    # --- Métodos de Relatório ---
-    def relatorio_total_vendas_por_periodo(self, data_inicio: datetime = None, data_fim: datetime = None) -> float:
-        total = 0.0
-        for pedido in self.pedidos.values():
-            if pedido.status == "Entregue":
-                if data_inicio and pedido.data_hora_criacao < data_inicio:
-                    continue
-                if data_fim and pedido.data_hora_criacao > data_fim:
+    # --- Importação em Lote ---
+    TAMANHO_LOTE_IMPORTACAO = 5000
+
+    @instrumentado
+    def importar_lote(self, caminho: str, tipo: str) -> tuple[int, list[tuple[int, str]]]:
+        """Importa produtos, clientes ou pedidos históricos de um arquivo CSV ou JSON Lines.
+
+        Os registros são lidos em fluxo e validados em lotes; linhas inválidas são
+        relatadas como (número da linha, mensagem) e as válidas são gravadas juntas,
+        com uma única escrita do arquivo de dados.
+        """
+        importadores = {
+            "produtos": self._importar_lote_produtos,
+            "clientes": self._importar_lote_clientes,
+            "pedidos": self._importar_lote_pedidos,
+        }
+        if tipo not in importadores:
+            raise ValueError(f"Tipo de importação desconhecido: '{tipo}'.")
+
+        erros = []
+        importados = 0
+        with self.transacao():
+            registros = self._ler_registros_importacao(caminho, erros)
+            if tipo == "pedidos":
+                registros = self._agrupar_linhas_pedido(registros)
+            lote = []
+            for registro in registros:
+                lote.append(registro)
+                if len(lote) >= self.TAMANHO_LOTE_IMPORTACAO:
+                    importados += importadores[tipo](lote, erros)
+                    lote = []
+            if lote:
+                importados += importadores[tipo](lote, erros)
+            if importados:
+                self.salvar_dados()
+        erros.sort()
+        return importados, erros
+
+    @staticmethod
+    def _ler_registros_importacao(caminho: str, erros: list):
+        """Gera (número da linha, dicionário) a partir de um arquivo .csv ou .jsonl."""
+        extensao = os.path.splitext(caminho)[1].lower()
+        with open(caminho, 'r', encoding='utf-8-sig', newline='') as f:
+            if extensao in (".jsonl", ".ndjson", ".json"):
+                for numero, linha in enumerate(f, start=1):
+                    if not linha.strip():
+                        continue
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError as e:
+                        erros.append((numero, f"JSON inválido: {e}"))
+                        continue
+                    if not isinstance(registro, dict):
+                        erros.append((numero, "Cada linha deve conter um objeto JSON."))
+                        continue
+                    yield numero, registro
+            else:
+                amostra = f.read(4096)
+                f.seek(0)
+                try:
+                    dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+                except csv.Error:
+                    dialeto = csv.excel
+                leitor = csv.DictReader(f, dialect=dialeto)
+                for registro in leitor:
+                    yield leitor.line_num, {chave.strip(): (valor.strip() if isinstance(valor, str) else valor)
+                                            for chave, valor in registro.items() if chave}
+
+    @staticmethod
+    def _agrupar_linhas_pedido(registros):
+        """No CSV cada linha é um item; linhas consecutivas do mesmo pedido viram um registro só."""
+        atual = None
+        for numero, registro in registros:
+            if "itens" in registro:
+                if atual:
+                    yield atual
+                    atual = None
+                yield numero, registro
+                continue
+            id_pedido = registro.get("id_pedido")
+            if atual and atual[1]["id_pedido"] == id_pedido:
+                atual[1]["itens"].append({"produto_id": registro.get("produto_id"), "quantidade": registro.get("quantidade")})
+                continue
+            if atual:
+                yield atual
+            pedido = {chave: valor for chave, valor in registro.items() if chave not in ("produto_id", "quantidade")}
+            pedido["itens"] = [{"produto_id": registro.get("produto_id"), "quantidade": registro.get("quantidade")}]
+            atual = (numero, pedido)
+        if atual:
+            yield atual
+
+    @staticmethod
+    def _converter_bool(valor) -> bool:
+        if isinstance(valor, bool):
+            return valor
+        if valor is None or valor == "":
+            return True
+        return str(valor).strip().lower() in ("1", "true", "sim", "s", "yes", "y", "verdadeiro")
+
+    @staticmethod
+    def _converter_centavos(valor) -> int:
+        """Valor já em centavos (campos *_centavos do arquivo de dados): inteiro ou texto com dígitos."""
+        if isinstance(valor, bool) or not isinstance(valor, (int, str)):
+            raise ValueError(f"Valor em centavos inválido: '{valor}'.")
+        return int(valor)
+
+    def _registrar_insercoes(self, colecao: dict, chaves: list):
+        for chave in chaves:
+            self._anotar_alteracao(colecao, chave)
+        if chaves:
+            self._ao_desfazer(lambda: [colecao.pop(chave, None) for chave in chaves])
+
+    def _importar_lote_produtos(self, lote: list, erros: list) -> int:
+        validar_id = PADRAO_ID.fullmatch
+        novos = {}
+        for numero, registro in lote:
+            id_produto = str(registro.get("id_produto") or "").strip()
+            nome = str(registro.get("nome") or "").strip()
+            if not validar_id(id_produto):
+                erros.append((numero, "ID do produto inválido. Use apenas caracteres alfanuméricos."))
+                continue
+            if id_produto in self.cardapio or id_produto in novos:
+                erros.append((numero, f"Produto com ID '{id_produto}' já existe no cardápio."))
+                continue
+            if not nome:
+                erros.append((numero, "Nome do produto não pode ser vazio."))
+                continue
+            try:
+                preco_centavos = centavos(registro.get("preco", ""))
+                estoque = int(registro.get("estoque") or 0)
+                estoque_minimo = int(registro.get("estoque_minimo") or 0)
+            except (TypeError, ValueError):
+                erros.append((numero, "Preço ou estoque inválido."))
+                continue
+            if preco_centavos <= 0:
+                erros.append((numero, "Preço do produto deve ser maior que zero."))
+                continue
+            if estoque < 0 or estoque_minimo < 0:
+                erros.append((numero, "Estoque inicial e estoque mínimo não podem ser negativos."))
+                continue
+            novos[id_produto] = Produto(id_produto, nome, preco_centavos, self._converter_bool(registro.get("disponivel")), estoque,
+                                        str(registro.get("estacao") or "Cozinha"), estoque_minimo)
+        self.cardapio.update(novos)
+        self._registrar_insercoes(self.cardapio, list(novos))
+        for produto in novos.values():
+            self.vigia_estoque.verificar(produto)
+        self._ao_desfazer(lambda: [self.vigia_estoque.remover(id_produto) for id_produto in novos])
+        return len(novos)
+
+    def _importar_lote_clientes(self, lote: list, erros: list) -> int:
+        validar_id = PADRAO_ID.fullmatch
+        validar_telefone = PADRAO_TELEFONE.fullmatch
+        novos = {}
+        for numero, registro in lote:
+            id_cliente = str(registro.get("id_cliente") or "").strip()
+            nome = str(registro.get("nome") or "").strip()
+            telefone = str(registro.get("telefone") or "").strip()
+            if not validar_id(id_cliente):
+                erros.append((numero, "ID do cliente inválido. Use apenas caracteres alfanuméricos."))
+                continue
+            if id_cliente in self.clientes or id_cliente in novos:
+                erros.append((numero, f"Cliente com ID '{id_cliente}' já cadastrado."))
+                continue
+            if not nome:
+                erros.append((numero, "Nome do cliente não pode ser vazio."))
+                continue
+            if not validar_telefone(telefone):
+                erros.append((numero, "Telefone inválido. Use apenas dígitos (8 a 15 caracteres)."))
+                continue
+            novos[id_cliente] = Cliente(id_cliente, nome, telefone, registro.get("endereco") or None)
+        self.clientes.update(novos)
+        self._registrar_insercoes(self.clientes, list(novos))
+        self.indice_clientes.adicionar_varios(novos.values())
+        self._ao_desfazer(lambda: [self.indice_clientes.remover(id_cliente) for id_cliente in novos])
+        return len(novos)
+
+    def _importar_lote_pedidos(self, lote: list, erros: list) -> int:
+        validar_id_pedido = PADRAO_ID_PEDIDO.fullmatch
+        novos = {}
+        for numero, registro in lote:
+            id_pedido = str(registro.get("id_pedido") or "").strip()
+            id_cliente = str(registro.get("id_cliente") or "").strip()
+            status = registro.get("status") or "Entregue"
+            if not validar_id_pedido(id_pedido):
+                erros.append((numero, f"ID do pedido inválido: '{id_pedido}'."))
+                continue
+            if id_pedido in self.pedidos or id_pedido in novos:
+                erros.append((numero, f"Pedido com ID '{id_pedido}' já existe."))
+                continue
+            if id_cliente not in self.clientes:
+                erros.append((numero, f"Cliente com ID '{id_cliente}' não encontrado."))
+                continue
+            if status not in STATUS_VALIDOS:
+                erros.append((numero, f"Status '{status}' inválido."))
+                continue
+            try:
+                data_hora = datetime.fromisoformat(str(registro.get("data_hora_criacao")))
+            except ValueError:
+                erros.append((numero, "Data/hora de criação inválida. Use o formato ISO (AAAA-MM-DDTHH:MM:SS)."))
+                continue
+
+            itens = []
+            erro_item = None
+            itens_registro = registro.get("itens") or []
+            if not isinstance(itens_registro, list):
+                erros.append((numero, "Os itens do pedido devem vir numa lista."))
+                continue
+            for item_data in itens_registro:
+                if not isinstance(item_data, dict):
+                    erro_item = "Cada item do pedido deve ser um objeto com produto_id e quantidade."
+                    break
+                produto = self.cardapio.get(str(item_data.get("produto_id") or "").strip())
+                try:
+                    quantidade = int(item_data.get("quantidade"))
+                except (TypeError, ValueError):
+                    quantidade = 0
+                if not produto:
+                    erro_item = f"Produto com ID '{item_data.get('produto_id')}' não encontrado no cardápio."
+                    break
+                if quantidade <= 0:
+                    erro_item = "Quantidade do item deve ser maior que zero."
+                    break
+                subtotal_centavos = None
+                if item_data.get("subtotal_centavos") not in (None, ""):
+                    try:
+                        subtotal_centavos = self._converter_centavos(item_data["subtotal_centavos"])
+                    except ValueError:
+                        erro_item = "Subtotal do item inválido."
+                        break
+                itens.append(ItemPedido(produto, quantidade, subtotal_centavos))
+            if erro_item or not itens:
+                erros.append((numero, erro_item or "Pedido sem itens."))
+                continue
+
+            try:
+                if registro.get("valor_total_centavos") not in (None, ""):
+                    valor_total_centavos = self._converter_centavos(registro["valor_total_centavos"])
+                elif registro.get("valor_total") not in (None, ""):
+                    valor_total_centavos = centavos(registro["valor_total"])
+                else:
+                    valor_total_centavos = sum(i.subtotal_centavos for i in itens)
+            except ValueError:
+                erros.append((numero, "Valor total inválido."))
+                continue
+            pedido = Pedido(id_cliente, id_pedido, status, data_hora, valor_total_centavos,
+                            self._converter_bool(registro.get("prioritario", False)))
+            pedido.itens = itens
+            novos[id_pedido] = pedido
+
+        self.pedidos.update(novos)
+        self._registrar_insercoes(self.pedidos, list(novos))
+        self._observar_ids_pedido(novos)
+        for pedido in novos.values():
+            # Pedidos históricos já entregues não mexem no estoque; os em aberto reservam
+            if pedido.status not in ("Entregue", "Cancelado"):
+                for item in pedido.itens:
+                    self._reservar(pedido.id_pedido, item.produto.id_produto, item.quantidade, forcar=True)
+                self.fila_cozinha.atualizar(pedido)
+                self._ao_desfazer(lambda id_pedido=pedido.id_pedido: self.fila_cozinha.remover(id_pedido))
+        return len(novos)
+
+    # --- Sincronização (feed de alterações) ---
+    def exportar_alteracoes(self, desde: int = 0, excluir_origem: str = None) -> dict:
+        """Lote com o estado atual de tudo o que mudou depois da versão 'desde' (None em 'dados' = excluído)."""
+        colecoes = {"produto": self.cardapio, "cliente": self.clientes, "pedido": self.pedidos}
+        alteracoes = []
+        for tipo, chave, versao in self.feed.desde(desde, excluir_origem):
+            objeto = colecoes[tipo].get(chave)
+            alteracoes.append({"tipo": tipo, "id": chave, "versao": versao,
+                               "dados": objeto.to_dict() if objeto is not None else None})
+        return {"origem": self.feed.id_origem, "desde": desde, "ate": self.feed.versao, "alteracoes": alteracoes}
+
+    @staticmethod
+    def gravar_lote(lote: dict, caminho: str):
+        """Grava o lote em JSON compacto (com gzip se o nome terminar em .gz)."""
+        abrir = gzip.open if caminho.endswith(".gz") else open
+        with abrir(caminho, 'wt', encoding='utf-8') as f:
+            json.dump(lote, f, ensure_ascii=False, separators=(",", ":"))
+
+    @staticmethod
+    def ler_lote(caminho: str) -> dict:
+        abrir = gzip.open if caminho.endswith(".gz") else open
+        with abrir(caminho, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    @instrumentado
+    def aplicar_alteracoes(self, lote: dict) -> tuple[bool, str]:
+        """Aplica um lote de outra instância. Reaplicar o mesmo lote (ou parte dele) não muda nada."""
+        if self.carga_em_andamento:
+            return False, "Erro: Aguarde o fim da carga dos dados para aplicar alterações de outra instância."
+        origem = lote["origem"]
+        if origem == self.feed.id_origem:
+            return False, "Erro: O lote foi exportado por esta mesma instância."
+        aplicada = self.versoes_origem.get(origem, 0)
+        if lote["desde"] > aplicada:
+            return False, (f"Erro: O lote começa após a versão {lote['desde']}, mas desta origem só foi aplicado "
+                           f"até a versão {aplicada}. Exporte novamente a partir de {aplicada}.")
+        if lote["ate"] <= aplicada:
+            return True, "Lote já aplicado anteriormente; nada a fazer."
+
+        ordem = {tipo: i for i, tipo in enumerate(FeedAlteracoes.TIPOS)}
+        novas = sorted((a for a in lote["alteracoes"] if a["versao"] > aplicada), key=lambda a: ordem[a["tipo"]])
+        self._origem_aplicada = origem
+        try:
+            with self.transacao():
+                for alteracao in novas:
+                    self._aplicar_alteracao(alteracao["tipo"], alteracao["id"], alteracao["dados"])
+                self._guardar_chave(self.versoes_origem, origem)
+                self.versoes_origem[origem] = lote["ate"]
+                self.salvar_dados()
+        except (ErroTransacao, KeyError, ValueError) as e:
+            return False, f"Erro ao aplicar lote: {e}"
+        finally:
+            self._origem_aplicada = None
+        return True, f"{len(novas)} alteração(ões) aplicada(s); origem sincronizada até a versão {lote['ate']}."
+
+    def _aplicar_alteracao(self, tipo: str, chave: str, dados: dict | None):
+        if tipo == "produto":
+            atual = self.cardapio.get(chave)
+            if dados is None:
+                if atual is not None:
+                    self._guardar_chave(self.cardapio, chave)
+                    del self.cardapio[chave]
+                    self.vigia_estoque.remover(chave)
+                return
+            novo = Produto.from_dict(dados)
+            if atual is not None:
+                # Atualiza no lugar: itens de pedidos já carregados apontam para este objeto
+                self._guardar(atual)
+                atual.__dict__.update(novo.__dict__)
+                novo = atual
+            else:
+                self._guardar_chave(self.cardapio, chave)
+                self.cardapio[chave] = novo
+            self.vigia_estoque.verificar(novo)
+        elif tipo == "cliente":
+            atual = self.clientes.get(chave)
+            if dados is None:
+                if atual is not None:
+                    self._guardar_chave(self.clientes, chave)
+                    del self.clientes[chave]
+                    self.indice_clientes.remover(chave)
+                return
+            novo = Cliente.from_dict(dados)
+            if atual is not None:
+                self._guardar(atual)
+                atual.__dict__.update(novo.__dict__)
+                novo = atual
+            else:
+                self._guardar_chave(self.clientes, chave)
+                self.clientes[chave] = novo
+            self.indice_clientes.atualizar(novo)
+        elif tipo == "pedido":
+            if chave in self.pedidos:
+                self._liberar(chave)
+            self._guardar_chave(self.pedidos, chave)
+            if dados is None:
+                self.pedidos.pop(chave, None)
+                self.fila_cozinha.remover(chave)
+                return
+            pedido = Pedido.from_dict(dados, self.cardapio)
+            self._observar_ids_pedido((chave,))
+            self.pedidos[chave] = pedido
+            if pedido.status not in ("Entregue", "Cancelado"):
+                for item in pedido.itens:
+                    self._reservar(chave, item.produto.id_produto, item.quantidade, forcar=True)
+            self.fila_cozinha.atualizar(pedido)
+        else:
+            raise ValueError(f"Tipo de alteração desconhecido: '{tipo}'.")
+
+    # --- Promoções ---
+    def definir_promocoes(self, regras: list) -> tuple[bool, str]:
+        """Troca todas as regras de promoção; nada muda se alguma for inválida."""
+        if self.carga_em_andamento:
+            return False, "Erro: Aguarde o fim da carga dos dados para alterar as promoções."
+        try:
+            self.promocoes.definir_regras(regras)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            return False, f"Erro: {e}"
+        self.salvar_dados()
+        return True, f"{len(regras)} promoção(ões) ativa(s)."
+
+    # --- Compactação do Histórico ---
+    def caminho_arquivo_historico(self) -> str:
+        return os.path.splitext(self.ARQUIVO_DADOS)[0] + "_historico.jsonl.gz"
+
+    @instrumentado
+    def compactar_historico(self, dias_retencao: int, arquivo_historico: str = None) -> tuple[bool, str]:
+        """Troca pedidos fechados mais antigos que a retenção por resumos diários (totais e quantidades por produto).
+
+        Os resumos ficam no arquivo de dados; com arquivo_historico, os pedidos originais são
+        acrescentados a um JSON Lines compactado com gzip antes de saírem da memória.
+        """
+        if self.carga_em_andamento:
+            return False, "Erro: Aguarde o fim da carga dos dados para compactar o histórico."
+        if dias_retencao < 0:
+            return False, "Erro: A retenção deve ser de zero ou mais dias."
+        corte = datetime.combine((datetime.now() - timedelta(days=dias_retencao)).date(), datetime.min.time())
+        antigos = [p for p in self.pedidos.values()
+                   if p.data_hora_criacao < corte and p.status in ("Entregue", "Cancelado")]
+        if not antigos:
+            return True, "Nenhum pedido fechado anterior ao período de retenção."
+
+        tamanho_historico = None
+        try:
+            # Compactar é uma decisão local: não vira exclusão de pedidos para quem sincroniza com esta instância
+            with self.transacao(exigir_gravacao=True), self.feed.suspenso():
+                novos_resumos = {}
+                for pedido in antigos:
+                    dia = pedido.data_hora_criacao.date().isoformat()
+                    resumo = novos_resumos.get(dia)
+                    if resumo is None:
+                        anterior = self.resumos_diarios.get(dia, {})
+                        resumo = novos_resumos[dia] = {
+                            "pedidos": anterior.get("pedidos", 0),
+                            "cancelados": anterior.get("cancelados", 0),
+                            "total_centavos": anterior.get("total_centavos", 0),
+                            "produtos": {k: list(v) for k, v in anterior.get("produtos", {}).items()},
+                        }
+                    if pedido.status == "Cancelado":
+                        resumo["cancelados"] += 1
+                    else:
+                        resumo["pedidos"] += 1
+                        resumo["total_centavos"] += pedido.valor_total_centavos
+                        for item in pedido.itens:
+                            id_produto = item.produto.id_produto
+                            linha = resumo["produtos"].setdefault(id_produto, [0, 0]) # [quantidade, total_centavos]
+                            linha[0] += item.quantidade
+                            linha[1] += item.subtotal_centavos
+                            if self.nomes_resumidos.get(id_produto) != item.produto.nome:
+                                self._guardar_chave(self.nomes_resumidos, id_produto)
+                                self.nomes_resumidos[id_produto] = item.produto.nome
+                    self._guardar_chave(self.pedidos, pedido.id_pedido)
+                    del self.pedidos[pedido.id_pedido]
+                for dia, resumo in novos_resumos.items():
+                    self._guardar_chave(self.resumos_diarios, dia)
+                    self.resumos_diarios[dia] = resumo
+
+                if arquivo_historico:
+                    # Acrescentado antes da gravação dos dados: se ela falhar, o trecho novo é cortado de volta
+                    tamanho_historico = os.path.getsize(arquivo_historico) if os.path.exists(arquivo_historico) else 0
+                    with gzip.open(arquivo_historico, 'at', encoding='utf-8') as f:
+                        for pedido in antigos:
+                            f.write(json.dumps(pedido.to_dict(), ensure_ascii=False) + "\n")
+                self.salvar_dados()
+        except BaseException as e:
+            if tamanho_historico is not None:
+                try:
+                    if tamanho_historico:
+                        with open(arquivo_historico, 'r+b') as f:
+                            f.truncate(tamanho_historico)
+                    else:
+                        os.remove(arquivo_historico)
+                except OSError:
+                    pass
+            if isinstance(e, OSError):
+                return False, f"Erro ao compactar o histórico: {e}"
+            raise
+
+        destino = f" e arquivados em '{arquivo_historico}'" if arquivo_historico else ""
+        return True, (f"{len(antigos)} pedidos anteriores a {corte.strftime('%d/%m/%Y')} resumidos em "
+                      f"{len(novos_resumos)} dias{destino}.")
+
+    def _resumos_no_periodo(self, data_inicio: datetime = None, data_fim: datetime = None):
+        # Resumos têm resolução diária: o dia entra se a sua data estiver dentro do período
+        inicio = data_inicio.date().isoformat() if data_inicio else None
+        fim = data_fim.date().isoformat() if data_fim else None
+        for dia, resumo in self.resumos_diarios.items():
+            if (inicio is None or dia >= inicio) and (fim is None or dia <= fim):
+                yield resumo
+
+    # --- Arquivo de Pedidos ---
+    def pasta_arquivo_pedidos(self) -> str:
+        return os.path.splitext(self.ARQUIVO_DADOS)[0] + "_arquivo"
+
+    @instrumentado
+    def arquivar_pedidos(self, dias_retencao: int, pasta: str = None) -> tuple[bool, str]:
+        """Move pedidos fechados mais antigos que a retenção para arquivos colunares compactados (um por mês).
+
+        Diferente de compactar_historico, os pedidos continuam completos nos arquivos: os relatórios
+        os leem direto do disco (mmap), sem recriar Pedido nem ItemPedido.
+        """
+        if self.carga_em_andamento:
+            return False, "Erro: Aguarde o fim da carga dos dados para arquivar pedidos."
+        if dias_retencao < 0:
+            return False, "Erro: A retenção deve ser de zero ou mais dias."
+        corte = datetime.combine((datetime.now() - timedelta(days=dias_retencao)).date(), datetime.min.time())
+        antigos = [p for p in self.pedidos.values()
+                   if p.data_hora_criacao < corte and p.status in ("Entregue", "Cancelado")]
+        if not antigos:
+            return True, "Nenhum pedido fechado anterior ao período de retenção."
+
+        pasta = pasta or self.pasta_arquivo_pedidos()
+        por_mes = {}
+        for pedido in antigos:
+            por_mes.setdefault(pedido.data_hora_criacao.strftime("%Y-%m"), []).append(pedido)
+        gravados = []
+        try:
+            os.makedirs(pasta, exist_ok=True)
+            # Arquivar é uma decisão local: não vira exclusão de pedidos para quem sincroniza com esta instância.
+            # A gravação dos dados faz parte do commit: se falhar, os arquivos novos são apagados abaixo
+            with self.transacao(exigir_gravacao=True), self.feed.suspenso():
+                for mes, pedidos in sorted(por_mes.items()):
+                    caminho = os.path.join(pasta, f"pedidos_{mes}_{uuid.uuid4().hex[:8]}.col")
+                    ArquivoPedidos.gravar(caminho, pedidos)
+                    gravados.append(caminho)
+                    self._guardar_chave(self.arquivos_pedidos, caminho)
+                    self.arquivos_pedidos[caminho] = {
+                        "inicio": min(p.data_hora_criacao for p in pedidos).isoformat(),
+                        "fim": max(p.data_hora_criacao for p in pedidos).isoformat(),
+                        "pedidos": len(pedidos),
+                    }
+                    for pedido in pedidos:
+                        self._guardar_chave(self.pedidos, pedido.id_pedido)
+                        del self.pedidos[pedido.id_pedido]
+                self.salvar_dados()
+        except BaseException as e:
+            for caminho in gravados: # Sem o commit, os arquivos novos não são referenciados por ninguém
+                try:
+                    os.remove(caminho)
+                except OSError:
+                    pass
+            if isinstance(e, OSError):
+                return False, f"Erro ao arquivar pedidos: {e}"
+            raise
+
+        tamanho = sum(os.path.getsize(c) for c in gravados)
+        return True, (f"{len(antigos)} pedidos anteriores a {corte.strftime('%d/%m/%Y')} arquivados em "
+                      f"{len(gravados)} arquivo(s) em '{pasta}' ({tamanho / 1024:.0f} KB).")
+
+    def _fechar_leitores_arquivo(self):
+        for leitor in self._leitores_arquivo.values():
+            leitor.fechar()
+        self._leitores_arquivo = {}
+
+    def _arquivos_no_periodo(self, data_inicio: datetime = None, data_fim: datetime = None):
+        """ArquivoPedidos abertos cujo intervalo de datas cruza o período."""
+        for caminho, info in self.arquivos_pedidos.items():
+            if data_inicio and datetime.fromisoformat(info["fim"]) < data_inicio:
+                continue
+            if data_fim and datetime.fromisoformat(info["inicio"]) > data_fim:
+                continue
+            leitor = self._leitores_arquivo.get(caminho)
+            if leitor is None:
+                try:
+                    leitor = self._leitores_arquivo[caminho] = ArquivoPedidos(caminho)
+                except (OSError, ValueError) as e:
+                    print(f"Aviso: Arquivo de pedidos '{caminho}' indisponível: {e}. Ignorado nos relatórios.")
                     continue
-                total += pedido.valor_total
+            yield leitor
+
+    # --- Previsão de Demanda ---
+    @instrumentado
+    def relatorio_sugestao_reposicao(self, dias_historico: int = 84, janela: int = 14, horizonte: int = 7,
+                                     hoje: datetime = None) -> tuple[bool, str, list[dict]]:
+        """Quanto repor de cada produto para cobrir a demanda prevista dos próximos 'horizonte' dias.
+
+        A previsão é a média móvel das vendas entregues nos últimos 'janela' dias, ajustada pelo peso de
+        cada dia da semana no histórico. As contas são feitas de uma vez na matriz produto x dia (NumPy).
+        """
+        if np is None:
+            return False, "A previsão de reposição precisa do NumPy (pip install numpy).", []
+        if dias_historico <= 0 or janela <= 0 or horizonte <= 0:
+            return False, "Erro: Histórico, janela e horizonte devem ser maiores que zero.", []
+        if not self.cardapio:
+            return True, "Cardápio vazio.", []
+        janela = min(janela, dias_historico)
+        hoje = (hoje or datetime.now()).date()
+        inicio = hoje - timedelta(days=dias_historico) # O dia de hoje, ainda incompleto, fica de fora
+
+        ids = list(self.cardapio)
+        posicao = {id_produto: i for i, id_produto in enumerate(ids)}
+        linhas, colunas, quantidades = [], [], []
+        inicio_arquivo = datetime.combine(inicio, datetime.min.time())
+        fim_historico = datetime.combine(hoje, datetime.min.time()) - timedelta(microseconds=1)
+        for pedido, item in self.consulta().onde(status="Entregue", inicio=inicio_arquivo, fim=fim_historico).itens().linhas():
+            i = posicao.get(item.produto.id_produto)
+            if i is not None:
+                linhas.append(i)
+                colunas.append((pedido.data_hora_criacao.date() - inicio).days)
+                quantidades.append(item.quantidade)
+        for arquivo in self._arquivos_no_periodo(inicio_arquivo, inicio_arquivo + timedelta(days=dias_historico)):
+            for data_hora, id_produto, quantidade in arquivo.itens_entregues(inicio_arquivo):
+                dia = (data_hora.date() - inicio).days
+                i = posicao.get(id_produto)
+                if dia < dias_historico and i is not None:
+                    linhas.append(i)
+                    colunas.append(dia)
+                    quantidades.append(quantidade)
+        for data_resumo, resumo in self.resumos_diarios.items():
+            dia = (datetime.fromisoformat(data_resumo).date() - inicio).days
+            if 0 <= dia < dias_historico:
+                for id_produto, (quantidade, _) in resumo["produtos"].items():
+                    i = posicao.get(id_produto)
+                    if i is not None:
+                        linhas.append(i)
+                        colunas.append(dia)
+                        quantidades.append(quantidade)
+
+        # Vendas por produto (linhas) e dia (colunas)
+        celulas = np.asarray(linhas, dtype=np.int64) * dias_historico + np.asarray(colunas, dtype=np.int64)
+        vendas = np.bincount(celulas, weights=np.asarray(quantidades, dtype=np.float64),
+                             minlength=len(ids) * dias_historico).reshape(len(ids), dias_historico)
+
+        # Sazonalidade semanal: média de cada dia da semana dividida pela média diária do produto
+        dia_da_semana = (np.arange(dias_historico) + inicio.weekday()) % 7
+        indicadora = np.zeros((dias_historico, 7))
+        indicadora[np.arange(dias_historico), dia_da_semana] = 1.0
+        ocorrencias = indicadora.sum(axis=0)
+        media_dia_semana = (vendas @ indicadora) / np.maximum(ocorrencias, 1.0)
+        media_diaria = vendas.mean(axis=1, keepdims=True)
+        fator = np.divide(media_dia_semana, media_diaria, out=np.ones_like(media_dia_semana), where=media_diaria > 0)
+        fator[:, ocorrencias == 0] = 1.0
+
+        media_movel = vendas[:, -janela:].mean(axis=1)
+        proximos_dias = (np.arange(horizonte) + hoje.weekday()) % 7
+        previsao = media_movel * fator[:, proximos_dias].sum(axis=1)
+
+        produtos = list(self.cardapio.values())
+        disponivel = np.array([self.reservas.disponivel(p.id_produto) for p in produtos], dtype=np.float64)
+        minimo = np.array([p.estoque_minimo for p in produtos], dtype=np.float64)
+        sugestao = np.maximum(np.ceil(np.round(previsao + minimo - disponivel, 6)), 0).astype(np.int64)
+
+        resultado = []
+        for i in np.argsort(-sugestao, kind="stable"):
+            if sugestao[i] <= 0:
+                break
+            resultado.append({
+                "id_produto": ids[i],
+                "nome": produtos[i].nome,
+                "disponivel": int(disponivel[i]),
+                "previsao": float(previsao[i]),
+                "sugestao": int(sugestao[i]),
+            })
+        return True, (f"Previsão para {horizonte} dias com base em {dias_historico} dias de vendas "
+                      f"(média móvel de {janela} dias): {len(resultado)} produto(s) a repor."), resultado
+
+    # --- Verificação de Consistência ---
+    @instrumentado
+    def verificar_consistencia(self, limite_exemplos: int = None) -> dict:
+        """Verificação completa sob demanda, na thread dona da Lanchonete (para segundo plano, ver VerificadorConsistencia)."""
+        inicio = time.perf_counter()
+        anomalias = VerificadorConsistencia(self).executar()
+        return self.relatorio_consistencia(anomalias, time.perf_counter() - inicio, limite_exemplos)
+
+    def relatorio_consistencia(self, anomalias: list[tuple], duracao_s: float, limite_exemplos: int = None) -> dict:
+        return {
+            "verificado_em": datetime.now().isoformat(timespec="seconds"),
+            "pedidos": len(self.pedidos),
+            "produtos": len(self.cardapio),
+            "duracao_s": duracao_s,
+            "em_bloco": np is not None,
+            "total_anomalias": len(anomalias),
+            "anomalias": VerificadorConsistencia.resumir(anomalias, limite_exemplos),
+        }
+
+    # --- Consultas ---
+    def indice_pedidos(self) -> IndicePedidos:
+        """Índice dos pedidos, posto em dia com o que mudou desde a última consulta."""
+        if not self._indice_pedidos_valido:
+            self._indice_pedidos.reconstruir(self.pedidos)
+            self._indice_pedidos_valido = True
+            self._pedidos_alterados.clear()
+        elif self._pedidos_alterados:
+            alterados, self._pedidos_alterados = self._pedidos_alterados, set()
+            for id_pedido in alterados:
+                self._indice_pedidos.atualizar(id_pedido, self.pedidos.get(id_pedido))
+        return self._indice_pedidos
+
+    def consulta(self) -> ConsultaPedidos:
+        return ConsultaPedidos(self)
+
+    # --- Métodos de Relatório ---
+    @instrumentado
+    def relatorio_total_vendas_por_periodo(self, data_inicio: datetime = None, data_fim: datetime = None) -> int:
+        """Total entregue no período, em centavos (pedidos ativos, arquivados e resumos do histórico compactado)."""
+        total = sum(resumo["total_centavos"] for resumo in self._resumos_no_periodo(data_inicio, data_fim))
+        for arquivo in self._arquivos_no_periodo(data_inicio, data_fim):
+            total += arquivo.total_entregue(data_inicio, data_fim)
+        total += self.consulta().onde(status="Entregue", inicio=data_inicio, fim=data_fim).somar("valor_centavos")
         return total
 
+    @instrumentado
     def relatorio_produtos_mais_vendidos(self, top_n: int = 5) -> list[tuple[str, int]]:
-        vendas_por_produto = {}
-        for pedido in self.pedidos.values():
-            if pedido.status == "Entregue":
-                for item in pedido.itens:
-                    vendas_por_produto[item.produto.nome] = vendas_por_produto.get(item.produto.nome, 0) + item.quantidade
+        vendas_por_produto = dict(self.consulta().onde(status="Entregue").itens().agrupar("nome_produto", "quantidade"))
+        for resumo in self.resumos_diarios.values():
+            for id_produto, (quantidade, _) in resumo["produtos"].items():
+                produto = self.cardapio.get(id_produto)
+                nome = produto.nome if produto else self.nomes_resumidos.get(id_produto, id_produto)
+                vendas_por_produto[nome] = vendas_por_produto.get(nome, 0) + quantidade
+        for arquivo in self._arquivos_no_periodo():
+            por_id = {}
+            for _, id_produto, quantidade in arquivo.itens_entregues():
+                por_id[id_produto] = por_id.get(id_produto, 0) + quantidade
+            for id_produto, quantidade in por_id.items():
+                produto = self.cardapio.get(id_produto)
+                nome = produto.nome if produto else arquivo.nomes_produtos.get(id_produto, id_produto)
+                vendas_por_produto[nome] = vendas_por_produto.get(nome, 0) + quantidade
         
-        sorted_products = sorted(vendas_por_produto.items(), key=lambda item: item[1], reverse=True)
-        return sorted_products[:top_n]
+        return heapq.nsmallest(top_n, vendas_por_produto.items(), key=lambda item: (-item[1], item[0]))
 
+    def relatorio_tempos_por_status(self, agrupamento: str = "hora") -> list[dict]:
+        """Tempo em cada status (média, mediana e p90 em segundos) por hora do dia ou por mix de estações."""
+        if agrupamento not in TemposPorStatus.AGRUPAMENTOS:
+            raise ValueError(f"Agrupamento deve ser um de {', '.join(TemposPorStatus.AGRUPAMENTOS)}.")
+        return self.tempos_status.resumo(agrupamento)
+
+    @instrumentado
     def relatorio_pedidos_por_cliente(self, id_cliente: str) -> list[Pedido]:
         cliente = self.clientes.get(id_cliente)
         if not cliente:
             return []
         
-        pedidos_do_cliente = [pedido for pedido in self.pedidos.values() if pedido.id_cliente == id_cliente]
+        pedidos_do_cliente = self.consulta().onde(id_cliente=id_cliente).listar()
+        for arquivo in self._arquivos_no_periodo():
+            pedidos_do_cliente.extend(arquivo.pedidos_do_cliente(id_cliente, self.cardapio))
         return sorted(pedidos_do_cliente, key=lambda p: p.data_hora_criacao, reverse=True)
 
+    def _reconstruir_reservas(self):
+        """Refaz o livro de reservas a partir dos pedidos em aberto."""
+        self.reservas = ReservaEstoque(self.cardapio)
+        for pedido in self.pedidos.values():
+            if pedido.status in ("Entregue", "Cancelado"):
+                continue
+            for item in pedido.itens:
+                self.reservas.reservar(pedido.id_pedido, item.produto.id_produto, item.quantidade, forcar=True)
+
+    def _reconstruir_vigia_estoque(self):
+        self.vigia_estoque = VigiaEstoque()
+        for produto in self.cardapio.values():
+            self.vigia_estoque.verificar(produto)
+
+    def _reconstruir_fila_cozinha(self):
+        self.fila_cozinha = FilaCozinha()
+        for pedido in self.pedidos.values():
+            if pedido.status in FilaCozinha.ETAPAS:
+                self.fila_cozinha.atualizar(pedido)
+
+    @instrumentado
     def salvar_dados(self):
+        if self._diario is not None:
+            # Dentro de uma transação a gravação fica para o commit
+            self._salvamento_pendente = True
+            return
+        if self.carga_em_andamento:
+            # Gravar agora perderia o que ainda não foi lido do arquivo
+            self._salvar_apos_carga = True
+            return
+        try:
+            self._gravar_dados()
+        except IOError as e:
+            messagebox.showerror("Erro de Salvar", f"Erro ao salvar dados: {e}")
+        except Exception as e:
+            messagebox.showerror("Erro Inesperado", f"Ocorreu um erro inesperado ao salvar: {e}")
+
+    def _gravar_dados(self):
+        """Grava o arquivo de dados; erros sobem para o chamador. O arquivo antigo só é trocado com a gravação completa."""
         dados = {
             "cardapio": [p.to_dict() for p in self.cardapio.values()],
             "clientes": [c.to_dict() for c in self.clientes.values()],
             "pedidos": [p.to_dict() for p in self.pedidos.values()],
-            "next_pedido_id": Pedido._id_counter
+            "resumos_diarios": self.resumos_diarios,
+            "nomes_resumidos": self.nomes_resumidos,
+            "promocoes": self.promocoes.to_dict(),
+            "tempos_status": self.tempos_status.to_dict(),
+            "arquivos_pedidos": self.arquivos_pedidos,
+            "feed": self.feed.to_dict(),
+            "versoes_origem": self.versoes_origem,
+            "next_pedido_id": self.alocador_ids.ultimo()
         }
+        temporario = self.ARQUIVO_DADOS + ".tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, indent=4, ensure_ascii=False)
+        os.replace(temporario, self.ARQUIVO_DADOS)
+
+    @instrumentado
+    def carregar_dados(self):
+        erro = self.carregar_etapas()
+        if erro is not None:
+            informativo, titulo, texto = self.descrever_erro_carga(erro)
+            (messagebox.showinfo if informativo else messagebox.showerror)(titulo, texto)
+
+    @classmethod
+    def abrir_sem_interface(cls, nome: str, arquivo_dados: str) -> "Lanchonete":
+        """Carga completa para os scripts de linha de comando: um erro de carga vai para o stderr
+        e encerra o processo com ERRO_CARGA, sem caixa de mensagem e sem gravar nada."""
+        lanchonete = cls(nome, arquivo_dados=arquivo_dados, carregar=False)
+        erro = lanchonete.carregar_etapas()
+        if erro is not None:
+            # Na interface a falta do arquivo só avisa que a loja começa vazia; aqui é um erro
+            texto = (f"Erro: Arquivo '{arquivo_dados}' não encontrado." if isinstance(erro, FileNotFoundError)
+                     else lanchonete.descrever_erro_carga(erro)[2])
+            print(texto, file=sys.stderr)
+            sys.exit(cls.ERRO_CARGA)
+        return lanchonete
+
+    def carregar_etapas(self) -> Exception | None:
+        """Carga completa, sem interface: devolve o erro que a interrompeu (None se ela terminou)."""
         try:
-            with open(self.ARQUIVO_DADOS, 'w', encoding='utf-8') as f:
-                json.dump(dados, f, indent=4, ensure_ascii=False)
-        except IOError as e:
-            messagebox.showerror("Erro de Salvar", f"Erro ao salvar dados: {e}")
+            for etapa, conteudo in self.etapas_carga():
+                self.aplicar_etapa_carga(etapa, conteudo)
         except Exception as e:
-            messagebox.showerror("Erro Inesperado", f"Ocorreu um erro inesperado ao salvar: {e}")
+            self.interromper_carga()
+            return e
+        return None
+
+    def etapas_carga(self):
+        """Lê o arquivo de dados e gera (etapa, conteúdo) sem tocar no estado da Lanchonete.
+
+        Pode rodar numa thread de trabalho: quem aplica cada etapa (aplicar_etapa_carga) é a
+        thread dona da Lanchonete. Cadastros e pedidos em aberto vêm primeiro; o histórico
+        fechado vem depois, em lotes de TAMANHO_LOTE_CARGA pedidos. Tudo o que a interface pode
+        alterar depois de liberada (resumos, arquivos, feed) vem com os cadastros.
+        """
+        dados = ler_json_em_partes(self.ARQUIVO_DADOS)
+
+        cardapio = {p["id_produto"]: Produto.from_dict(p) for p in dados.get("cardapio", [])}
+        clientes = {c["id_cliente"]: Cliente.from_dict(c) for c in dados.get("clientes", [])}
+        cadastros = {"cardapio": cardapio, "clientes": clientes, "promocoes": dados.get("promocoes", []),
+                     "tempos_status": dados.get("tempos_status", []), "next_pedido_id": dados.get("next_pedido_id", 0)}
+        for chave in ("resumos_diarios", "nomes_resumidos", "arquivos_pedidos", "versoes_origem", "feed"):
+            cadastros[chave] = dados.get(chave)
+        yield "cadastros", cadastros
+
+        registros = dados.get("pedidos", [])
+        ignorados, invalidos = {}, []
+        yield "pedidos_abertos", self._pedidos_da_carga(
+            (p for p in registros if p.get("status") not in ("Entregue", "Cancelado")), cardapio, ignorados, invalidos)
+        fechados = [p for p in registros if p.get("status") in ("Entregue", "Cancelado")]
+        for inicio in range(0, len(fechados), self.TAMANHO_LOTE_CARGA):
+            yield "pedidos", self._pedidos_da_carga(fechados[inicio:inicio + self.TAMANHO_LOTE_CARGA], cardapio, ignorados, invalidos)
+
+        yield "extras", {"itens_ignorados": ignorados, "pedidos_invalidos": invalidos}
+
+    @staticmethod
+    def _pedidos_da_carga(registros, cardapio: dict, ignorados: dict = None, invalidos: list = None) -> dict:
+        """Monta os pedidos lidos do arquivo. Itens de produtos fora do cardápio vão para 'ignorados' (id_pedido -> ids);
+        os IDs de registros que não formam um pedido vão para 'invalidos'."""
+        pedidos = {}
+        for p_data in registros:
+            try:
+                if not isinstance(p_data["id_pedido"], str):
+                    raise TypeError(f"id_pedido deve ser texto, não {type(p_data['id_pedido']).__name__}")
+                temp_pedido_itens = []
+                for item_data in p_data.get("itens", []):
+                    produto_id = item_data["produto_id"]
+                    if produto_id in cardapio:
+                        temp_pedido_itens.append(ItemPedido(cardapio[produto_id], item_data["quantidade"], item_data.get("subtotal_centavos")))
+                    else:
+                        if ignorados is not None:
+                            ignorados.setdefault(p_data["id_pedido"], []).append(produto_id)
+                        print(f"Aviso: Produto '{produto_id}' do pedido '{p_data['id_pedido']}' não encontrado no cardápio durante carregamento. Item ignorado.")
+                
+                pedido = Pedido(
+                    id_cliente=p_data["id_cliente"],
+                    id_pedido=p_data["id_pedido"],
+                    status=p_data["status"],
+                    data_hora_criacao=datetime.fromisoformat(p_data["data_hora_criacao"]),
+                    valor_total_centavos=Pedido._valor_total_centavos(p_data),
+                    prioritario=p_data.get("prioritario", False)
+                )
+                pedido.transicoes = tuple((codigo, segundos) for codigo, segundos in p_data.get("transicoes", ()))
+                pedido.itens = temp_pedido_itens
+                pedidos[pedido.id_pedido] = pedido
+
+            except (KeyError, TypeError, ValueError) as e:
+                if invalidos is not None:
+                    invalidos.append(p_data.get("id_pedido"))
+                print(f"Erro ao carregar pedido {p_data.get('id_pedido')}: {e!r}. Pedido ignorado.")
+        return pedidos
+
+    def aplicar_etapa_carga(self, etapa: str, conteudo: dict):
+        if etapa == "cadastros":
+            self.cardapio = conteudo["cardapio"]
+            self.clientes = conteudo["clientes"]
+            self.alocador_ids.observar(conteudo["next_pedido_id"]) # Antes de tudo: pedidos novos não colidem com os que ainda vão chegar
+            try:
+                self.promocoes.definir_regras(conteudo["promocoes"])
+            except ValueError as e:
+                print(f"Aviso: Promoções ignoradas no carregamento: {e}")
+            self.tempos_status = TemposPorStatus.from_dict(conteudo["tempos_status"])
+            self.reservas = ReservaEstoque(self.cardapio)
+            self.indice_clientes = IndiceClientes()
+            self.indice_clientes.adicionar_varios(self.clientes.values())
+            self._reconstruir_vigia_estoque()
+            self.resumos_diarios = conteudo["resumos_diarios"] or {}
+            self.nomes_resumidos = conteudo["nomes_resumidos"] or {}
+            self.arquivos_pedidos = conteudo["arquivos_pedidos"] or {}
+            self._fechar_leitores_arquivo()
+            self.versoes_origem = conteudo["versoes_origem"] or {}
+            if conteudo["feed"] is not None:
+                self.feed = FeedAlteracoes.from_dict(conteudo["feed"])
+                self._semeando_feed = False
+            else:
+                # Primeira carga com feed: tudo o que já existe entra como alteração, para a primeira sincronização ser completa
+                self.feed = FeedAlteracoes()
+                self._semeando_feed = True
+                self._semear_feed("produto", self.cardapio)
+                self._semear_feed("cliente", self.clientes)
+                # Gravado ao fim da carga: sem isso, cada carga sortearia outro id_origem e as versões recomeçariam
+                self._salvar_apos_carga = True
+        elif etapa == "pedidos_abertos":
+            self._observar_ids_pedido(conteudo)
+            self._semear_feed("pedido", conteudo)
+            self.painel.semear(conteudo.values())
+            conteudo.update(self.pedidos)
+            self.pedidos = conteudo
+            self._indice_pedidos_valido = False
+            self._reconstruir_reservas()
+            self._reconstruir_fila_cozinha()
+        elif etapa == "pedidos":
+            self._observar_ids_pedido(conteudo)
+            self._semear_feed("pedido", conteudo)
+            self.painel.semear(conteudo.values())
+            self.pedidos.update(conteudo)
+            self._indice_pedidos_valido = False
+        elif etapa == "extras":
+            self.itens_ignorados_carga = conteudo["itens_ignorados"]
+            if conteudo["pedidos_invalidos"] and self._salvar_apos_carga:
+                # Gravar agora apagaria do arquivo, sem nenhuma ação do usuário, os pedidos que não puderam ser lidos
+                print(f"Aviso: {len(conteudo['pedidos_invalidos'])} pedido(s) ignorado(s) na carga; "
+                      "o arquivo de dados só será gravado na próxima alteração.")
+                self._salvar_apos_carga = False
+            self.concluir_carga()
+
+    def _semear_feed(self, tipo: str, colecao: dict):
+        if self._semeando_feed:
+            for chave in colecao:
+                self.feed.registrar(tipo, chave)
+
+    def _observar_ids_pedido(self, ids_pedido):
+        """Avisa o alocador dos IDs que já existem, para que não sejam reutilizados."""
+        maior = max(map(numero_do_id_pedido, ids_pedido), default=0)
+        if maior:
+            self.alocador_ids.observar(maior)
+
+    def concluir_carga(self):
+        """Fim da carga completa: gravações adiadas durante ela são feitas agora."""
+        self.carga_em_andamento = False
+        self._semeando_feed = False
+        if self._salvar_apos_carga:
+            self._salvar_apos_carga = False
+            self.salvar_dados()
 
-    def carregar_dados(self):
+    def interromper_carga(self):
+        """Carga interrompida por erro: libera a Lanchonete sem gravar o que foi lido só em parte."""
+        self.carga_em_andamento = False
+        self._semeando_feed = False
+        self._salvar_apos_carga = False
+
+    def descrever_erro_carga(self, erro: Exception) -> tuple[bool, str, str]:
+        """(apenas informativo?, título, texto) para avisar o usuário de um erro de carga."""
+        if isinstance(erro, FileNotFoundError):
+            return True, "Dados", f"Arquivo '{self.ARQUIVO_DADOS}' não encontrado. Iniciando com dados vazios."
+        if isinstance(erro, json.JSONDecodeError):
+            return False, "Erro de Carregamento", f"Erro ao decodificar JSON do arquivo '{self.ARQUIVO_DADOS}': {erro}. Verifique a integridade do arquivo."
+        return False, "Erro Inesperado", f"Ocorreu um erro inesperado ao carregar os dados: {erro}"
+
+
+# --- Carrinhos do PDV ---
+class CarrinhoPDV:
+    """Carrinho de um terminal do PDV, com nome, cliente e titular de reservas próprios.
+
+    Vários carrinhos podem ficar estacionados no mesmo terminal; cada um segura as suas
+    reservas de estoque até a venda ser finalizada ou o carrinho ser limpo.
+    """
+    def __init__(self, nome: str, id_cliente: str = None, titular: str = None):
+        self.nome = nome
+        self.id_cliente = id_cliente
+        self.titular = titular or f"PDV-{uuid.uuid4().hex[:8]}"
+        self.itens = {} # id_produto -> {"produto": Produto, "quantidade": int}, na ordem de inclusão
+        self.conta = None # ContaCarrinho com os preços promocionais, criada por quem exibe o carrinho
+
+    def vazio(self) -> bool:
+        return not self.itens and not self.id_cliente
+
+    def total_centavos(self) -> int:
+        """Total a preço de tabela (sem promoções)."""
+        return sum(item["produto"].preco_centavos * item["quantidade"] for item in self.itens.values())
+
+    def to_dict(self):
+        return {
+            "nome": self.nome,
+            "id_cliente": self.id_cliente,
+            "titular": self.titular,
+            "itens": [[id_produto, item["quantidade"]] for id_produto, item in self.itens.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, cardapio: dict):
+        carrinho = cls(data["nome"], data.get("id_cliente"), data.get("titular"))
+        for id_produto, quantidade in data.get("itens", []):
+            produto = cardapio.get(id_produto)
+            if produto: # Produto removido do cardápio enquanto o carrinho estava estacionado
+                carrinho.itens[id_produto] = {"produto": produto, "quantidade": quantidade}
+        return carrinho
+
+    @staticmethod
+    def gravar_arquivo(caminho: str, carrinhos: list, nome_ativo: str):
+        temporario = caminho + ".tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({"ativo": nome_ativo, "carrinhos": [c.to_dict() for c in carrinhos if not c.vazio()]},
+                      f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def ler_arquivo(cls, caminho: str, cardapio: dict) -> tuple[list, str]:
+        """(carrinhos, nome do carrinho ativo); arquivo ausente = nenhum carrinho estacionado."""
         try:
-            with open(self.ARQUIVO_DADOS, 'r', encoding='utf-8') as f:
+            with open(caminho, 'r', encoding='utf-8') as f:
                 dados = json.load(f)
+        except FileNotFoundError:
+            return [], None
+        return [cls.from_dict(c, cardapio) for c in dados.get("carrinhos", [])], dados.get("ativo")
 
-            self.cardapio = {p["id_produto"]: Produto.from_dict(p) for p in dados.get("cardapio", [])}
-            self.clientes = {c["id_cliente"]: Cliente.from_dict(c) for c in dados.get("clientes", [])}
-            
-            self.pedidos = {}
-            for p_data in dados.get("pedidos", []):
-                try:
-                    temp_pedido_itens = []
-                    for item_data in p_data.get("itens", []):
-                        produto_id = item_data["produto_id"]
-                        if produto_id in self.cardapio:
-                            temp_pedido_itens.append(ItemPedido(self.cardapio[produto_id], item_data["quantidade"]))
-                        else:
-                            print(f"Aviso: Produto '{produto_id}' do pedido '{p_data['id_pedido']}' não encontrado no cardápio durante carregamento. Item ignorado.")
-                    
-                    pedido = Pedido(
-                        id_cliente=p_data["id_cliente"],
-                        id_pedido=p_data["id_pedido"],
-                        status=p_data["status"],
-                        data_hora_criacao=datetime.fromisoformat(p_data["data_hora_criacao"]),
-                        valor_total=p_data["valor_total"]
-                    )
-                    pedido.itens = temp_pedido_itens
-                    self.pedidos[pedido.id_pedido] = pedido
-
-                except ValueError as e:
-                    print(f"Erro ao carregar pedido {p_data.get('id_pedido')}: {e}. Pedido ignorado.")
-
-            Pedido._id_counter = dados.get("next_pedido_id", 0)
 
-        except FileNotFoundError:
-            messagebox.showinfo("Dados", f"Arquivo '{self.ARQUIVO_DADOS}' não encontrado. Iniciando com dados vazios.")
-        except json.JSONDecodeError as e:
-            messagebox.showerror("Erro de Carregamento", f"Erro ao decodificar JSON do arquivo '{self.ARQUIVO_DADOS}': {e}. Verifique a integridade do arquivo.")
-        except Exception as e:
-            messagebox.showerror("Erro Inesperado", f"Ocorreu um erro inesperado ao carregar os dados: {e}")
+# --- Impressão de Recibos e Tickets ---
+class DocumentoImpressao:
+    """Recibo ou ticket de cozinha com os dados copiados do pedido no momento da venda.
+
+    A fila só guarda essa cópia: a formatação é feita pelo spooler, fora da thread da
+    interface, e não depende de o pedido continuar igual (ou existir) até a impressão.
+    """
+    def __init__(self, tipo: str, id_pedido: str, dados: dict):
+        self.tipo = tipo # "recibo" ou "cozinha"
+        self.id_pedido = id_pedido
+        self.dados = dados
+
+    @classmethod
+    def recibo(cls, pedido: Pedido, cliente: Cliente, nome_loja: str):
+        return cls("recibo", pedido.id_pedido, {
+            "loja": nome_loja,
+            "cliente": cliente.nome if cliente else pedido.id_cliente,
+            "data_hora": pedido.data_hora_criacao.strftime("%d/%m/%Y %H:%M"),
+            "itens": [(item.produto.nome, item.quantidade, item.subtotal_centavos) for item in pedido.itens],
+            "total_centavos": pedido.valor_total_centavos,
+        })
+
+    @classmethod
+    def ticket_cozinha(cls, pedido: Pedido, cliente: Cliente):
+        por_estacao = {}
+        for item in pedido.itens:
+            por_estacao.setdefault(item.produto.estacao, []).append((item.produto.nome, item.quantidade))
+        return cls("cozinha", pedido.id_pedido, {
+            "cliente": cliente.nome if cliente else pedido.id_cliente,
+            "hora": pedido.data_hora_criacao.strftime("%H:%M"),
+            "prioritario": pedido.prioritario,
+            "estacoes": sorted(por_estacao.items()),
+        })
+
+    def linhas(self, largura: int) -> list[tuple[str, str]]:
+        """Conteúdo como (estilo, texto); estilo é "titulo", "destaque", "normal" ou "separador"."""
+        d = self.dados
+        if self.tipo == "recibo":
+            linhas = [("titulo", d["loja"]), ("normal", f"Pedido {self.id_pedido}  {d['data_hora']}"),
+                      ("normal", f"Cliente: {d['cliente']}"), ("separador", "")]
+            for nome, quantidade, subtotal in d["itens"]:
+                valor = f"R$ {formatar_centavos(subtotal)}"
+                descricao = f"{quantidade}x {nome}"[:largura - len(valor) - 1]
+                linhas.append(("normal", descricao + valor.rjust(largura - len(descricao))))
+            total = f"R$ {formatar_centavos(d['total_centavos'])}"
+            linhas += [("separador", ""), ("destaque", "TOTAL" + total.rjust(largura - 5)), ("normal", "Obrigado pela preferência!")]
+        else:
+            linhas = [("titulo", f"COZINHA {self.id_pedido}"), ("normal", f"{d['hora']}  {d['cliente']}")]
+            if d["prioritario"]:
+                linhas.append(("destaque", "*** PRIORITÁRIO ***"))
+            for estacao, itens in d["estacoes"]:
+                linhas += [("separador", ""), ("destaque", f"[{estacao}]")]
+                linhas += [("normal", f"{quantidade:>3}x {nome}"[:largura]) for nome, quantidade in itens]
+        return linhas
+
+    def texto(self, largura: int = 40) -> str:
+        partes = []
+        for estilo, conteudo in self.linhas(largura):
+            if estilo == "separador":
+                partes.append("-" * largura)
+            elif estilo == "titulo":
+                partes.append(conteudo.center(largura).rstrip())
+            else:
+                partes.append(conteudo)
+        return "\n".join(partes) + "\n"
+
+
+class SaidaImpressao(abc.ABC):
+    """Interface das saídas do spooler. enviar() levanta exceção se a impressão falhar (o spooler tenta de novo)."""
+    @abc.abstractmethod
+    def enviar(self, documento: DocumentoImpressao):
+        ...
+
+
+class SaidaEscPos(SaidaImpressao):
+    """Impressora térmica ESC/POS, num dispositivo (ex.: /dev/usb/lp0) ou na rede ("host:porta", em geral 9100)."""
+    INICIAR = b"\x1b@\x1bt\x03" # Reinicia e seleciona a página de código 860 (português)
+    ESTILOS = {
+        "titulo": (b"\x1ba\x01\x1d!\x11", b"\x1d!\x00\x1ba\x00"), # Centralizado, altura e largura duplas
+        "destaque": (b"\x1bE\x01", b"\x1bE\x00"),
+        "normal": (b"", b""),
+    }
+    CORTAR = b"\n\n\n\x1dV\x42\x00" # Avança o papel e faz o corte parcial
+
+    def __init__(self, destino: str, largura: int = 42, timeout: float = 5.0):
+        self.destino = destino
+        self.largura = largura
+        self.timeout = timeout
+
+    def codificar(self, documento: DocumentoImpressao) -> bytes:
+        dados = bytearray(self.INICIAR)
+        for estilo, conteudo in documento.linhas(self.largura):
+            if estilo == "separador":
+                dados += b"-" * self.largura + b"\n"
+                continue
+            # Títulos saem com largura dupla: cabem metade dos caracteres
+            conteudo = conteudo[:self.largura // 2] if estilo == "titulo" else conteudo
+            antes, depois = self.ESTILOS[estilo]
+            dados += antes + conteudo.encode("cp860", errors="replace") + b"\n" + depois
+        return bytes(dados + self.CORTAR)
+
+    def enviar(self, documento: DocumentoImpressao):
+        dados = self.codificar(documento)
+        host, separador, porta = self.destino.rpartition(":")
+        if separador and porta.isdigit():
+            with socket.create_connection((host, int(porta)), timeout=self.timeout) as conexao:
+                conexao.sendall(dados)
+        else:
+            with open(self.destino, 'wb') as f:
+                f.write(dados)
+
+
+class SaidaArquivoTexto(SaidaImpressao):
+    """Acrescenta cada documento em texto puro a um arquivo; faz o papel da impressora em testes e sem hardware."""
+    def __init__(self, caminho: str, largura: int = 40):
+        self.caminho = caminho
+        self.largura = largura
+
+    def enviar(self, documento: DocumentoImpressao):
+        with open(self.caminho, 'a', encoding='utf-8') as f:
+            f.write(documento.texto(self.largura) + "=" * self.largura + "\n")
+
+
+class SaidaMemoria(SaidaImpressao):
+    """Guarda os textos numa lista. As primeiras 'falhas' chamadas levantam OSError, para exercitar as novas tentativas."""
+    def __init__(self, largura: int = 40, falhas: int = 0):
+        self.largura = largura
+        self.falhas = falhas
+        self.documentos = []
+
+    def enviar(self, documento: DocumentoImpressao):
+        if self.falhas > 0:
+            self.falhas -= 1
+            raise OSError("Falha simulada da impressora.")
+        self.documentos.append(documento.texto(self.largura))
+
+
+def criar_saida_impressao(especificacao: str) -> SaidaImpressao:
+    """'escpos:/dev/usb/lp0', 'escpos:192.168.0.50:9100', 'arquivo:recibos.txt' ou 'memoria'."""
+    tipo, _, destino = especificacao.partition(":")
+    if tipo == "escpos" and destino:
+        return SaidaEscPos(destino)
+    if tipo == "arquivo" and destino:
+        return SaidaArquivoTexto(destino)
+    if tipo == "memoria":
+        return SaidaMemoria()
+    raise ValueError(f"Saída de impressão inválida: '{especificacao}'.")
+
+
+class SpoolerImpressao:
+    """Fila de impressão atendida por uma thread própria: quem enfileira não espera a impressora.
+
+    Envios que falham voltam para uma fila de espera e são repetidos com intervalo
+    crescente (ESPERA_INICIAL_S, dobrando a cada vez) até TENTATIVAS; enquanto isso os
+    outros documentos seguem sendo impressos. Falhas definitivas ficam em 'erros'.
+    """
+    TENTATIVAS = 4
+    ESPERA_INICIAL_S = 0.5
+
+    def __init__(self):
+        self._fila = queue.Queue()
+        self._repeticoes = [] # heap de (momento, seq, documento, saida, tentativa)
+        self._seq = itertools.count()
+        self._condicao = threading.Condition()
+        self._pendentes = 0
+        self.impressos = 0
+        self.erros = deque(maxlen=50) # (id_pedido, tipo, mensagem) dos documentos descartados
+        self.versao_erros = 0
+        self._thread = threading.Thread(target=self._executar, name="spooler-impressao", daemon=True)
+        self._thread.start()
+
+    def enfileirar(self, documento: DocumentoImpressao, saida: SaidaImpressao):
+        with self._condicao:
+            self._pendentes += 1
+        self._fila.put((documento, saida, 1))
+
+    def pendentes(self) -> int:
+        return self._pendentes
+
+    def aguardar(self, timeout: float = None) -> bool:
+        """Espera a fila esvaziar (inclusive as novas tentativas). False se o tempo acabar antes."""
+        with self._condicao:
+            return self._condicao.wait_for(lambda: self._pendentes == 0, timeout)
+
+    def parar(self, timeout: float = None) -> bool:
+        """Imprime o que ainda está na fila (até 'timeout') e encerra a thread."""
+        concluido = self.aguardar(timeout)
+        self._fila.put(None)
+        self._thread.join(timeout)
+        return concluido
+
+    def _concluir(self):
+        with self._condicao:
+            self._pendentes -= 1
+            self._condicao.notify_all()
+
+    def _executar(self):
+        while True:
+            espera = None
+            if self._repeticoes:
+                espera = max(self._repeticoes[0][0] - time.monotonic(), 0)
+            try:
+                tarefa = self._fila.get(timeout=espera)
+            except queue.Empty:
+                _, _, documento, saida, tentativa = heapq.heappop(self._repeticoes)
+                tarefa = (documento, saida, tentativa)
+            if tarefa is None:
+                return
+            documento, saida, tentativa = tarefa
+            try:
+                saida.enviar(documento)
+            except Exception as e:
+                if tentativa < self.TENTATIVAS:
+                    momento = time.monotonic() + self.ESPERA_INICIAL_S * 2 ** (tentativa - 1)
+                    heapq.heappush(self._repeticoes, (momento, next(self._seq), documento, saida, tentativa + 1))
+                    continue
+                self.erros.append((documento.id_pedido, documento.tipo, str(e)))
+                self.versao_erros += 1
+            else:
+                self.impressos += 1
+            self._concluir()
 
 
 # --- Interface Gráfica com Tkinter ---
+class ComboboxClientes(ttk.Combobox):
+    """Combobox editável que consulta o IndiceClientes a cada tecla em vez de listar todos os clientes."""
+    LIMITE_SUGESTOES = 30
+
+    def __init__(self, master, lanchonete: Lanchonete, **kwargs):
+        super().__init__(master, **kwargs)
+        self.lanchonete = lanchonete
+        self._rotulos = {} # texto exibido -> id_cliente
+        self.bind("<KeyRelease>", self._ao_digitar)
+        self.bind("<Return>", self._aceitar_primeira)
+
+    @staticmethod
+    def _rotulo(cliente: Cliente) -> str:
+        return f"{cliente.id_cliente} - {cliente.nome} ({cliente.telefone})"
+
+    def _ao_digitar(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab", "Left", "Right", "Home", "End"):
+            return
+        ids = self.lanchonete.indice_clientes.buscar(self.get(), self.LIMITE_SUGESTOES)
+        clientes = [self.lanchonete.clientes[i] for i in ids if i in self.lanchonete.clientes]
+        self._rotulos = {self._rotulo(c): c.id_cliente for c in clientes}
+        self['values'] = list(self._rotulos)
+
+    def _aceitar_primeira(self, event):
+        valores = self['values']
+        if valores and self.get() not in self._rotulos:
+            self.set(valores[0])
+            self.event_generate("<<ComboboxSelected>>")
+
+    def id_cliente(self) -> str:
+        """ID do cliente escolhido: uma sugestão da lista ou um ID digitado por inteiro."""
+        texto = self.get().strip()
+        if texto in self._rotulos:
+            return self._rotulos[texto]
+        return texto if texto in self.lanchonete.clientes else texto.split(" - ", 1)[0]
+
+    def selecionar(self, id_cliente: str):
+        cliente = self.lanchonete.clientes.get(id_cliente)
+        if cliente is None:
+            self._rotulos = {}
+            self['values'] = []
+            self.set("")
+            return
+        rotulo = self._rotulo(cliente)
+        self._rotulos = {rotulo: id_cliente}
+        self['values'] = [rotulo]
+        self.set(rotulo)
+
+    def revalidar(self):
+        """Depois de mudanças nos clientes: mantém a escolha atual se ela ainda existir."""
+        id_cliente = self.id_cliente()
+        self.selecionar(id_cliente if id_cliente in self.lanchonete.clientes else "")
+
+
 class LanchoneteApp:
-    def __init__(self, master):
+    INTERVALO_COZINHA_MS = 5000
+    INTERVALO_ALERTA_ESTOQUE_MS = 1000
+    INTERVALO_IMPRESSAO_MS = 2000
+    INTERVALO_CARGA_MS = 30
+    INTERVALO_PAINEL_MS = 5000
+    INTERVALO_VERIFICACAO_MS = 200
+    ARQUIVO_METRICAS = "lanchonete_metricas.json"
+
+    def __init__(self, master, alocador_ids: AlocadorIdsPedido = None):
         self.master = master
         master.title("Sistema de Gerenciamento de Lanchonetes")
         master.geometry("1100x780") 
         master.resizable(False, False)
 
-        self.lanchonete = Lanchonete("Minha Lanchonete Deliciosa")
+        # A carga do arquivo roda em segundo plano (iniciar_carga_dados); a janela aparece já vazia
+        self.lanchonete = Lanchonete("Minha Lanchonete Deliciosa", alocador_ids, carregar=False)
+
+        # Recibo e ticket da cozinha saem por um spooler; sem impressora configurada, vão para arquivos de texto
+        base = os.path.splitext(self.lanchonete.ARQUIVO_DADOS)[0]
+        self.spooler = SpoolerImpressao()
+        self.saida_recibo = criar_saida_impressao(os.environ.get("LANCHONETE_IMPRESSORA_RECIBO") or f"arquivo:{base}_recibos.txt")
+        self.saida_cozinha = criar_saida_impressao(os.environ.get("LANCHONETE_IMPRESSORA_COZINHA") or f"arquivo:{base}_cozinha.txt")
+        self._versao_erros_impressao = 0
 
         # As variáveis de cor devem ser atributos da instância para serem acessíveis por outros métodos
         self.BACKGROUND_COLOR = '#F0F0F0' # Light gray
@@ -456,6 +4183,11 @@ class LanchoneteApp:
 
         self.setup_styles()
 
+        # Aviso de estoque baixo: só aparece quando há produtos no ponto de reposição
+        self.alerta_estoque_label = ttk.Label(master, text="", style='Alerta.TLabel', anchor='w', cursor="hand2")
+        self.alerta_estoque_label.bind("<Button-1>", lambda event: self.notebook.select(self.frame_produtos))
+        self._versao_alerta_estoque = None
+
         self.notebook = ttk.Notebook(master)
         self.notebook.pack(expand=True, fill="both", padx=10, pady=10)
 
@@ -463,27 +4195,22 @@ class LanchoneteApp:
         self.frame_vendas = ttk.Frame(self.notebook, style='Card.TFrame')
         self.notebook.add(self.frame_vendas, text="🛒 Vendas (PDV)")
         
-        # Inicialize carrinho_pdv AQUI, antes de chamar criar_interface_vendas
-        self.carrinho_pdv = {} # <--- Adicione esta linha
+        # Carrinhos do terminal (o ativo e os estacionados), antes de chamar criar_interface_vendas
+        self.arquivo_carrinhos = f"{base}_carrinhos.json"
+        self.carrinhos = {} # nome -> CarrinhoPDV, na ordem de criação
+        self._combos_exibidos = {} # titular -> iids das linhas de combo na árvore do carrinho
+        self.carrinho_ativo = self._novo_carrinho()
 
         self.criar_interface_vendas(self.frame_vendas)
 
-        # Outras abas
-        self.frame_produtos = ttk.Frame(self.notebook, style='Card.TFrame')
-        self.notebook.add(self.frame_produtos, text="🍔 Produtos")
-        self.criar_interface_produtos(self.frame_produtos)
-
-        self.frame_clientes = ttk.Frame(self.notebook, style='Card.TFrame')
-        self.notebook.add(self.frame_clientes, text="👥 Clientes")
-        self.criar_interface_clientes(self.frame_clientes)
-
-        self.frame_pedidos = ttk.Frame(self.notebook, style='Card.TFrame')
-        self.notebook.add(self.frame_pedidos, text="📋 Pedidos")
-        self.criar_interface_pedidos(self.frame_pedidos)
-
-        self.frame_relatorios = ttk.Frame(self.notebook, style='Card.TFrame')
-        self.notebook.add(self.frame_relatorios, text="📊 Relatórios")
-        self.criar_interface_relatorios(self.frame_relatorios)
+        # Outras abas: montadas só na primeira vez que forem abertas (on_tab_change)
+        self._abas_pendentes = {} # frame -> função que monta a aba
+        self.frame_produtos = self._adicionar_aba("🍔 Produtos", self.criar_interface_produtos)
+        self.frame_clientes = self._adicionar_aba("👥 Clientes", self.criar_interface_clientes)
+        self.frame_pedidos = self._adicionar_aba("📋 Pedidos", self.criar_interface_pedidos)
+        self.frame_cozinha = self._adicionar_aba("👨‍🍳 Cozinha", self.criar_interface_cozinha)
+        self.frame_relatorios = self._adicionar_aba("📊 Relatórios", self.criar_interface_relatorios)
+        self.frame_painel = self._adicionar_aba("📈 Painel", self.criar_interface_painel)
 
         # Mensagem de feedback na parte inferior
         self.message_label = ttk.Label(master, text="", style='Feedback.TLabel', anchor='center')
@@ -492,8 +4219,21 @@ class LanchoneteApp:
         self.atualizar_todas_as_listas_e_comboboxes()
         self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_change)
         master.protocol("WM_DELETE_WINDOW", self.on_closing)
-
-        # self.carrinho_pdv = {} # Esta linha foi movida para cima
+        master.bind("<F12>", lambda event: self.abrir_diagnostico())
+        self.master.after(self.INTERVALO_COZINHA_MS, self.ciclo_atualizacao_cozinha)
+        self.ciclo_alerta_estoque()
+        self.iniciar_carga_dados()
+        self.master.after(self.INTERVALO_IMPRESSAO_MS, self.ciclo_impressao)
+        self.master.after(self.INTERVALO_PAINEL_MS, self.ciclo_atualizacao_painel)
+
+    @property
+    def carrinho_pdv(self) -> dict:
+        return self.carrinho_ativo.itens
+
+    @property
+    def titular_carrinho(self) -> str:
+        """Titular das reservas de estoque feitas pelo carrinho ativo."""
+        return self.carrinho_ativo.titular
 
     def setup_styles(self):
         self.style = ttk.Style()
@@ -549,29 +4289,230 @@ class LanchoneteApp:
                        background=[('selected', self.PRIMARY_COLOR)], 
                        foreground=[('selected', 'white')])
 
+        # Estilo do aviso de estoque baixo
+        self.style.configure('Alerta.TLabel', background=self.ACCENT_COLOR, foreground=self.TEXT_COLOR,
+                             font=('Arial', 10, 'bold'), padding=[10, 4])
+
+
+    def _adicionar_aba(self, texto: str, criar_interface) -> ttk.Frame:
+        frame = ttk.Frame(self.notebook, style='Card.TFrame')
+        self.notebook.add(frame, text=texto)
+        self._abas_pendentes[frame] = criar_interface
+        return frame
+
+    def _aba_montada(self, frame: ttk.Frame) -> bool:
+        return frame not in self._abas_pendentes
+
+    def _montar_aba(self, frame: ttk.Frame):
+        criar_interface = self._abas_pendentes.pop(frame, None)
+        if criar_interface:
+            criar_interface(frame)
+
+    # --- Carga dos Dados em Segundo Plano ---
+    def iniciar_carga_dados(self):
+        """Lê o arquivo numa thread de trabalho; as etapas são aplicadas aqui, na thread da interface.
+
+        Até os pedidos em aberto chegarem (reservas e fila da cozinha prontas), a janela só
+        mostra os dados; depois já aceita vendas enquanto o histórico termina de carregar.
+        """
+        self._inicio_carga = time.perf_counter()
+        self._etapas_carga = queue.Queue()
+        self._bloquear_interface(True)
+        self._mostrar_progresso_carga("Carregando dados...")
+        threading.Thread(target=self._ler_etapas_carga, name="carga-dados", daemon=True).start()
+        self.master.after(self.INTERVALO_CARGA_MS, self.aplicar_etapas_carga)
+
+    def _ler_etapas_carga(self):
+        # Thread de trabalho: só lê e monta objetos; avisos e tela ficam com a thread da interface
+        try:
+            for etapa in self.lanchonete.etapas_carga():
+                self._etapas_carga.put(etapa)
+        except Exception as e:
+            self._etapas_carga.put(("erro", e))
+
+    def aplicar_etapas_carga(self):
+        limite = time.perf_counter() + self.INTERVALO_CARGA_MS / 1000 # Não segura a interface mais que um intervalo
+        while time.perf_counter() < limite:
+            try:
+                etapa, conteudo = self._etapas_carga.get_nowait()
+            except queue.Empty:
+                break
+            if etapa == "erro":
+                self.lanchonete.interromper_carga()
+                informativo, titulo, texto = self.lanchonete.descrever_erro_carga(conteudo)
+                (messagebox.showinfo if informativo else messagebox.showerror)(titulo, texto)
+                self._finalizar_carga()
+                return
+            self.lanchonete.aplicar_etapa_carga(etapa, conteudo)
+            if etapa == "cadastros":
+                self.atualizar_todas_as_listas_e_comboboxes()
+                self._mostrar_progresso_carga(f"Carregando pedidos... ({len(self.lanchonete.cardapio)} produtos, "
+                                              f"{len(self.lanchonete.clientes)} clientes)")
+            elif etapa == "pedidos_abertos":
+                self.restaurar_carrinhos() # Depois das reservas dos pedidos, que são refeitas do zero
+                self.atualizar_lista_produtos_pdv()
+                self.atualizar_fila_cozinha(forcar=True)
+                self._bloquear_interface(False)
+                self._mostrar_progresso_carga(f"Carregando histórico de pedidos... ({len(self.lanchonete.pedidos)} carregados)")
+            elif etapa == "pedidos":
+                self._mostrar_progresso_carga(f"Carregando histórico de pedidos... ({len(self.lanchonete.pedidos)} carregados)")
+            elif etapa == "extras":
+                self._finalizar_carga()
+                return
+        self.master.after(self.INTERVALO_CARGA_MS, self.aplicar_etapas_carga)
+
+    def _finalizar_carga(self):
+        self._bloquear_interface(False)
+        self.atualizar_todas_as_listas_e_comboboxes()
+        self._mostrar_progresso_carga(f"{len(self.lanchonete.pedidos)} pedidos carregados em "
+                                      f"{time.perf_counter() - self._inicio_carga:.1f} s.")
+        self.master.after(5000, lambda: self._mostrar_progresso_carga(""))
+        self.iniciar_verificacao_consistencia(exibir=False)
+
+    # --- Verificação de Consistência em Segundo Plano ---
+    def iniciar_verificacao_consistencia(self, exibir: bool):
+        """Verifica os dados numa thread de trabalho; 'exibir' mostra o relatório mesmo sem anomalias."""
+        if self.lanchonete.carga_em_andamento:
+            self.exibir_mensagem("Aguarde o fim da carga dos dados para verificar a consistência.", True)
+            return
+        if getattr(self, "_verificacao", None):
+            self._verificacao["exibir"] |= exibir
+            return
+        verificador = VerificadorConsistencia(self.lanchonete) # Cópias tiradas aqui, na thread da interface
+        resultado = queue.Queue()
+
+        def executar():
+            inicio = time.perf_counter()
+            try:
+                resultado.put((verificador.executar(), time.perf_counter() - inicio))
+            except Exception as e:
+                resultado.put((e, time.perf_counter() - inicio))
+
+        self._verificacao = {"verificador": verificador, "resultado": resultado, "exibir": exibir}
+        if exibir:
+            self.exibir_mensagem("Verificando a consistência dos dados...")
+        threading.Thread(target=executar, name="verificacao-consistencia", daemon=True).start()
+        self.master.after(self.INTERVALO_VERIFICACAO_MS, self.concluir_verificacao_consistencia)
+
+    def concluir_verificacao_consistencia(self):
+        try:
+            anomalias, duracao = self._verificacao["resultado"].get_nowait()
+        except queue.Empty:
+            self.master.after(self.INTERVALO_VERIFICACAO_MS, self.concluir_verificacao_consistencia)
+            return
+        verificacao, self._verificacao = self._verificacao, None
+        if isinstance(anomalias, Exception):
+            self.exibir_mensagem(f"Erro na verificação de consistência: {anomalias}", True)
+            return
+        anomalias = verificacao["verificador"].confirmar(anomalias)
+        relatorio = self.lanchonete.relatorio_consistencia(anomalias, duracao)
+        if not verificacao["exibir"]:
+            if anomalias:
+                self.exibir_mensagem(f"{len(anomalias)} anomalia(s) encontrada(s) nos dados. "
+                                     "Detalhes em Relatórios > 🩺 Verificar Consistência.", True)
+            return
+        self.exibir_mensagem(f"Verificação de consistência: {relatorio['total_anomalias']} anomalia(s) em "
+                             f"{relatorio['pedidos']} pedidos e {relatorio['produtos']} produtos.", bool(anomalias))
+        self.limpar_relatorio_display()
+        self.escrever_no_relatorio_display("--- Verificação de Consistência ---")
+        self.escrever_no_relatorio_display(
+            f"{relatorio['pedidos']} pedidos e {relatorio['produtos']} produtos verificados em {relatorio['duracao_s']:.2f} s"
+            f"{' (em bloco com NumPy)' if relatorio['em_bloco'] else ''}.")
+        if not anomalias:
+            self.escrever_no_relatorio_display("Nenhuma anomalia encontrada.")
+        for grupo in relatorio["anomalias"].values():
+            self.escrever_no_relatorio_display(f"\n{grupo['descricao']}: {grupo['quantidade']}")
+            for exemplo in grupo["exemplos"]:
+                self.escrever_no_relatorio_display(f"  {exemplo}")
+            if grupo["quantidade"] > len(grupo["exemplos"]):
+                self.escrever_no_relatorio_display(f"  ... e mais {grupo['quantidade'] - len(grupo['exemplos'])}")
+
+    def _mostrar_progresso_carga(self, texto: str):
+        self.message_label.config(text=texto, foreground=self.style.lookup('Feedback.TLabel', 'foreground', default='blue'))
+
+    def _bloquear_interface(self, bloquear: bool):
+        """Ignora cliques e teclas no notebook (a tela continua sendo redesenhada). Requer Tk 8.6."""
+        try:
+            self.master.tk.call('tk', 'busy', 'hold' if bloquear else 'forget', self.notebook)
+        except tk.TclError:
+            pass
 
     def on_closing(self):
         """Função para salvar dados ao fechar a janela."""
+        if self.lanchonete.carga_em_andamento:
+            if messagebox.askokcancel("Sair", "Os dados ainda estão sendo carregados. Sair sem salvar?"):
+                self.spooler.parar(timeout=5)
+                self.master.destroy()
+            return
         if messagebox.askokcancel("Sair", "Deseja salvar os dados e sair?"):
+            self.salvar_carrinhos()
+            for carrinho in self.carrinhos.values():
+                self.lanchonete.reservas.liberar(carrinho.titular)
             self.lanchonete.salvar_dados()
+            if not self.spooler.parar(timeout=5):
+                print(f"Aviso: {self.spooler.pendentes()} documento(s) ainda na fila de impressão não foram impressos.")
+            if METRICAS.ativo and METRICAS.resumo():
+                try:
+                    METRICAS.gravar(self.ARQUIVO_METRICAS)
+                except OSError as e:
+                    print(f"Aviso: não foi possível gravar as métricas em '{self.ARQUIVO_METRICAS}': {e}")
             self.master.destroy()
 
     def on_tab_change(self, event):
+        self._montar_aba(self.notebook.nametowidget(self.notebook.select()))
         selected_tab = self.notebook.tab(self.notebook.select(), "text")
         if "Produtos" in selected_tab: # Usando "in" para ser mais flexível com ícones
             self.atualizar_lista_produtos()
         elif "Clientes" in selected_tab:
             self.atualizar_lista_clientes()
         elif "Pedidos" in selected_tab:
-            self.atualizar_lista_pedidos(self.filter_status_combo.get())
+            self.atualizar_lista_pedidos()
             self.atualizar_comboboxes_pedido() 
+        elif "Cozinha" in selected_tab:
+            self.atualizar_fila_cozinha(forcar=True)
         elif "Relatórios" in selected_tab:
             self.limpar_relatorio_display()
             self.atualizar_comboboxes_relatorio() 
+        elif "Painel" in selected_tab:
+            self.atualizar_painel(forcar=True)
         elif "Vendas (PDV)" in selected_tab:
             self.atualizar_comboboxes_vendas()
             self.atualizar_lista_produtos_pdv()
-            self.limpar_carrinho_pdv_gui() # Limpa o carrinho ao mudar para a aba
+
+    def atualizar_alerta_estoque(self):
+        """Redesenha o aviso só quando a lista de produtos em alerta mudou."""
+        vigia = self.lanchonete.vigia_estoque
+        if vigia.versao == self._versao_alerta_estoque:
+            return
+        self._versao_alerta_estoque = vigia.versao
+        quantidade = vigia.quantidade()
+        if not quantidade:
+            self.alerta_estoque_label.pack_forget()
+            return
+        resumo = ", ".join(f"{p.nome} ({p.estoque}/{p.estoque_minimo})" for p in vigia.alertas(5))
+        if quantidade > 5:
+            resumo += f" e mais {quantidade - 5}"
+        self.alerta_estoque_label.config(text=f"⚠️ {quantidade} produto(s) com estoque baixo: {resumo}")
+        if not self.alerta_estoque_label.winfo_manager():
+            self.alerta_estoque_label.pack(side="top", fill="x", padx=10, pady=(5, 0), before=self.notebook)
+
+    def ciclo_alerta_estoque(self):
+        self.atualizar_alerta_estoque()
+        self.master.after(self.INTERVALO_ALERTA_ESTOQUE_MS, self.ciclo_alerta_estoque)
+
+    def ciclo_impressao(self):
+        """Avisa na interface quando o spooler desiste de imprimir algum documento."""
+        if self.spooler.versao_erros != self._versao_erros_impressao:
+            self._versao_erros_impressao = self.spooler.versao_erros
+            id_pedido, tipo, erro = self.spooler.erros[-1]
+            documento = "recibo" if tipo == "recibo" else "ticket da cozinha"
+            self.exibir_mensagem(f"Falha ao imprimir o {documento} do pedido {id_pedido}: {erro}", True)
+        self.master.after(self.INTERVALO_IMPRESSAO_MS, self.ciclo_impressao)
+
+    def imprimir_pedido(self, pedido: Pedido):
+        cliente = self.lanchonete.clientes.get(pedido.id_cliente)
+        self.spooler.enfileirar(DocumentoImpressao.recibo(pedido, cliente, self.lanchonete.nome), self.saida_recibo)
+        self.spooler.enfileirar(DocumentoImpressao.ticket_cozinha(pedido, cliente), self.saida_cozinha)
 
     def atualizar_todas_as_listas_e_comboboxes(self):
         """Chama todas as funções de atualização necessárias."""
@@ -582,7 +4523,32 @@ class LanchoneteApp:
         self.atualizar_comboboxes_relatorio()
         self.atualizar_comboboxes_vendas()
         self.atualizar_lista_produtos_pdv()
-        self.atualizar_carrinho_pdv_gui() # Garante que o carrinho está vazio ao iniciar
+        self.atualizar_carrinho_pdv_gui()
+        self.atualizar_fila_cozinha(forcar=True)
+
+    def importar_arquivo_gui(self, tipo: str):
+        caminho = filedialog.askopenfilename(
+            title=f"Importar {tipo}",
+            filetypes=[("CSV ou JSON Lines", "*.csv *.jsonl *.ndjson"), ("Todos os arquivos", "*.*")]
+        )
+        if not caminho:
+            return
+
+        try:
+            importados, erros = self.lanchonete.importar_lote(caminho, tipo)
+        except (OSError, UnicodeDecodeError) as e:
+            self.exibir_mensagem(f"Erro ao ler o arquivo de importação: {e}", True)
+            return
+
+        resumo = f"{importados} registro(s) de {tipo} importado(s), {len(erros)} linha(s) com erro."
+        if erros:
+            detalhes = "\n".join([f"Linha {linha}: {mensagem}" for linha, mensagem in erros[:20]])
+            if len(erros) > 20:
+                detalhes += f"\n... e mais {len(erros) - 20} erro(s)."
+            messagebox.showwarning("Importação", f"{resumo}\n\n{detalhes}")
+        self.exibir_mensagem(resumo)
+        if importados:
+            self.atualizar_todas_as_listas_e_comboboxes()
 
     def exibir_mensagem(self, message: str, is_error: bool = False):
         """Exibe mensagens de feedback com estilo."""
@@ -617,34 +4583,47 @@ class LanchoneteApp:
         self.prod_estoque_entry = ttk.Entry(input_frame, width=20)
         self.prod_estoque_entry.grid(row=3, column=1, padx=5, pady=5, sticky="ew")
 
+        ttk.Label(input_frame, text="Estação:").grid(row=4, column=0, padx=5, pady=5, sticky="w")
+        self.prod_estacao_entry = ttk.Entry(input_frame, width=20)
+        self.prod_estacao_entry.insert(0, "Cozinha")
+        self.prod_estacao_entry.grid(row=4, column=1, padx=5, pady=5, sticky="ew")
+
+        ttk.Label(input_frame, text="Estoque Mínimo:").grid(row=5, column=0, padx=5, pady=5, sticky="w")
+        self.prod_estoque_minimo_entry = ttk.Entry(input_frame, width=20)
+        self.prod_estoque_minimo_entry.grid(row=5, column=1, padx=5, pady=5, sticky="ew")
+
         self.prod_disponivel_var = tk.BooleanVar(value=True)
-        ttk.Checkbutton(input_frame, text="Produto Disponível", variable=self.prod_disponivel_var).grid(row=4, column=1, padx=5, pady=5, sticky="w")
+        ttk.Checkbutton(input_frame, text="Produto Disponível", variable=self.prod_disponivel_var).grid(row=6, column=1, padx=5, pady=5, sticky="w")
 
         button_frame = ttk.Frame(input_frame)
-        button_frame.grid(row=5, column=0, columnspan=2, pady=10)
+        button_frame.grid(row=7, column=0, columnspan=2, pady=10)
 
         ttk.Button(button_frame, text="➕ Adicionar", command=self.adicionar_produto_gui, style='TButton').pack(side="left", padx=5)
         ttk.Button(button_frame, text="🗑️ Remover", command=self.remover_produto_gui, style='TButton').pack(side="left", padx=5)
         ttk.Button(button_frame, text="✏️ Atualizar Dados", command=self.atualizar_produto_gui, style='TButton').pack(side="left", padx=5)
         ttk.Button(button_frame, text="🔄 Atualizar Disponibilidade", command=self.atualizar_disponibilidade_produto_gui, style='TButton').pack(side="left", padx=5)
         ttk.Button(button_frame, text="🧹 Limpar Campos", command=self.limpar_campos_produto, style='TButton').pack(side="left", padx=5)
+        ttk.Button(button_frame, text="📥 Importar", command=lambda: self.importar_arquivo_gui("produtos"), style='TButton').pack(side="left", padx=5)
+        ttk.Button(button_frame, text="🏷️ Promoções", command=self.abrir_promocoes, style='TButton').pack(side="left", padx=5)
 
 
         list_frame = ttk.LabelFrame(parent_frame, text="Cardápio Atual", padding="15")
         list_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
-        self.tree_produtos = ttk.Treeview(list_frame, columns=("ID", "Nome", "Preço", "Estoque", "Disponível"), show="headings", style="Treeview")
+        self.tree_produtos = ttk.Treeview(list_frame, columns=("ID", "Nome", "Preço", "Estoque", "Disponível", "Mínimo"), show="headings", style="Treeview")
         self.tree_produtos.heading("ID", text="ID")
         self.tree_produtos.heading("Nome", text="Nome")
         self.tree_produtos.heading("Preço", text="Preço")
         self.tree_produtos.heading("Estoque", text="Estoque")
         self.tree_produtos.heading("Disponível", text="Disponível")
+        self.tree_produtos.heading("Mínimo", text="Estoque Mín.")
 
         self.tree_produtos.column("ID", width=100, anchor="center")
         self.tree_produtos.column("Nome", width=250)
         self.tree_produtos.column("Preço", width=100, anchor="e")
         self.tree_produtos.column("Estoque", width=100, anchor="center")
         self.tree_produtos.column("Disponível", width=100, anchor="center")
+        self.tree_produtos.column("Mínimo", width=100, anchor="center")
 
         self.tree_produtos.pack(side="left", fill="both", expand=True)
 
@@ -659,6 +4638,8 @@ class LanchoneteApp:
         nome_prod = self.prod_nome_entry.get().strip()
         preco_str = self.prod_preco_entry.get().strip()
         estoque_str = self.prod_estoque_entry.get().strip()
+        estacao = self.prod_estacao_entry.get().strip() or "Cozinha"
+        estoque_minimo_str = self.prod_estoque_minimo_entry.get().strip()
         disponivel = self.prod_disponivel_var.get()
 
         if not id_prod or not nome_prod or not preco_str or not estoque_str:
@@ -666,7 +4647,7 @@ class LanchoneteApp:
             return
         
         try:
-            preco_prod = float(preco_str)
+            preco_prod = centavos(preco_str)
             if preco_prod <= 0:
                 self.exibir_mensagem("Preço deve ser maior que zero.", True)
                 return
@@ -683,7 +4664,13 @@ class LanchoneteApp:
             self.exibir_mensagem("Estoque inválido. Use um número inteiro.", True)
             return
 
-        novo_produto = Produto(id_prod, nome_prod, preco_prod, disponivel, estoque_prod)
+        try:
+            estoque_minimo = int(estoque_minimo_str) if estoque_minimo_str else 0
+        except ValueError:
+            self.exibir_mensagem("Estoque mínimo inválido. Use um número inteiro.", True)
+            return
+
+        novo_produto = Produto(id_prod, nome_prod, preco_prod, disponivel, estoque_prod, estacao, estoque_minimo)
         success, message = self.lanchonete.adicionar_produto(novo_produto)
         self.exibir_mensagem(message, not success)
         if success:
@@ -724,11 +4711,13 @@ class LanchoneteApp:
         nome_prod = self.prod_nome_entry.get().strip()
         preco_str = self.prod_preco_entry.get().strip()
         estoque_str = self.prod_estoque_entry.get().strip()
+        estacao = self.prod_estacao_entry.get().strip()
+        estoque_minimo_str = self.prod_estoque_minimo_entry.get().strip()
 
         preco_prod = None
         if preco_str:
             try:
-                preco_prod = float(preco_str)
+                preco_prod = centavos(preco_str)
                 if preco_prod <= 0:
                     self.exibir_mensagem("Preço deve ser maior que zero.", True)
                     return
@@ -747,15 +4736,25 @@ class LanchoneteApp:
                 self.exibir_mensagem("Estoque inválido. Use um número inteiro.", True)
                 return
         
-        if not nome_prod and preco_prod is None and estoque_prod is None:
-            self.exibir_mensagem("Preencha ao menos um campo (Nome, Preço ou Estoque) para atualizar.", True)
+        estoque_minimo = None
+        if estoque_minimo_str:
+            try:
+                estoque_minimo = int(estoque_minimo_str)
+            except ValueError:
+                self.exibir_mensagem("Estoque mínimo inválido. Use um número inteiro.", True)
+                return
+
+        if not nome_prod and preco_prod is None and estoque_prod is None and not estacao and estoque_minimo is None:
+            self.exibir_mensagem("Preencha ao menos um campo (Nome, Preço, Estoque, Estação ou Estoque Mínimo) para atualizar.", True)
             return
 
         success, message = self.lanchonete.atualizar_produto_info(
             original_id_prod, 
             nome_prod if nome_prod else None, 
             preco_prod,
-            estoque_prod
+            estoque_prod,
+            estacao if estacao else None,
+            estoque_minimo
         )
         self.exibir_mensagem(message, not success)
         if success:
@@ -781,12 +4780,15 @@ class LanchoneteApp:
             self.atualizar_lista_produtos()
             self.atualizar_lista_produtos_pdv()
 
+    @instrumentado
     def atualizar_lista_produtos(self):
+        if not self._aba_montada(self.frame_produtos):
+            return
         for item in self.tree_produtos.get_children():
             self.tree_produtos.delete(item)
         
         for produto in self.lanchonete.cardapio.values():
-            self.tree_produtos.insert("", "end", values=(produto.id_produto, produto.nome, f"{produto.preco:.2f}", produto.estoque, "Sim" if produto.disponivel else "Não"))
+            self.tree_produtos.insert("", "end", values=(produto.id_produto, produto.nome, formatar_centavos(produto.preco_centavos), produto.estoque, "Sim" if produto.disponivel else "Não", produto.estoque_minimo))
 
     def carregar_produto_selecionado(self, event):
         selected_item = self.tree_produtos.selection()
@@ -800,14 +4802,23 @@ class LanchoneteApp:
             self.prod_preco_entry.insert(0, values[2])
             self.prod_estoque_entry.delete(0, tk.END)
             self.prod_estoque_entry.insert(0, values[3])
+            produto = self.lanchonete.cardapio.get(values[0])
+            self.prod_estacao_entry.delete(0, tk.END)
+            self.prod_estacao_entry.insert(0, produto.estacao if produto else "Cozinha")
+            self.prod_estoque_minimo_entry.delete(0, tk.END)
+            self.prod_estoque_minimo_entry.insert(0, values[5])
             self.prod_disponivel_var.set(True if values[4] == "Sim" else False)
-            self.manage_pedido_produto_id_combo.set(values[0])
+            if self._aba_montada(self.frame_pedidos):
+                self.manage_pedido_produto_id_combo.set(values[0])
 
     def limpar_campos_produto(self):
         self.prod_id_entry.delete(0, tk.END)
         self.prod_nome_entry.delete(0, tk.END)
         self.prod_preco_entry.delete(0, tk.END)
         self.prod_estoque_entry.delete(0, tk.END)
+        self.prod_estacao_entry.delete(0, tk.END)
+        self.prod_estacao_entry.insert(0, "Cozinha")
+        self.prod_estoque_minimo_entry.delete(0, tk.END)
         self.prod_disponivel_var.set(True)
 
 
@@ -840,6 +4851,7 @@ class LanchoneteApp:
         ttk.Button(button_frame, text="➕ Cadastrar", command=self.cadastrar_cliente_gui, style='TButton').pack(side="left", padx=5)
         ttk.Button(button_frame, text="✏️ Atualizar", command=self.atualizar_cliente_gui, style='TButton').pack(side="left", padx=5)
         ttk.Button(button_frame, text="🧹 Limpar Campos", command=self.limpar_campos_cliente, style='TButton').pack(side="left", padx=5)
+        ttk.Button(button_frame, text="📥 Importar", command=lambda: self.importar_arquivo_gui("clientes"), style='TButton').pack(side="left", padx=5)
 
 
         list_frame = ttk.LabelFrame(parent_frame, text="Clientes Cadastrados", padding="15")
@@ -917,7 +4929,10 @@ class LanchoneteApp:
             self.atualizar_comboboxes_vendas()
 
 
+    @instrumentado
     def atualizar_lista_clientes(self):
+        if not self._aba_montada(self.frame_clientes):
+            return
         for item in self.tree_clientes.get_children():
             self.tree_clientes.delete(item)
         
@@ -936,9 +4951,11 @@ class LanchoneteApp:
             self.cli_tel_entry.insert(0, values[2])
             self.cli_end_entry.delete(0, tk.END)
             self.cli_end_entry.insert(0, values[3])
-            self.pedido_cliente_id_combo.set(values[0]) 
-            self.rel_pedidos_cliente_id_combo.set(values[0]) 
-            self.vendas_cliente_id_combo.set(values[0])
+            if self._aba_montada(self.frame_pedidos):
+                self.pedido_cliente_id_combo.selecionar(values[0])
+            if self._aba_montada(self.frame_relatorios):
+                self.rel_pedidos_cliente_id_combo.selecionar(values[0])
+            self.vendas_cliente_id_combo.selecionar(values[0])
 
     def limpar_campos_cliente(self):
         self.cli_id_entry.delete(0, tk.END)
@@ -954,11 +4971,12 @@ class LanchoneteApp:
         create_order_frame.columnconfigure(1, weight=1)
 
         ttk.Label(create_order_frame, text="Cliente:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
-        self.pedido_cliente_id_combo = ttk.Combobox(create_order_frame, state="readonly")
+        self.pedido_cliente_id_combo = ComboboxClientes(create_order_frame, self.lanchonete)
         self.pedido_cliente_id_combo.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
         self.pedido_cliente_id_combo.bind("<<ComboboxSelected>>", self.on_cliente_selecionado_pedido)
         
         ttk.Button(create_order_frame, text="➕ Criar Pedido", command=self.criar_pedido_gui, style='TButton').grid(row=0, column=2, padx=5, pady=5)
+        ttk.Button(create_order_frame, text="📥 Importar Histórico", command=lambda: self.importar_arquivo_gui("pedidos"), style='TButton').grid(row=0, column=3, padx=5, pady=5)
 
 
         # Frame para adicionar/remover itens e atualizar status
@@ -1033,12 +5051,9 @@ class LanchoneteApp:
         self.tree_pedidos.bind("<ButtonRelease-1>", self.carregar_pedido_selecionado)
 
     def atualizar_comboboxes_pedido(self):
-        clientes_ids = sorted(list(self.lanchonete.clientes.keys()))
-        self.pedido_cliente_id_combo['values'] = clientes_ids
-        if clientes_ids:
-            self.pedido_cliente_id_combo.set(clientes_ids[0])
-        else:
-            self.pedido_cliente_id_combo.set("")
+        if not self._aba_montada(self.frame_pedidos):
+            return
+        self.pedido_cliente_id_combo.revalidar()
 
         produtos_ids = sorted(list(self.lanchonete.cardapio.keys()))
         self.manage_pedido_produto_id_combo['values'] = produtos_ids
@@ -1048,10 +5063,10 @@ class LanchoneteApp:
             self.manage_pedido_produto_id_combo.set("")
 
     def on_cliente_selecionado_pedido(self, event):
-        selected_client_id = self.pedido_cliente_id_combo.get()
+        selected_client_id = self.pedido_cliente_id_combo.id_cliente()
 
     def criar_pedido_gui(self):
-        id_cli = self.pedido_cliente_id_combo.get().strip() 
+        id_cli = self.pedido_cliente_id_combo.id_cliente() 
         if not id_cli:
             self.exibir_mensagem("Selecione um Cliente para criar um pedido.", True)
             return
@@ -1059,11 +5074,11 @@ class LanchoneteApp:
         success, message, novo_pedido = self.lanchonete.criar_pedido(id_cli)
         self.exibir_mensagem(message, not success)
         if success:
-            self.atualizar_lista_pedidos(self.filter_status_combo.get())
+            self.atualizar_lista_pedidos()
             if novo_pedido:
                 self.manage_pedido_id_entry.delete(0, tk.END)
                 self.manage_pedido_id_entry.insert(0, novo_pedido.id_pedido)
-            self.pedido_cliente_id_combo.set(id_cli) 
+            self.pedido_cliente_id_combo.selecionar(id_cli) 
             self.limpar_campos_item_pedido() 
 
     def adicionar_item_a_pedido(self, id_pedido: str, id_produto: str, quantidade: int) -> tuple[bool, str]:
@@ -1119,7 +5134,7 @@ class LanchoneteApp:
         success, message = self.lanchonete.adicionar_item_a_pedido(id_ped, id_prod, quantidade)
         self.exibir_mensagem(message, not success)
         if success:
-            self.atualizar_lista_pedidos(self.filter_status_combo.get())
+            self.atualizar_lista_pedidos()
             self.limpar_campos_item_pedido()
             self.atualizar_lista_produtos() # Atualiza a lista de produtos para refletir a mudança no estoque
             self.carregar_pedido_selecionado(None)
@@ -1130,17 +5145,11 @@ class LanchoneteApp:
         if not pedido:
             return False, f"Erro: Pedido com ID '{id_pedido}' não encontrado."
         
-        item_removido = None
-        produto_original = None
-        for item in pedido.itens:
-            if item.produto.id_produto == id_produto:
-                item_removido = item
-                produto_original = item.produto # Guarda a referência ao produto original
-                break
+        item_removido = pedido.linha(id_produto)
+        produto_original = item_removido.produto if item_removido else None # Guarda a referência ao produto original
 
         if item_removido:
-            pedido.itens.remove(item_removido)
-            pedido.valor_total -= item_removido.subtotal
+            pedido.remover_item(id_produto)
             
             # Devolve o estoque ao produto quando o item é removido do pedido
             if produto_original:
@@ -1167,7 +5176,7 @@ class LanchoneteApp:
         success, message = self.lanchonete.remover_item_de_pedido(id_ped, id_prod)
         self.exibir_mensagem(message, not success)
         if success:
-            self.atualizar_lista_pedidos(self.filter_status_combo.get())
+            self.atualizar_lista_pedidos()
             self.limpar_campos_item_pedido()
             self.atualizar_lista_produtos() # Atualiza a lista de produtos para refletir a mudança no estoque
             self.carregar_pedido_selecionado(None)
@@ -1183,7 +5192,7 @@ class LanchoneteApp:
         success, message = self.lanchonete.atualizar_status_pedido(id_ped, novo_status)
         self.exibir_mensagem(message, not success)
         if success:
-            self.atualizar_lista_pedidos(self.filter_status_combo.get())
+            self.atualizar_lista_pedidos()
             self.atualizar_lista_produtos()
 
     def buscar_pedido_gui(self):
@@ -1196,7 +5205,7 @@ class LanchoneteApp:
         if pedido:
             self.exibir_mensagem(f"Pedido {pedido.id_pedido} encontrado. Status: {pedido.status}", False)
             self.pedido_status_combo.set(pedido.status)
-            self.pedido_cliente_id_combo.set(pedido.id_cliente) 
+            self.pedido_cliente_id_combo.selecionar(pedido.id_cliente) 
 
             for item_id in self.tree_pedidos.get_children():
                 if self.tree_pedidos.item(item_id, 'values')[0] == id_ped:
@@ -1208,7 +5217,13 @@ class LanchoneteApp:
             self.exibir_mensagem(f"Pedido com ID '{id_ped}' não encontrado.", True)
 
 
-    def atualizar_lista_pedidos(self, status_filtro: str = "Todos"):
+    @instrumentado
+    def atualizar_lista_pedidos(self, status_filtro: str = None):
+        """Sem status_filtro, usa o filtro escolhido na aba."""
+        if not self._aba_montada(self.frame_pedidos):
+            return
+        if status_filtro is None:
+            status_filtro = self.filter_status_combo.get()
         for item in self.tree_pedidos.get_children():
             self.tree_pedidos.delete(item)
         
@@ -1226,7 +5241,7 @@ class LanchoneteApp:
                 pedido.id_pedido, 
                 pedido.id_cliente, 
                 pedido.status, 
-                f"{pedido.valor_total:.2f}",
+                formatar_centavos(pedido.valor_total_centavos),
                 pedido.data_hora_criacao.strftime('%d/%m/%Y %H:%M'),
                 itens_resumo
             ))
@@ -1241,7 +5256,7 @@ class LanchoneteApp:
             values = self.tree_pedidos.item(selected_item, "values")
             self.manage_pedido_id_entry.delete(0, tk.END)
             self.manage_pedido_id_entry.insert(0, values[0])
-            self.pedido_cliente_id_combo.set(values[1]) 
+            self.pedido_cliente_id_combo.selecionar(values[1]) 
             self.pedido_status_combo.set(values[2])
             
             self.limpar_campos_item_pedido()
@@ -1250,6 +5265,224 @@ class LanchoneteApp:
         self.pedido_quantidade_entry.delete(0, tk.END)
 
 
+    # --- Interface da Cozinha ---
+    def criar_interface_cozinha(self, parent_frame):
+        self._versao_cozinha_exibida = None
+        self._minuto_cozinha_exibido = None
+
+        filas_frame = ttk.Frame(parent_frame)
+        filas_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.trees_cozinha = {}
+        for etapa, titulo in (("Pendente", "Aguardando Preparo"), ("Em Preparo", "Em Preparo")):
+            etapa_frame = ttk.LabelFrame(filas_frame, text=titulo, padding="10")
+            etapa_frame.pack(side="left", fill="both", expand=True, padx=5)
+
+            tree = ttk.Treeview(etapa_frame, columns=("Pedido", "Cliente", "Espera", "Itens"), show="headings", style="Treeview")
+            tree.heading("Pedido", text="Pedido")
+            tree.heading("Cliente", text="Cliente")
+            tree.heading("Espera", text="Espera (min)")
+            tree.heading("Itens", text="Itens (Nome: Qtd)")
+            tree.column("Pedido", width=100, anchor="center")
+            tree.column("Cliente", width=80, anchor="center")
+            tree.column("Espera", width=90, anchor="center")
+            tree.column("Itens", width=220)
+            tree.tag_configure("prioritario", background=self.ACCENT_COLOR)
+            tree.pack(side="left", fill="both", expand=True)
+
+            scrollbar_y = ttk.Scrollbar(etapa_frame, orient="vertical", command=tree.yview)
+            scrollbar_y.pack(side="right", fill="y")
+            tree.config(yscrollcommand=scrollbar_y.set)
+            self.trees_cozinha[etapa] = tree
+
+        button_frame = ttk.Frame(parent_frame)
+        button_frame.pack(fill="x", padx=10, pady=5)
+        ttk.Button(button_frame, text="▶️ Iniciar Preparo", command=lambda: self.avancar_pedido_cozinha("Pendente", "Em Preparo"), style='TButton').pack(side="left", padx=5)
+        ttk.Button(button_frame, text="✅ Marcar Pronto", command=lambda: self.avancar_pedido_cozinha("Em Preparo", "Pronto"), style='TButton').pack(side="left", padx=5)
+        ttk.Button(button_frame, text="⭐ Alternar Prioridade", command=self.alternar_prioridade_cozinha, style='TButton').pack(side="left", padx=5)
+
+        estacoes_frame = ttk.LabelFrame(parent_frame, text="Itens na Fila por Estação", padding="10")
+        estacoes_frame.pack(fill="x", padx=10, pady=10)
+        self.tree_estacoes = ttk.Treeview(estacoes_frame, columns=("Estação", "Pendente", "Em Preparo"), show="headings", height=5, style="Treeview")
+        for coluna in ("Estação", "Pendente", "Em Preparo"):
+            self.tree_estacoes.heading(coluna, text=coluna)
+            self.tree_estacoes.column(coluna, width=150, anchor="center")
+        self.tree_estacoes.pack(fill="x")
+
+    @instrumentado
+    def atualizar_fila_cozinha(self, forcar: bool = False):
+        if not self._aba_montada(self.frame_cozinha):
+            return
+        fila = self.lanchonete.fila_cozinha
+        minuto = int(time.time() // 60)
+        # Só redesenha se a fila mudou ou se o tempo de espera exibido ficou desatualizado
+        if not forcar and fila.versao == self._versao_cozinha_exibida and minuto == self._minuto_cozinha_exibido:
+            return
+        self._versao_cozinha_exibida = fila.versao
+        self._minuto_cozinha_exibido = minuto
+
+        agora = datetime.now()
+        for etapa, tree in self.trees_cozinha.items():
+            for item in tree.get_children():
+                tree.delete(item)
+            for id_pedido in fila.listar(etapa):
+                pedido = self.lanchonete.pedidos.get(id_pedido)
+                if not pedido:
+                    continue
+                espera = int((agora - pedido.data_hora_criacao).total_seconds() // 60)
+                itens_resumo = ", ".join([f"{item.produto.nome} ({item.quantidade})" for item in pedido.itens])
+                tree.insert("", "end", values=(pedido.id_pedido, pedido.id_cliente, espera, itens_resumo),
+                            tags=("prioritario",) if pedido.prioritario else ())
+
+        for item in self.tree_estacoes.get_children():
+            self.tree_estacoes.delete(item)
+        for estacao, por_etapa in sorted(fila.itens_por_estacao().items()):
+            self.tree_estacoes.insert("", "end", values=(estacao, por_etapa["Pendente"], por_etapa["Em Preparo"]))
+
+    def ciclo_atualizacao_cozinha(self):
+        if "Cozinha" in self.notebook.tab(self.notebook.select(), "text"):
+            self.atualizar_fila_cozinha()
+        self.master.after(self.INTERVALO_COZINHA_MS, self.ciclo_atualizacao_cozinha)
+
+    def _pedido_selecionado_cozinha(self, etapa: str = None):
+        etapas = [etapa] if etapa else list(self.trees_cozinha)
+        for nome_etapa in etapas:
+            tree = self.trees_cozinha[nome_etapa]
+            selected_item = tree.selection()
+            if selected_item:
+                return tree.item(selected_item, "values")[0]
+        return None
+
+    def avancar_pedido_cozinha(self, etapa_atual: str, proxima_etapa: str):
+        id_ped = self._pedido_selecionado_cozinha(etapa_atual) or self.lanchonete.fila_cozinha.proximo(etapa_atual)
+        if not id_ped:
+            self.exibir_mensagem(f"Nenhum pedido em '{etapa_atual}'.", True)
+            return
+        success, message = self.lanchonete.atualizar_status_pedido(id_ped, proxima_etapa)
+        self.exibir_mensagem(message, not success)
+        if success:
+            self.atualizar_fila_cozinha()
+
+    def alternar_prioridade_cozinha(self):
+        id_ped = self._pedido_selecionado_cozinha()
+        if not id_ped:
+            self.exibir_mensagem("Selecione um pedido na fila da cozinha.", True)
+            return
+        pedido = self.lanchonete.buscar_pedido(id_ped)
+        success, message = self.lanchonete.definir_prioridade_pedido(id_ped, not pedido.prioritario)
+        self.exibir_mensagem(message, not success)
+        if success:
+            self.atualizar_fila_cozinha()
+
+    # --- Promoções ---
+    def abrir_promocoes(self):
+        """Editor das regras de promoção (lista JSON), validadas e compiladas ao salvar."""
+        if getattr(self, "janela_promocoes", None) and self.janela_promocoes.winfo_exists():
+            self.janela_promocoes.lift()
+            return
+
+        self.janela_promocoes = tk.Toplevel(self.master)
+        self.janela_promocoes.title("Promoções")
+        self.janela_promocoes.geometry("760x560")
+        self.janela_promocoes.configure(background=self.BACKGROUND_COLOR)
+
+        ajuda = ("Uma regra por objeto. Tipos:\n"
+                 '  {"nome": "Happy hour", "tipo": "desconto", "produtos": ["P001"], "percentual": 20, "dias": [0, 1, 2, 3, 4], "horas": [17, 19]}\n'
+                 '  {"nome": "3 ou mais", "tipo": "quantidade", "produto": "P002", "minimo": 3, "preco_centavos": 450}\n'
+                 '  {"nome": "Combo lanche", "tipo": "combo", "itens": {"P001": 1, "P003": 1}, "preco_centavos": 2500}\n'
+                 "Dias: 0 = segunda ... 6 = domingo. Horas: [início, fim). Vale o menor preço entre horário e quantidade.")
+        ttk.Label(self.janela_promocoes, text=ajuda, justify="left", font=('Consolas', 9)).pack(fill="x", padx=10, pady=(10, 5))
+        self.promocoes_text = tk.Text(self.janela_promocoes, wrap="none", font=('Consolas', 10))
+        self.promocoes_text.pack(fill="both", expand=True, padx=10, pady=5)
+        self.promocoes_text.insert("1.0", json.dumps(self.lanchonete.promocoes.regras, indent=2, ensure_ascii=False))
+
+        button_frame = ttk.Frame(self.janela_promocoes)
+        button_frame.pack(fill="x", padx=10, pady=10)
+        ttk.Button(button_frame, text="💾 Salvar Promoções", command=self.salvar_promocoes_gui, style='TButton').pack(side="right", padx=5)
+
+    def salvar_promocoes_gui(self):
+        try:
+            regras = json.loads(self.promocoes_text.get("1.0", tk.END).strip() or "[]")
+        except json.JSONDecodeError as e:
+            messagebox.showerror("Promoções", f"JSON inválido: {e}", parent=self.janela_promocoes)
+            return
+        if not isinstance(regras, list):
+            messagebox.showerror("Promoções", "As promoções devem ser uma lista de regras.", parent=self.janela_promocoes)
+            return
+        success, message = self.lanchonete.definir_promocoes(regras)
+        if not success:
+            messagebox.showerror("Promoções", message, parent=self.janela_promocoes)
+            return
+        self.exibir_mensagem(message)
+        # O carrinho aberto passa a valer com as novas regras
+        self._conta_carrinho(self.carrinho_ativo).atualizar_momento()
+        self._atualizar_linhas_carrinho(self.carrinho_pdv)
+        self.janela_promocoes.destroy()
+
+    # --- Diagnóstico de Desempenho ---
+    def abrir_diagnostico(self):
+        if getattr(self, "janela_diagnostico", None) and self.janela_diagnostico.winfo_exists():
+            self.janela_diagnostico.lift()
+            self.atualizar_diagnostico()
+            return
+
+        self.janela_diagnostico = tk.Toplevel(self.master)
+        self.janela_diagnostico.title("Diagnóstico de Desempenho")
+        self.janela_diagnostico.geometry("900x520")
+        self.janela_diagnostico.configure(background=self.BACKGROUND_COLOR)
+
+        frame = ttk.LabelFrame(self.janela_diagnostico, text="Latência por Operação (últimas amostras)", padding="10")
+        frame.pack(fill="both", expand=True, padx=10, pady=10)
+        colunas = ("Operação", "Chamadas", "Total (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Máx (ms)")
+        self.tree_diagnostico = ttk.Treeview(frame, columns=colunas, show="headings", style="Treeview")
+        for coluna in colunas:
+            self.tree_diagnostico.heading(coluna, text=coluna)
+            self.tree_diagnostico.column(coluna, width=90, anchor="e")
+        self.tree_diagnostico.column("Operação", width=300, anchor="w")
+        self.tree_diagnostico.pack(side="left", fill="both", expand=True)
+        scrollbar_y = ttk.Scrollbar(frame, orient="vertical", command=self.tree_diagnostico.yview)
+        scrollbar_y.pack(side="right", fill="y")
+        self.tree_diagnostico.config(yscrollcommand=scrollbar_y.set)
+        self.tree_diagnostico.bind("<<TreeviewSelect>>", self.exibir_histograma_diagnostico)
+
+        self.histograma_label = ttk.Label(self.janela_diagnostico, text="Selecione uma operação para ver o histograma.", anchor="w", justify="left")
+        self.histograma_label.pack(fill="x", padx=10)
+
+        button_frame = ttk.Frame(self.janela_diagnostico)
+        button_frame.pack(fill="x", padx=10, pady=10)
+        ttk.Button(button_frame, text="🔄 Atualizar", command=self.atualizar_diagnostico, style='TButton').pack(side="left", padx=5)
+        ttk.Button(button_frame, text="🧹 Zerar", command=lambda: METRICAS.limpar() or self.atualizar_diagnostico(), style='TButton').pack(side="left", padx=5)
+        self.metricas_ativas_var = tk.BooleanVar(value=METRICAS.ativo)
+        ttk.Checkbutton(button_frame, text="Coletar métricas", variable=self.metricas_ativas_var,
+                        command=lambda: setattr(METRICAS, "ativo", self.metricas_ativas_var.get())).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="💾 Salvar", command=self.salvar_diagnostico, style='TButton').pack(side="right", padx=5)
+
+        self.atualizar_diagnostico()
+
+    def atualizar_diagnostico(self):
+        for item in self.tree_diagnostico.get_children():
+            self.tree_diagnostico.delete(item)
+        for r in METRICAS.resumo():
+            self.tree_diagnostico.insert("", "end", values=(
+                r["operacao"], r["chamadas"], f"{r['total_ms']:.1f}",
+                f"{r['p50_ms']:.2f}", f"{r['p95_ms']:.2f}", f"{r['p99_ms']:.2f}", f"{r['max_ms']:.2f}"
+            ))
+
+    def exibir_histograma_diagnostico(self, event):
+        selected_item = self.tree_diagnostico.selection()
+        if not selected_item:
+            return
+        operacao = self.tree_diagnostico.item(selected_item, "values")[0]
+        faixas = [f"{rotulo}: {quantidade}" for rotulo, quantidade in METRICAS.histograma(operacao) if quantidade]
+        self.histograma_label.config(text=f"{operacao} — " + " | ".join(faixas))
+
+    def salvar_diagnostico(self):
+        try:
+            METRICAS.gravar(self.ARQUIVO_METRICAS)
+            self.exibir_mensagem(f"Métricas gravadas em '{self.ARQUIVO_METRICAS}'.")
+        except OSError as e:
+            self.exibir_mensagem(f"Erro ao gravar métricas: {e}", True)
+
     # --- Interface de Relatórios ---
     def criar_interface_relatorios(self, parent_frame):
         # Frame para Total de Vendas
@@ -1278,6 +5511,7 @@ class LanchoneteApp:
         self.top_n_products_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
 
         ttk.Button(top_products_frame, text="📊 Gerar Relatório de Produtos", command=self.gerar_relatorio_top_produtos_gui, style='TButton').grid(row=0, column=2, padx=5, pady=5)
+        ttk.Button(top_products_frame, text="📦 Sugestão de Reposição", command=self.gerar_relatorio_reposicao_gui, style='TButton').grid(row=0, column=3, padx=5, pady=5)
 
         # Frame para Pedidos por Cliente
         pedidos_cliente_frame = ttk.LabelFrame(parent_frame, text="Pedidos por Cliente", padding="15")
@@ -1285,11 +5519,36 @@ class LanchoneteApp:
         pedidos_cliente_frame.columnconfigure(1, weight=1)
 
         ttk.Label(pedidos_cliente_frame, text="Cliente:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
-        self.rel_pedidos_cliente_id_combo = ttk.Combobox(pedidos_cliente_frame, state="readonly")
+        self.rel_pedidos_cliente_id_combo = ComboboxClientes(pedidos_cliente_frame, self.lanchonete)
         self.rel_pedidos_cliente_id_combo.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
         self.rel_pedidos_cliente_id_combo.bind("<<ComboboxSelected>>", self.on_cliente_selecionado_relatorio)
 
         ttk.Button(pedidos_cliente_frame, text="📜 Gerar Relatório de Cliente", command=self.gerar_relatorio_pedidos_cliente_gui, style='TButton').grid(row=0, column=2, padx=5, pady=5)
+        ttk.Button(pedidos_cliente_frame, text="⏱️ Diagnóstico (F12)", command=self.abrir_diagnostico, style='TButton').grid(row=0, column=3, padx=5, pady=5)
+        ttk.Button(pedidos_cliente_frame, text="🩺 Verificar Consistência", command=lambda: self.iniciar_verificacao_consistencia(exibir=True), style='TButton').grid(row=0, column=4, padx=5, pady=5)
+
+        # Frame para Tempo em cada Status
+        tempos_frame = ttk.LabelFrame(parent_frame, text="Tempo em cada Status", padding="15")
+        tempos_frame.pack(fill="x", padx=10, pady=10)
+
+        ttk.Label(tempos_frame, text="Agrupar por:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.tempos_agrupamento_combo = ttk.Combobox(tempos_frame, values=["Hora do dia", "Mix de estações"], state="readonly", width=18)
+        self.tempos_agrupamento_combo.set("Hora do dia")
+        self.tempos_agrupamento_combo.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+        ttk.Button(tempos_frame, text="⏲️ Gerar Relatório de Tempos", command=self.gerar_relatorio_tempos_gui, style='TButton').grid(row=0, column=2, padx=5, pady=5)
+
+        # Frame para Compactação do Histórico
+        historico_frame = ttk.LabelFrame(parent_frame, text="Compactação do Histórico", padding="15")
+        historico_frame.pack(fill="x", padx=10, pady=10)
+
+        ttk.Label(historico_frame, text="Manter pedidos dos últimos (dias):").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.dias_retencao_entry = ttk.Entry(historico_frame, width=6)
+        self.dias_retencao_entry.insert(0, "365")
+        self.dias_retencao_entry.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+        self.arquivar_historico_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(historico_frame, text="Arquivar pedidos compactados (.jsonl.gz)", variable=self.arquivar_historico_var).grid(row=0, column=2, padx=5, pady=5, sticky="w")
+        ttk.Button(historico_frame, text="🗜️ Compactar Histórico", command=self.compactar_historico_gui, style='TButton').grid(row=0, column=3, padx=5, pady=5)
+        ttk.Button(historico_frame, text="📦 Arquivar Pedidos", command=self.arquivar_pedidos_gui, style='TButton').grid(row=0, column=4, padx=5, pady=5)
 
 
         self.relatorio_display = tk.Text(parent_frame, wrap="word", height=15, width=80, font=('Arial', 10), relief="flat", padx=10, pady=10)
@@ -1301,15 +5560,12 @@ class LanchoneteApp:
         self.relatorio_display.config(yscrollcommand=rel_scrollbar.set)
 
     def atualizar_comboboxes_relatorio(self):
-        clientes_ids = sorted(list(self.lanchonete.clientes.keys()))
-        self.rel_pedidos_cliente_id_combo['values'] = clientes_ids
-        if clientes_ids:
-            self.rel_pedidos_cliente_id_combo.set(clientes_ids[0])
-        else:
-            self.rel_pedidos_cliente_id_combo.set("")
+        if not self._aba_montada(self.frame_relatorios):
+            return
+        self.rel_pedidos_cliente_id_combo.revalidar()
 
     def on_cliente_selecionado_relatorio(self, event):
-        selected_client_id = self.rel_pedidos_cliente_id_combo.get()
+        selected_client_id = self.rel_pedidos_cliente_id_combo.id_cliente()
 
     def limpar_relatorio_display(self):
         self.relatorio_display.config(state="normal")
@@ -1360,7 +5616,44 @@ class LanchoneteApp:
         elif data_fim:
             periodo_str = f" até {data_fim.strftime('%d/%m/%Y')}"
 
-        self.escrever_no_relatorio_display(f"Total de Vendas Entregues{periodo_str}: R${total_vendas:.2f}")
+        self.escrever_no_relatorio_display(f"Total de Vendas Entregues{periodo_str}: R${formatar_centavos(total_vendas)}")
+
+    def compactar_historico_gui(self):
+        try:
+            dias = int(self.dias_retencao_entry.get().strip())
+            if dias < 0:
+                raise ValueError
+        except ValueError:
+            self.exibir_mensagem("Retenção inválida. Use um número inteiro de dias (0 ou mais).", True)
+            return
+        if not messagebox.askyesno("Compactar Histórico", f"Pedidos entregues ou cancelados com mais de {dias} dias "
+                                   "deixarão de aparecer individualmente e serão mantidos apenas como totais diários. Continuar?"):
+            return
+        arquivo = self.lanchonete.caminho_arquivo_historico() if self.arquivar_historico_var.get() else None
+        success, message = self.lanchonete.compactar_historico(dias, arquivo)
+        self.exibir_mensagem(message, not success)
+        if success:
+            self.limpar_relatorio_display()
+            self.escrever_no_relatorio_display(message)
+            self.atualizar_lista_pedidos()
+
+    def arquivar_pedidos_gui(self):
+        try:
+            dias = int(self.dias_retencao_entry.get().strip())
+            if dias < 0:
+                raise ValueError
+        except ValueError:
+            self.exibir_mensagem("Retenção inválida. Use um número inteiro de dias (0 ou mais).", True)
+            return
+        if not messagebox.askyesno("Arquivar Pedidos", f"Pedidos entregues ou cancelados com mais de {dias} dias "
+                                   "sairão da lista de pedidos e irão para arquivos compactados, consultados só pelos relatórios. Continuar?"):
+            return
+        success, message = self.lanchonete.arquivar_pedidos(dias)
+        self.exibir_mensagem(message, not success)
+        if success:
+            self.limpar_relatorio_display()
+            self.escrever_no_relatorio_display(message)
+            self.atualizar_lista_pedidos()
 
     def gerar_relatorio_top_produtos_gui(self):
         self.limpar_relatorio_display()
@@ -1386,11 +5679,50 @@ class LanchoneteApp:
             for i, (nome_produto, quantidade) in enumerate(produtos_vendidos):
                 self.escrever_no_relatorio_display(f"{i+1}. {nome_produto}: {quantidade} unidades vendidas")
     
+    def gerar_relatorio_tempos_gui(self):
+        self.limpar_relatorio_display()
+        self.escrever_no_relatorio_display("--- Tempo em cada Status ---")
+
+        agrupamento = "mix" if self.tempos_agrupamento_combo.get() == "Mix de estações" else "hora"
+        linhas = self.lanchonete.relatorio_tempos_por_status(agrupamento)
+        if not linhas:
+            self.escrever_no_relatorio_display("Nenhuma mudança de status registrada ainda.")
+            return
+
+        def minutos(segundos):
+            return f"{segundos / 60:.1f} min"
+
+        status_atual = None
+        for linha in linhas:
+            if linha["status"] != status_atual:
+                status_atual = linha["status"]
+                self.escrever_no_relatorio_display(f"\n{status_atual}:")
+            self.escrever_no_relatorio_display(
+                f"  {linha['grupo']}: {linha['pedidos']} pedido(s) | média {minutos(linha['media_s'])} | "
+                f"mediana {minutos(linha['p50_s'])} | p90 {minutos(linha['p90_s'])}")
+
+    def gerar_relatorio_reposicao_gui(self):
+        self.limpar_relatorio_display()
+        self.escrever_no_relatorio_display("--- Sugestão de Reposição (próximos 7 dias) ---")
+
+        success, message, sugestoes = self.lanchonete.relatorio_sugestao_reposicao()
+        if not success:
+            self.exibir_mensagem(message, True)
+            self.escrever_no_relatorio_display(message)
+            return
+        self.escrever_no_relatorio_display(message)
+        if not sugestoes:
+            self.escrever_no_relatorio_display("O estoque disponível cobre a demanda prevista de todos os produtos.")
+        for s in sugestoes:
+            self.escrever_no_relatorio_display(
+                f"{s['nome']} (ID: {s['id_produto']}): repor {s['sugestao']} un. "
+                f"(disponível {s['disponivel']}, previsão {s['previsao']:.1f})")
+
     def gerar_relatorio_pedidos_cliente_gui(self):
         self.limpar_relatorio_display()
         self.escrever_no_relatorio_display("--- Relatório de Pedidos por Cliente ---")
 
-        id_cli = self.rel_pedidos_cliente_id_combo.get().strip() 
+        id_cli = self.rel_pedidos_cliente_id_combo.id_cliente() 
         if not id_cli:
             self.exibir_mensagem("Selecione um Cliente para este relatório.", True)
             return
@@ -1412,11 +5744,79 @@ class LanchoneteApp:
                 itens_str = ", ".join([f"{item.produto.nome} (x{item.quantidade})" for item in pedido.itens])
                 self.escrever_no_relatorio_display(f"  Pedido ID: {pedido.id_pedido}")
                 self.escrever_no_relatorio_display(f"  Status: {pedido.status}")
-                self.escrever_no_relatorio_display(f"  Valor Total: R${pedido.valor_total:.2f}")
+                self.escrever_no_relatorio_display(f"  Valor Total: R${formatar_centavos(pedido.valor_total_centavos)}")
                 self.escrever_no_relatorio_display(f"  Data/Hora: {pedido.data_hora_criacao.strftime('%d/%m/%Y %H:%M')}")
                 self.escrever_no_relatorio_display(f"  Itens: {itens_str}")
                 self.escrever_no_relatorio_display("-" * 30)
 
+    # --- Painel de Vendas ---
+    def criar_interface_painel(self, parent_frame):
+        self._versao_painel_exibida = None
+        self._minuto_painel_exibido = None
+
+        indicadores_frame = ttk.Frame(parent_frame)
+        indicadores_frame.pack(fill="x", padx=10, pady=10)
+        self.indicadores_painel = {}
+        indicadores = (("pedidos_recentes", f"Pedidos nos últimos {PainelVendas.MINUTOS_RECENTES} min"),
+                       ("receita_hoje", "Receita hoje (entregues)"),
+                       ("itens_ultima_hora", "Itens entregues na última hora"),
+                       ("ticket_medio", "Ticket médio hoje"))
+        for coluna, (chave, titulo) in enumerate(indicadores):
+            frame = ttk.LabelFrame(indicadores_frame, text=titulo, padding="15")
+            frame.grid(row=0, column=coluna, padx=5, sticky="nsew")
+            indicadores_frame.columnconfigure(coluna, weight=1)
+            valor = ttk.Label(frame, text="-", font=('Arial', 22, 'bold'), anchor="center")
+            valor.pack(fill="x")
+            self.indicadores_painel[chave] = valor
+
+        self.painel_detalhe_label = ttk.Label(parent_frame, text="", anchor="center")
+        self.painel_detalhe_label.pack(fill="x", padx=10, pady=5)
+
+        grafico_frame = ttk.LabelFrame(parent_frame, text=f"Pedidos por minuto (últimos {PainelVendas.MINUTOS_RECENTES} min)", padding="10")
+        grafico_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.painel_canvas = tk.Canvas(grafico_frame, height=180, background="white", highlightthickness=0)
+        self.painel_canvas.pack(fill="both", expand=True)
+        self.painel_canvas.bind("<Configure>", lambda event: self.atualizar_painel(forcar=True))
+
+    def atualizar_painel(self, forcar: bool = False):
+        if not self._aba_montada(self.frame_painel):
+            return
+        painel = self.lanchonete.painel
+        agora = datetime.now()
+        minuto = int(agora.timestamp() // 60)
+        # Só redesenha se algo foi registrado ou se a janela andou um minuto
+        if not forcar and painel.versao == self._versao_painel_exibida and minuto == self._minuto_painel_exibido:
+            return
+        self._versao_painel_exibida = painel.versao
+        self._minuto_painel_exibido = minuto
+
+        resumo = painel.resumo(agora)
+        self.indicadores_painel["pedidos_recentes"].config(text=str(resumo["pedidos_recentes"]))
+        self.indicadores_painel["receita_hoje"].config(text=f"R${formatar_centavos(resumo['receita_hoje_centavos'])}")
+        self.indicadores_painel["itens_ultima_hora"].config(text=str(resumo["itens_ultima_hora"]))
+        self.indicadores_painel["ticket_medio"].config(text=f"R${formatar_centavos(resumo['ticket_medio_centavos'])}")
+        self.painel_detalhe_label.config(
+            text=f"Hoje: {resumo['pedidos_hoje']} pedido(s) criados, {resumo['entregues_hoje']} entregue(s) | "
+                 f"Última hora: R${formatar_centavos(resumo['receita_ultima_hora_centavos'])} | "
+                 f"Atualizado às {agora.strftime('%H:%M')}")
+
+        canvas = self.painel_canvas
+        canvas.delete("all")
+        largura, altura = canvas.winfo_width(), canvas.winfo_height()
+        serie = resumo["pedidos_por_minuto"]
+        maximo = max(max(serie), 1)
+        passo = largura / len(serie)
+        for i, quantidade in enumerate(serie):
+            topo = altura - 20 - (altura - 40) * quantidade / maximo
+            canvas.create_rectangle(i * passo + 4, topo, (i + 1) * passo - 4, altura - 20, fill=self.PRIMARY_COLOR, outline="")
+            canvas.create_text((i + 0.5) * passo, topo - 8, text=str(quantidade))
+            canvas.create_text((i + 0.5) * passo, altura - 8, text=f"-{len(serie) - 1 - i}" if i < len(serie) - 1 else "agora")
+
+    def ciclo_atualizacao_painel(self):
+        if "Painel" in self.notebook.tab(self.notebook.select(), "text"):
+            self.atualizar_painel()
+        self.master.after(self.INTERVALO_PAINEL_MS, self.ciclo_atualizacao_painel)
+
     # --- Nova Interface de Vendas (PDV) ---
     def criar_interface_vendas(self, parent_frame):
         # Usando Frame principal com dois subframes
@@ -1468,10 +5868,16 @@ class LanchoneteApp:
         client_frame.columnconfigure(1, weight=1)
 
         ttk.Label(client_frame, text="Cliente:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
-        self.vendas_cliente_id_combo = ttk.Combobox(client_frame, state="readonly")
+        self.vendas_cliente_id_combo = ComboboxClientes(client_frame, self.lanchonete)
         self.vendas_cliente_id_combo.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
         self.vendas_cliente_id_combo.bind("<<ComboboxSelected>>", self.on_cliente_selecionado_pdv)
 
+        ttk.Label(client_frame, text="Carrinho:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.carrinhos_combo = ttk.Combobox(client_frame, state="readonly")
+        self.carrinhos_combo.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+        self.carrinhos_combo.bind("<<ComboboxSelected>>", self.on_carrinho_selecionado_pdv)
+        ttk.Button(client_frame, text="⏸️ Novo Carrinho", command=self.novo_carrinho_pdv_gui, style='TButton').grid(row=1, column=2, padx=5, pady=5)
+
         ttk.Label(right_frame, text="Carrinho de Compras", style='Header.TLabel').pack(anchor="center", pady=10)
 
         self.tree_carrinho_pdv = ttk.Treeview(right_frame, columns=("ID", "Produto", "Qtd", "Preço Unit.", "Subtotal"), show="headings", style="Treeview")
@@ -1501,37 +5907,181 @@ class LanchoneteApp:
         ttk.Button(button_actions_frame, text="✅ Finalizar Venda", command=self.finalizar_venda_pdv, style='TButton').pack(side="right", padx=5)
 
     def atualizar_comboboxes_vendas(self):
-        clientes_ids = sorted(list(self.lanchonete.clientes.keys()))
-        self.vendas_cliente_id_combo['values'] = clientes_ids
-        if clientes_ids:
-            self.vendas_cliente_id_combo.set(clientes_ids[0])
-        else:
-            self.vendas_cliente_id_combo.set("")
+        self.vendas_cliente_id_combo.revalidar()
 
+    @instrumentado
     def atualizar_lista_produtos_pdv(self):
         for item in self.tree_produtos_pdv.get_children():
             self.tree_produtos_pdv.delete(item)
         
         for produto in self.lanchonete.cardapio.values():
-            if produto.disponivel and produto.estoque > 0:
-                self.tree_produtos_pdv.insert("", "end", values=(produto.id_produto, produto.nome, f"{produto.preco:.2f}", produto.estoque))
+            disponivel = self.lanchonete.reservas.disponivel(produto.id_produto)
+            if produto.disponivel and disponivel > 0:
+                self.tree_produtos_pdv.insert("", "end", values=(produto.id_produto, produto.nome, formatar_centavos(produto.preco_centavos), disponivel))
 
+    @instrumentado
     def atualizar_carrinho_pdv_gui(self):
+        """Redesenha só as linhas do carrinho ativo; as dos estacionados ficam destacadas (detach) na mesma árvore."""
         for item in self.tree_carrinho_pdv.get_children():
             self.tree_carrinho_pdv.delete(item)
-        
-        total_geral = 0.0
-        for id_prod, item_data in self.carrinho_pdv.items():
-            produto = item_data["produto"]
-            quantidade = item_data["quantidade"]
-            subtotal = produto.preco * quantidade
-            total_geral += subtotal
-            self.tree_carrinho_pdv.insert("", "end", values=(id_prod, produto.nome, quantidade, f"{produto.preco:.2f}", f"{subtotal:.2f}"))
-        
-        self.total_carrinho_label.config(text=f"TOTAL: R$ {total_geral:.2f}")
+        self._combos_exibidos.pop(self.carrinho_ativo.titular, None)
+        self._atualizar_linhas_carrinho(self.carrinho_pdv)
+        self._atualizar_seletor_carrinhos()
+
+    def _conta_carrinho(self, carrinho: CarrinhoPDV) -> ContaCarrinho:
+        """Conta com as promoções do carrinho, criada na primeira vez que ele é exibido."""
+        if carrinho.conta is None or carrinho.conta.motor is not self.lanchonete.promocoes:
+            carrinho.conta = ContaCarrinho(self.lanchonete.promocoes)
+            for item_data in carrinho.itens.values():
+                carrinho.conta.definir(item_data["produto"], item_data["quantidade"])
+        return carrinho.conta
+
+    def _alterar_linha_carrinho(self, produto: Produto):
+        """Leva a quantidade atual do produto no carrinho ativo para a conta e redesenha só o que mudou de preço."""
+        item_data = self.carrinho_pdv.get(produto.id_produto)
+        alterados = self._conta_carrinho(self.carrinho_ativo).definir(produto, item_data["quantidade"] if item_data else 0)
+        self._atualizar_linhas_carrinho(alterados | {produto.id_produto})
+
+    def _atualizar_linhas_carrinho(self, ids_produtos):
+        for id_prod in ids_produtos:
+            self._atualizar_linha_carrinho(id_prod)
+        self._sincronizar_combos_carrinho()
+        self._atualizar_total_carrinho()
+
+    def _sincronizar_combos_carrinho(self):
+        """Uma linha por combo montado, sempre no fim do carrinho."""
+        carrinho = self.carrinho_ativo
+        exibidos = self._combos_exibidos.setdefault(carrinho.titular, set())
+        atuais = {}
+        for nome, vezes, desconto in self._conta_carrinho(carrinho).descontos():
+            atuais[f"{carrinho.titular}:combo:{nome}"] = ("", f"🎁 {nome}", vezes, "", f"-{formatar_centavos(desconto)}")
+        for iid in exibidos - atuais.keys():
+            if self.tree_carrinho_pdv.exists(iid):
+                self.tree_carrinho_pdv.delete(iid)
+        for iid, valores in atuais.items():
+            if self.tree_carrinho_pdv.exists(iid):
+                self.tree_carrinho_pdv.item(iid, values=valores)
+                self.tree_carrinho_pdv.move(iid, "", "end")
+            else:
+                self.tree_carrinho_pdv.insert("", "end", iid=iid, values=valores)
+        self._combos_exibidos[carrinho.titular] = set(atuais)
+
+    def _iid_carrinho(self, carrinho: CarrinhoPDV, id_prod: str) -> str:
+        return f"{carrinho.titular}:{id_prod}"
+
+    def _atualizar_linha_carrinho(self, id_prod: str):
+        """Insere, altera ou apaga a linha de um produto do carrinho ativo."""
+        iid = self._iid_carrinho(self.carrinho_ativo, id_prod)
+        item_data = self.carrinho_pdv.get(id_prod)
+        if item_data is None:
+            if self.tree_carrinho_pdv.exists(iid):
+                self.tree_carrinho_pdv.delete(iid)
+            return
+        produto = item_data["produto"]
+        quantidade = item_data["quantidade"]
+        subtotal = self._conta_carrinho(self.carrinho_ativo).linhas[id_prod][2] # Já com desconto de horário e de quantidade
+        valores = (id_prod, produto.nome, quantidade, formatar_centavos(produto.preco_centavos), formatar_centavos(subtotal))
+        if self.tree_carrinho_pdv.exists(iid):
+            self.tree_carrinho_pdv.item(iid, values=valores)
+        else:
+            self.tree_carrinho_pdv.insert("", "end", iid=iid, values=valores)
+
+    def _atualizar_total_carrinho(self):
+        total = self._conta_carrinho(self.carrinho_ativo).total_centavos
+        economia = self.carrinho_ativo.total_centavos() - total
+        texto = f"TOTAL: R$ {formatar_centavos(total)}"
+        if economia > 0:
+            texto += f"  (economia de R$ {formatar_centavos(economia)})"
+        self.total_carrinho_label.config(text=texto)
+
+    def _rotulo_carrinho(self, carrinho: CarrinhoPDV) -> str:
+        cliente = self.lanchonete.clientes.get(carrinho.id_cliente) if carrinho.id_cliente else None
+        rotulo = f"{carrinho.nome} · {cliente.nome}" if cliente else carrinho.nome
+        return f"{rotulo} ({sum(item['quantidade'] for item in carrinho.itens.values())} itens)"
+
+    def _atualizar_seletor_carrinhos(self):
+        self.carrinhos_combo['values'] = [self._rotulo_carrinho(c) for c in self.carrinhos.values()]
+        self.carrinhos_combo.current(list(self.carrinhos).index(self.carrinho_ativo.nome))
+
+    def _novo_carrinho(self, id_cliente: str = None) -> CarrinhoPDV:
+        numero = 1
+        while f"Carrinho {numero}" in self.carrinhos:
+            numero += 1
+        carrinho = self.carrinhos[f"Carrinho {numero}"] = CarrinhoPDV(f"Carrinho {numero}", id_cliente)
+        return carrinho
+
+    @instrumentado
+    def trocar_carrinho_pdv(self, carrinho: CarrinhoPDV):
+        """Estaciona o carrinho ativo e mostra 'carrinho', movendo linhas já existentes em vez de recriá-las."""
+        if carrinho is not self.carrinho_ativo:
+            linhas = self.tree_carrinho_pdv.get_children()
+            if linhas:
+                self.tree_carrinho_pdv.detach(*linhas)
+            if self.carrinho_ativo.vazio():
+                del self.carrinhos[self.carrinho_ativo.nome] # Carrinho vazio não precisa ficar estacionado
+            self.carrinho_ativo = carrinho
+            for id_prod in carrinho.itens:
+                iid = self._iid_carrinho(carrinho, id_prod)
+                if self.tree_carrinho_pdv.exists(iid):
+                    self.tree_carrinho_pdv.move(iid, "", "end")
+                else:
+                    self._atualizar_linha_carrinho(id_prod)
+            self.lanchonete.reservas.renovar(carrinho.titular)
+        # Enquanto estacionado, a hora ou as promoções podem ter mudado
+        self._conta_carrinho(carrinho).atualizar_momento()
+        self._atualizar_linhas_carrinho(carrinho.itens)
+        self.vendas_cliente_id_combo.selecionar(carrinho.id_cliente)
+        self._atualizar_seletor_carrinhos()
+        self.salvar_carrinhos()
+
+    def on_carrinho_selecionado_pdv(self, event):
+        self.trocar_carrinho_pdv(list(self.carrinhos.values())[self.carrinhos_combo.current()])
+
+    def novo_carrinho_pdv_gui(self):
+        if self.carrinho_ativo.vazio():
+            self.exibir_mensagem("O carrinho atual ainda está vazio; use-o para o próximo cliente.", True)
+            return
+        estacionado = self.carrinho_ativo.nome
+        self.trocar_carrinho_pdv(self._novo_carrinho())
+        self.exibir_mensagem(f"{estacionado} estacionado. Atendendo em {self.carrinho_ativo.nome}.")
+
+    def _encerrar_carrinho_ativo(self):
+        """Tira o carrinho ativo do terminal (venda finalizada) e passa para um carrinho vazio."""
+        for item in self.tree_carrinho_pdv.get_children():
+            self.tree_carrinho_pdv.delete(item)
+        self._combos_exibidos.pop(self.carrinho_ativo.titular, None)
+        del self.carrinhos[self.carrinho_ativo.nome]
+        self.carrinho_ativo = self._novo_carrinho()
+        self.trocar_carrinho_pdv(self.carrinho_ativo)
+
+    def salvar_carrinhos(self):
+        try:
+            CarrinhoPDV.gravar_arquivo(self.arquivo_carrinhos, list(self.carrinhos.values()), self.carrinho_ativo.nome)
+        except OSError as e:
+            print(f"Aviso: não foi possível gravar os carrinhos em '{self.arquivo_carrinhos}': {e}")
+
+    def restaurar_carrinhos(self):
+        """Recupera os carrinhos estacionados da última sessão e refaz as reservas deles (o que couber)."""
+        try:
+            carrinhos, nome_ativo = CarrinhoPDV.ler_arquivo(self.arquivo_carrinhos, self.lanchonete.cardapio)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Aviso: carrinhos em '{self.arquivo_carrinhos}' ignorados: {e}")
+            return
+        if not carrinhos:
+            return
+        for carrinho in carrinhos:
+            for id_prod, item_data in carrinho.itens.items():
+                # Sem estoque agora, o item continua no carrinho; finalizar_venda_pdv confere de novo
+                self.lanchonete.reservas.reservar(carrinho.titular, id_prod, item_data["quantidade"], ttl=ReservaEstoque.TTL_CARRINHO)
+        self.carrinhos = {c.nome: c for c in carrinhos}
+        self.carrinho_ativo = self.carrinhos.get(nome_ativo) or carrinhos[-1]
+        self.atualizar_carrinho_pdv_gui()
+        self.vendas_cliente_id_combo.selecionar(self.carrinho_ativo.id_cliente)
 
     def on_cliente_selecionado_pdv(self, event):
-        pass
+        self.carrinho_ativo.id_cliente = self.vendas_cliente_id_combo.id_cliente()
+        self._atualizar_seletor_carrinhos()
+        self.salvar_carrinhos()
 
     def adicionar_item_ao_carrinho_pdv(self):
         selected_item = self.tree_produtos_pdv.selection()
@@ -1558,8 +6108,10 @@ class LanchoneteApp:
         
         quantidade_no_carrinho = self.carrinho_pdv.get(id_prod, {}).get("quantidade", 0)
         
-        if (quantidade_no_carrinho + quantidade_a_adicionar) > produto.estoque:
-            self.exibir_mensagem(f"Estoque insuficiente para '{produto.nome}'. Disponível: {produto.estoque}, já no carrinho: {quantidade_no_carrinho}.", True)
+        # Reserva a quantidade no livro de estoque, para que outro terminal não venda as mesmas unidades
+        reservado, msg_reserva = self.lanchonete.reservas.reservar(self.titular_carrinho, id_prod, quantidade_a_adicionar, ttl=ReservaEstoque.TTL_CARRINHO)
+        if not reservado:
+            self.exibir_mensagem(f"{msg_reserva}, já no carrinho: {quantidade_no_carrinho}.", True)
             return
 
         if id_prod in self.carrinho_pdv:
@@ -1568,7 +6120,10 @@ class LanchoneteApp:
             self.carrinho_pdv[id_prod] = {"produto": produto, "quantidade": quantidade_a_adicionar}
         
         self.exibir_mensagem(f"{quantidade_a_adicionar}x {produto.nome} adicionado(s) ao carrinho.")
-        self.atualizar_carrinho_pdv_gui()
+        self._alterar_linha_carrinho(produto)
+        self._atualizar_seletor_carrinhos()
+        self.salvar_carrinhos()
+        self.atualizar_lista_produtos_pdv()
         self.pdv_quantidade_entry.delete(0, tk.END)
         self.pdv_quantidade_entry.insert(0, "1")
 
@@ -1583,9 +6138,13 @@ class LanchoneteApp:
         
         if id_prod in self.carrinho_pdv:
             if messagebox.askyesno("Confirmar Remoção", f"Tem certeza que deseja remover '{self.carrinho_pdv[id_prod]['produto'].nome}' do carrinho?"):
-                del self.carrinho_pdv[id_prod]
+                produto = self.carrinho_pdv.pop(id_prod)["produto"]
+                self.lanchonete.reservas.liberar(self.titular_carrinho, id_prod)
                 self.exibir_mensagem("Item removido do carrinho.")
-                self.atualizar_carrinho_pdv_gui()
+                self._alterar_linha_carrinho(produto)
+                self._atualizar_seletor_carrinhos()
+                self.salvar_carrinhos()
+                self.atualizar_lista_produtos_pdv()
         else:
             self.exibir_mensagem("Item não encontrado no carrinho.", True)
 
@@ -1595,12 +6154,16 @@ class LanchoneteApp:
             return
 
         if messagebox.askyesno("Limpar Carrinho", "Tem certeza que deseja limpar todo o carrinho?"):
-            self.carrinho_pdv = {}
+            self.carrinho_pdv.clear()
+            self.carrinho_ativo.conta = None
+            self.lanchonete.reservas.liberar(self.titular_carrinho)
             self.atualizar_carrinho_pdv_gui()
+            self.salvar_carrinhos()
+            self.atualizar_lista_produtos_pdv()
             self.exibir_mensagem("Carrinho limpo.")
 
     def finalizar_venda_pdv(self):
-        id_cli = self.vendas_cliente_id_combo.get().strip()
+        id_cli = self.vendas_cliente_id_combo.id_cliente()
         if not id_cli:
             self.exibir_mensagem("Por favor, selecione um Cliente para finalizar a venda.", True)
             return
@@ -1609,78 +6172,86 @@ class LanchoneteApp:
             self.exibir_mensagem("O carrinho está vazio. Adicione itens antes de finalizar a venda.", True)
             return
 
-        if not messagebox.askyesno("Confirmar Venda", f"Deseja finalizar a venda para o cliente {id_cli} com {len(self.carrinho_pdv)} item(s) no carrinho?"):
+        conta = self._conta_carrinho(self.carrinho_ativo)
+        if conta.atualizar_momento(): # Virou a hora (ou mudaram as promoções) desde a última alteração
+            self._atualizar_linhas_carrinho(self.carrinho_pdv)
+        if not messagebox.askyesno("Confirmar Venda", f"Deseja finalizar a venda para o cliente {id_cli} com {len(self.carrinho_pdv)} item(s) no carrinho "
+                                   f"(R$ {formatar_centavos(conta.total_centavos)})?"):
             return
 
-        # Verificar estoque final antes de criar o pedido
+        # Verificar se as reservas do carrinho ainda cobrem cada item (podem ter expirado)
         erros_estoque_prevenda = []
         for id_prod, item_data in self.carrinho_pdv.items():
             produto_obj = item_data["produto"]
             quantidade = item_data["quantidade"]
-            if produto_obj.estoque < quantidade:
-                erros_estoque_prevenda.append(f"Estoque insuficiente para '{produto_obj.nome}'. Disponível: {produto_obj.estoque}, solicitado: {quantidade}.")
+            faltante = quantidade - self.lanchonete.reservas.quantidade_reservada(self.titular_carrinho, id_prod)
+            if faltante > 0:
+                reservado, _ = self.lanchonete.reservas.reservar(self.titular_carrinho, id_prod, faltante)
+                if not reservado:
+                    disponivel = self.lanchonete.reservas.disponivel(id_prod) + quantidade - faltante
+                    erros_estoque_prevenda.append(f"Estoque insuficiente para '{produto_obj.nome}'. Disponível: {max(disponivel, 0)}, solicitado: {quantidade}.")
         
         if erros_estoque_prevenda:
             self.exibir_mensagem(f"Venda não pode ser finalizada devido a erros de estoque:\n" + "\n".join(erros_estoque_prevenda), True)
             return
 
-        success_pedido, msg_pedido, novo_pedido = self.lanchonete.criar_pedido(id_cli)
-        if not success_pedido:
-            self.exibir_mensagem(f"Erro ao criar pedido: {msg_pedido}", True)
+        # Cria o pedido, adiciona os itens e transfere as reservas numa única transação:
+        # qualquer falha desfaz tudo e o arquivo é gravado uma só vez
+        try:
+            with self.lanchonete.transacao():
+                success_pedido, msg_pedido, novo_pedido = self.lanchonete.criar_pedido(id_cli)
+                if not success_pedido:
+                    raise ErroTransacao(f"Erro ao criar pedido: {msg_pedido}")
+
+                for id_prod, item_data in self.carrinho_pdv.items():
+                    produto_obj = item_data["produto"]
+                    quantidade = item_data["quantidade"]
+                    # O estoque só é baixado quando o pedido for "Entregue"; até lá fica reservado
+                    success_add_item, msg_add_item = novo_pedido.adicionar_item(produto_obj, quantidade)
+                    if not success_add_item:
+                        raise ErroTransacao(f"Erro inesperado ao adicionar item '{produto_obj.nome}' ao pedido: {msg_add_item}. Venda cancelada.")
+
+                novo_pedido.aplicar_precos(conta.subtotais_finais())
+                # As reservas do carrinho passam a pertencer ao pedido até a entrega ou cancelamento
+                self.lanchonete.transferir_reservas(self.titular_carrinho, novo_pedido.id_pedido)
+                self.lanchonete.fila_cozinha.atualizar(novo_pedido)
+        except ErroTransacao as e:
+            self.exibir_mensagem(str(e), True)
             return
 
-        for id_prod, item_data in self.carrinho_pdv.items():
-            produto_obj = item_data["produto"]
-            quantidade = item_data["quantidade"]
-            
-            # Adicionar item ao pedido e deduzir estoque
-            success_add_item, msg_add_item = novo_pedido.adicionar_item(produto_obj, quantidade)
-            if not success_add_item:
-                # Isso não deveria ocorrer se a verificação inicial de estoque for bem-sucedida,
-                # mas é um fallback de segurança.
-                self.exibir_mensagem(f"Erro inesperado ao adicionar item '{produto_obj.nome}' ao pedido: {msg_add_item}. Venda cancelada.", True)
-                self.lanchonete.pedidos.pop(novo_pedido.id_pedido) # Remove o pedido criado
-                self.lanchonete.salvar_dados()
-                return
-            
-            # A dedução do estoque agora é feita dentro de lanchonete.adicionar_item_a_pedido,
-            # ou deve ser feita aqui se o pedido.adicionar_item não deduzir.
-            # No seu modelo atual, a dedução do estoque é feita dentro de Lanchonete.adicionar_item_a_pedido
-            # e também em Pedido.adicionar_item (onde o estoque é decrementado se for um novo item).
-            # Para evitar dupla dedução, o estoque do produto não deve ser decrementado aqui novamente.
-            # A lógica mais limpa seria: Pedido.adicionar_item faz a checagem e atualização do estoque,
-            # e Lanchonete.adicionar_item_a_pedido apenas chama Pedido.adicionar_item.
-            # No seu código atual, `Lanchonete.adicionar_item_a_pedido` faz a dedução,
-            # e `Pedido.adicionar_item` também. Vamos corrigir a lógica do modelo para evitar isso.
-
-            # Correção: Removi a dedução duplicada do estoque aqui.
-            # O estoque é deduzido quando o status do pedido se torna "Entregue" (seja via UI ou programa)
-            # ou quando o item é adicionado a um pedido (que é o que está acontecendo agora).
-            # Para o PDV, a dedução deve ocorrer no momento da finalização para garantir a consistência,
-            # e o estoque só é atualizado no banco de dados quando o pedido é entregue.
-            # Mudei a lógica novamente: A dedução de estoque deve ocorrer APENAS quando o pedido é "Entregue".
-            # O carrinho de PDV apenas "reserva" a quantidade.
-            # Vamos reverter a dedução de estoque em `Lanchonete.adicionar_item_a_pedido`
-            # e garantir que ela ocorra APENAS quando o status do pedido muda para "Entregue".
-
-            # VERIFIQUE A SEÇÃO ABAIXO (MUDANÇAS NO MODELO Lanchonete E Pedido)
-            # A dedução de estoque foi movida para o método `atualizar_status_pedido` do Lanchonete,
-            # especificamente quando o status muda para "Entregue".
-            # No fluxo do PDV, os itens são adicionados ao pedido (que está "Pendente"),
-            # mas o estoque real só é baixado quando o pedido é marcado como "Entregue".
-
-        self.lanchonete.salvar_dados()
-
+        self.imprimir_pedido(novo_pedido) # Só enfileira: a impressão não segura o caixa
         self.exibir_mensagem(f"Venda finalizada! Pedido {novo_pedido.id_pedido} criado para o cliente {id_cli}. Estoque será baixado ao 'Entregar' o pedido.", False)
-        self.limpar_carrinho_pdv_gui()
-        self.atualizar_lista_pedidos(self.filter_status_combo.get())
+        self._encerrar_carrinho_ativo()
+        self.atualizar_lista_pedidos()
         self.atualizar_lista_produtos()
         self.atualizar_lista_produtos_pdv()
 
 
 # --- Execução Principal do Programa ---
 if __name__ == "__main__":
-    root = tk.Tk()
-    root.state('zoomed')
-    app = LanchoneteApp(root)
-    root.mainloop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sistema de Gerenciamento de Lanchonetes")
+    parser.add_argument("--perfil", action="store_true",
+                        help="Grava um perfil cProfile da sessão em ./perfis (ou defina LANCHONETE_PERFIL=1).")
+    parser.add_argument("--perfil-memoria", action="store_true",
+                        help="Inclui snapshots de alocação com tracemalloc (ou defina LANCHONETE_PERFIL_MEMORIA=1).")
+    args = parser.parse_args()
+    perfil_memoria = args.perfil_memoria or os.environ.get("LANCHONETE_PERFIL_MEMORIA") == "1"
+    perfil_ativo = args.perfil or perfil_memoria or os.environ.get("LANCHONETE_PERFIL") == "1"
+
+    # Vários terminais podem compartilhar um arquivo de concessões de IDs (ex.: numa pasta de rede)
+    arquivo_concessoes = os.environ.get("LANCHONETE_CONCESSOES")
+    alocador_ids = AlocadorPorBlocos(ArquivoConcessoes(arquivo_concessoes)) if arquivo_concessoes else None
+
+    if perfil_ativo:
+        sessao_perfil = SessaoPerfil(memoria=perfil_memoria)
+        sessao_perfil.envolver(LanchoneteApp)
+        with sessao_perfil:
+            root = tk.Tk()
+            root.state('zoomed')
+            app = LanchoneteApp(root, alocador_ids)
+            root.mainloop()
+    else:
+        root = tk.Tk()
+        root.state('zoomed')
+        app = LanchoneteApp(root, alocador_ids)
+        root.mainloop()
\ No newline at end of file
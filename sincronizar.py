@@ -0,0 +1,65 @@
+"""Sincronização incremental entre instâncias da Lanchonete (ex.: terminais da loja e escritório central).
+
+Cada instância mantém um feed versionado das alterações. A origem exporta só o que mudou desde a
+última versão que o destino já aplicou, e o destino aplica o lote de forma idempotente.
+
+Exemplos:
+    # Direto entre dois arquivos de dados (o destino informa de onde continuar)
+    python sincronizar.py --origem loja.json --destino central.json
+
+    # Em duas etapas, levando o lote por arquivo
+    python sincronizar.py --origem loja.json --exportar lote.json.gz --desde 1520
+    python sincronizar.py --destino central.json --importar lote.json.gz
+
+Os arquivos de dados precisam existir. Sai com código 1 se o destino recusar o lote e com
+Lanchonete.ERRO_CARGA (3) se um arquivo não puder ser carregado.
+"""
+import argparse
+import os
+import sys
+
+from lanchonete import Lanchonete
+
+
+def sincronizar(origem: Lanchonete, destino: Lanchonete) -> tuple[bool, str]:
+    """Leva para 'destino' tudo o que mudou em 'origem' desde a última sincronização entre as duas."""
+    desde = destino.versoes_origem.get(origem.feed.id_origem, 0)
+    # O que o destino enviou para a origem não precisa voltar para ele
+    lote = origem.exportar_alteracoes(desde, excluir_origem=destino.feed.id_origem)
+    return destino.aplicar_alteracoes(lote)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincroniza alterações entre instâncias da Lanchonete.")
+    parser.add_argument("--origem", help="Arquivo de dados da instância que envia as alterações.")
+    parser.add_argument("--destino", help="Arquivo de dados da instância que recebe as alterações.")
+    parser.add_argument("--exportar", help="Grava o lote da origem neste arquivo (.json ou .json.gz).")
+    parser.add_argument("--desde", type=int, default=0, help="Versão do feed a partir da qual exportar.")
+    parser.add_argument("--importar", help="Aplica no destino um lote gravado com --exportar.")
+    args = parser.parse_args()
+
+    if args.exportar:
+        if not args.origem:
+            parser.error("--exportar exige --origem.")
+        lote = Lanchonete.abrir_sem_interface("Origem", args.origem).exportar_alteracoes(args.desde)
+        Lanchonete.gravar_lote(lote, args.exportar)
+        print(f"{len(lote['alteracoes'])} alteração(ões) (versões {lote['desde']} a {lote['ate']}) gravadas em "
+              f"'{args.exportar}' ({os.path.getsize(args.exportar)} bytes).")
+    elif args.importar:
+        if not args.destino:
+            parser.error("--importar exige --destino.")
+        destino = Lanchonete.abrir_sem_interface("Destino", args.destino)
+        success, message = destino.aplicar_alteracoes(Lanchonete.ler_lote(args.importar))
+        print(message, file=sys.stdout if success else sys.stderr)
+        sys.exit(0 if success else 1)
+    elif args.origem and args.destino:
+        success, message = sincronizar(Lanchonete.abrir_sem_interface("Origem", args.origem),
+                                       Lanchonete.abrir_sem_interface("Destino", args.destino))
+        print(message, file=sys.stdout if success else sys.stderr)
+        sys.exit(0 if success else 1)
+    else:
+        parser.error("Informe --origem e --destino, ou --origem com --exportar, ou --destino com --importar.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Teste de carga: N terminais de PDV simultâneos contra uma única Lanchonete.
+
+Cada terminal repete o fluxo de venda do PDV: reserva os itens no carrinho, finaliza a
+venda (pedido, itens e reservas numa transação) e avança o status até "Entregue", com
+tempo de reflexão aleatório entre as operações. As reservas do carrinho passam só pelas
+travas por produto do livro de reservas, como no PDV; as gravações na Lanchonete são
+serializadas pela trava da loja. A loja pode rodar no mesmo processo ou atrás de um
+servidor HTTP local que faz o papel do servidor da loja. No fim saem a vazão, os
+percentis de latência de cada operação, as exceções e a verificação de consistência.
+
+Exemplos:
+    python teste_carga.py --terminais 8 --duracao 30
+    python teste_carga.py --terminais 16 --duracao 60 --servidor --pedidos-base 100000
+    python teste_carga.py --terminais 16 --pensar-ms 0 --trava-global   # reservas também pela trava da loja
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmark import caminho_dados
+from lanchonete import ErroTransacao, Lanchonete, Metricas, ReservaEstoque
+
+FLUXO_STATUS = ("Em Preparo", "Pronto", "Entregue")
+
+
+class LojaLocal:
+    """Acesso direto à Lanchonete.
+
+    As operações que gravam na Lanchonete (transação e arquivo de dados) são serializadas
+    pela trava da loja, como num servidor de loja único. As reservas do carrinho vão direto
+    ao livro de reservas, que só trava o produto reservado; com trava_global=True elas
+    também passam pela trava da loja (para comparar).
+    """
+
+    def __init__(self, lanchonete: Lanchonete, trava_global: bool = False):
+        self.lanchonete = lanchonete
+        self.trava = threading.Lock()
+        self.trava_reservas = self.trava if trava_global else contextlib.nullcontext()
+
+    def reservar(self, titular: str, id_produto: str, quantidade: int) -> tuple[bool, str]:
+        with self.trava_reservas:
+            return self.lanchonete.reservas.reservar(titular, id_produto, quantidade, ttl=ReservaEstoque.TTL_CARRINHO)
+
+    def liberar(self, titular: str) -> tuple[bool, str]:
+        with self.trava_reservas:
+            self.lanchonete.reservas.liberar(titular)
+        return True, ""
+
+    def finalizar_venda(self, id_cliente: str, titular: str, itens: dict) -> tuple[bool, str]:
+        """Cria o pedido com os itens do carrinho e passa as reservas para ele (como finalizar_venda_pdv)."""
+        with self.trava:
+            try:
+                with self.lanchonete.transacao():
+                    success, message, pedido = self.lanchonete.criar_pedido(id_cliente)
+                    if not success:
+                        raise ErroTransacao(message)
+                    for id_produto, quantidade in itens.items():
+                        success, message = pedido.adicionar_item(self.lanchonete.cardapio[id_produto], quantidade)
+                        if not success:
+                            raise ErroTransacao(message)
+                    self.lanchonete.transferir_reservas(titular, pedido.id_pedido)
+                    self.lanchonete.fila_cozinha.atualizar(pedido)
+            except ErroTransacao as e:
+                return False, str(e)
+        return True, pedido.id_pedido
+
+    def atualizar_status(self, id_pedido: str, status: str) -> tuple[bool, str]:
+        with self.trava:
+            return self.lanchonete.atualizar_status_pedido(id_pedido, status)
+
+
+class ManipuladorLoja(BaseHTTPRequestHandler):
+    """Servidor substituto: expõe as operações de venda da LojaLocal em JSON."""
+    protocol_version = "HTTP/1.1"
+    loja: LojaLocal = None
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, codigo: int, corpo: dict):
+        dados = json.dumps(corpo).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        tamanho = int(self.headers.get("Content-Length", 0))
+        corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+        partes = [p for p in self.path.split("/") if p]
+        if len(partes) == 3 and partes[0] == "carrinhos" and partes[2] == "reservas":
+            success, resultado = self.loja.reservar(partes[1], corpo["id_produto"], corpo["quantidade"])
+        elif len(partes) == 2 and partes[0] == "carrinhos" and partes[1] and corpo.get("liberar"):
+            success, resultado = self.loja.liberar(partes[1])
+        elif partes == ["vendas"]:
+            success, resultado = self.loja.finalizar_venda(corpo["id_cliente"], corpo["titular"], corpo["itens"])
+        elif len(partes) == 3 and partes[0] == "pedidos" and partes[2] == "status":
+            success, resultado = self.loja.atualizar_status(partes[1], corpo["status"])
+        else:
+            self._responder(404, {"ok": False, "mensagem": "Rota desconhecida."})
+            return
+        self._responder(200, {"ok": success, "resultado": resultado})
+
+
+class LojaRemota:
+    """Cliente HTTP de um terminal (uma conexão persistente por terminal)."""
+
+    def __init__(self, host: str, porta: int):
+        self.conexao = http.client.HTTPConnection(host, porta, timeout=60)
+
+    def _post(self, caminho: str, corpo: dict) -> tuple[bool, str]:
+        try:
+            self.conexao.request("POST", caminho, json.dumps(corpo), {"Content-Type": "application/json"})
+            resposta = json.loads(self.conexao.getresponse().read())
+        except Exception:
+            self.conexao.close() # A próxima chamada abre uma conexão nova
+            raise
+        return resposta["ok"], resposta.get("resultado", resposta.get("mensagem", ""))
+
+    def reservar(self, titular: str, id_produto: str, quantidade: int) -> tuple[bool, str]:
+        return self._post(f"/carrinhos/{titular}/reservas", {"id_produto": id_produto, "quantidade": quantidade})
+
+    def liberar(self, titular: str) -> tuple[bool, str]:
+        return self._post(f"/carrinhos/{titular}", {"liberar": True})
+
+    def finalizar_venda(self, id_cliente: str, titular: str, itens: dict) -> tuple[bool, str]:
+        return self._post("/vendas", {"id_cliente": id_cliente, "titular": titular, "itens": itens})
+
+    def atualizar_status(self, id_pedido: str, status: str) -> tuple[bool, str]:
+        return self._post(f"/pedidos/{id_pedido}/status", {"status": status})
+
+
+class Terminal(threading.Thread):
+    def __init__(self, numero: int, loja, clientes: list, produtos: list, metricas: Metricas,
+                 fim: float, pensar_ms: float, semente: int):
+        super().__init__(name=f"terminal-{numero}", daemon=True)
+        self.loja = loja
+        self.clientes = clientes
+        self.produtos = produtos
+        self.metricas = metricas
+        self.fim = fim
+        self.pensar_ms = pensar_ms
+        self.rng = random.Random(semente + numero)
+        self.titular = f"carga-{numero}"
+        self.vendas = 0
+        self.erros = 0
+        self.excecoes = {} # tipo da exceção -> ocorrências
+
+    def _pensar(self):
+        if self.pensar_ms > 0:
+            time.sleep(self.rng.expovariate(1000.0 / self.pensar_ms))
+
+    def _medir(self, operacao: str, funcao, *args) -> tuple[bool, str]:
+        inicio = time.perf_counter()
+        success, resultado = funcao(*args)
+        self.metricas.registrar(operacao, time.perf_counter() - inicio)
+        if not success:
+            self.erros += 1
+        return success, resultado
+
+    def _vender(self):
+        inicio_venda = time.perf_counter()
+        itens = {}
+        for id_produto in self.rng.sample(self.produtos, self.rng.randint(1, min(4, len(self.produtos)))):
+            self._pensar()
+            quantidade = self.rng.randint(1, 3)
+            success, _ = self._medir("reservar (carrinho)", self.loja.reservar, self.titular, id_produto, quantidade)
+            if success:
+                itens[id_produto] = quantidade
+        if not itens:
+            return
+        success, id_pedido = self._medir("finalizar_venda", self.loja.finalizar_venda,
+                                         self.rng.choice(self.clientes), self.titular, itens)
+        if not success:
+            self.loja.liberar(self.titular)
+            return
+        concluida = True
+        for status in FLUXO_STATUS:
+            self._pensar()
+            success, _ = self._medir(f"atualizar_status_pedido ({status})", self.loja.atualizar_status, id_pedido, status)
+            concluida = concluida and success
+        if concluida:
+            self.vendas += 1
+            self.metricas.registrar("venda completa", time.perf_counter() - inicio_venda)
+
+    def run(self):
+        while time.monotonic() < self.fim:
+            try:
+                self._vender()
+            except Exception as e:
+                # Ex.: erro de HTTP; a venda é abandonada e o terminal segue para a próxima
+                tipo = type(e).__name__
+                self.excecoes[tipo] = self.excecoes.get(tipo, 0) + 1
+                with contextlib.suppress(Exception):
+                    self.loja.liberar(self.titular)
+
+
+def executar(terminais: int, duracao: float, pensar_ms: float, pedidos_base: int, servidor: bool, semente: int,
+             trava_global: bool = False):
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, "lanchonete_dados.json")
+        shutil.copyfile(caminho_dados(pedidos_base, semente), arquivo)
+        lanchonete = Lanchonete("Teste de Carga", arquivo_dados=arquivo)
+        produtos = [p.id_produto for p in lanchonete.cardapio.values() if p.disponivel][:50]
+        for id_produto in produtos:
+            lanchonete.cardapio[id_produto].estoque += 10_000_000 # O teste mede latência, não falta de estoque
+        clientes = list(lanchonete.clientes)[:1000]
+        loja_local = LojaLocal(lanchonete, trava_global)
+
+        metricas = Metricas()
+        metricas.TAMANHO_BUFFER = 1_000_000 # Guarda todas as amostras do teste
+
+        servidor_http = None
+        if servidor:
+            ManipuladorLoja.loja = loja_local
+            servidor_http = ThreadingHTTPServer(("127.0.0.1", 0), ManipuladorLoja)
+            threading.Thread(target=servidor_http.serve_forever, daemon=True).start()
+            host, porta = servidor_http.server_address[:2]
+
+        fim = time.monotonic() + duracao
+        grupo = []
+        for numero in range(terminais):
+            loja = LojaRemota(host, porta) if servidor else loja_local
+            grupo.append(Terminal(numero, loja, clientes, produtos, metricas, fim, pensar_ms, semente))
+        inicio = time.monotonic()
+        for terminal in grupo:
+            terminal.start()
+        for terminal in grupo:
+            terminal.join()
+        decorrido = time.monotonic() - inicio
+
+        if servidor_http:
+            servidor_http.shutdown()
+            servidor_http.server_close()
+        consistencia = lanchonete.verificar_consistencia(limite_exemplos=3)
+
+    vendas = sum(t.vendas for t in grupo)
+    erros = sum(t.erros for t in grupo)
+    excecoes = {}
+    for terminal in grupo:
+        for tipo, ocorrencias in terminal.excecoes.items():
+            excecoes[tipo] = excecoes.get(tipo, 0) + ocorrencias
+    resumo = metricas.resumo()
+    operacoes = sum(r["chamadas"] for r in resumo if r["operacao"] != "venda completa")
+    print(f"\nModo: {'servidor HTTP local' if servidor else 'em processo'} | terminais: {terminais} | "
+          f"pedidos de base: {pedidos_base} | reflexão média: {pensar_ms:.0f} ms | "
+          f"reservas: {'trava global' if trava_global else 'travas por produto'}")
+    print(f"Duração: {decorrido:.1f} s | vendas concluídas: {vendas} ({vendas / decorrido:.2f}/s) | "
+          f"operações: {operacoes} ({operacoes / decorrido:.1f}/s) | erros: {erros} | "
+          f"exceções: {sum(excecoes.values())}")
+    for tipo, ocorrencias in sorted(excecoes.items()):
+        print(f"  {tipo}: {ocorrencias}")
+    print(f"Consistência após o teste: {consistencia['total_anomalias']} anomalia(s)")
+    for grupo_anomalias in consistencia["anomalias"].values():
+        print(f"  {grupo_anomalias['descricao']}: {grupo_anomalias['quantidade']}")
+    print()
+    print(f"{'Operação':<38} {'Chamadas':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+    for r in sorted(resumo, key=lambda r: r["operacao"]):
+        print(f"{r['operacao']:<38} {r['chamadas']:>9} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}")
+    return {"vendas": vendas, "erros": erros, "excecoes": excecoes, "duracao": decorrido, "operacoes": resumo,
+            "anomalias": consistencia["total_anomalias"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga com vários terminais de PDV.")
+    parser.add_argument("--terminais", type=int, default=4)
+    parser.add_argument("--duracao", type=float, default=20.0, help="Segundos de teste.")
+    parser.add_argument("--pensar-ms", type=float, default=200.0,
+                        help="Tempo médio de reflexão do operador entre operações (0 = sem pausa).")
+    parser.add_argument("--pedidos-base", type=int, default=1000, help="Histórico de pedidos já existente na loja.")
+    parser.add_argument("--servidor", action="store_true", help="Passa pelas chamadas de um servidor HTTP local.")
+    parser.add_argument("--trava-global", action="store_true",
+                        help="Serializa também as reservas pela trava da loja (comparação com as travas por produto).")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+    executar(args.terminais, args.duracao, args.pensar_ms, args.pedidos_base, args.servidor, args.semente,
+             args.trava_global)
+
+
+if __name__ == "__main__":
+    main()
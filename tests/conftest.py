@@ -0,0 +1,34 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gerar_dados import gerar_arquivo  # noqa: E402
+from lanchonete import Lanchonete  # noqa: E402
+
+
+@pytest.fixture
+def arquivo_loja(tmp_path):
+    """Arquivo de dados sintético, sem feed (como os gravados antes da sincronização)."""
+    caminho = str(tmp_path / "loja.json")
+    gerar_arquivo(caminho, pedidos=40, produtos=10, clientes=8, semente=7)
+    return caminho
+
+
+@pytest.fixture
+def arquivo_vazio(tmp_path):
+    caminho = str(tmp_path / "central.json")
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({"cardapio": [], "clientes": [], "pedidos": [], "next_pedido_id": 0}, f)
+    return caminho
+
+
+@pytest.fixture
+def abrir():
+    """Abre uma instância da Lanchonete sobre um arquivo (carga completa, sem interface)."""
+    def _abrir(caminho: str, nome: str = "Teste") -> Lanchonete:
+        return Lanchonete(nome, arquivo_dados=caminho)
+    return _abrir
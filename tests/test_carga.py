@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from lanchonete import Lanchonete, ler_json_em_partes
+
+
+def _editar(caminho: str, alterar):
+    with open(caminho, encoding='utf-8') as f:
+        dados = json.load(f)
+    alterar(dados)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dados, f)
+
+
+def _fechados(dados: dict) -> list:
+    return [p for p in dados["pedidos"] if p["status"] in ("Entregue", "Cancelado")]
+
+
+def test_pedido_corrompido_do_historico_e_ignorado(arquivo_loja):
+    def corromper(dados):
+        fechados = _fechados(dados)
+        del fechados[0]["id_cliente"]
+        fechados[1]["transicoes"] = [[1]]
+        fechados[2]["id_pedido"] = 12
+    _editar(arquivo_loja, corromper)
+    with open(arquivo_loja, 'rb') as f:
+        original = f.read()
+
+    loja = Lanchonete("Teste", arquivo_dados=arquivo_loja, carregar=False)
+
+    assert loja.carregar_etapas() is None
+    assert len(loja.pedidos) == len(json.loads(original)["pedidos"]) - 3
+    assert not loja.carga_em_andamento
+    with open(arquivo_loja, 'rb') as f: # Os pedidos ignorados continuam no arquivo
+        assert f.read() == original
+
+
+def test_carga_interrompida_nao_grava_por_cima_do_arquivo(arquivo_loja, monkeypatch):
+    with open(arquivo_loja, 'rb') as f:
+        original = f.read()
+    montar = Lanchonete._pedidos_da_carga
+
+    def falhar_no_historico(registros, cardapio, ignorados=None, invalidos=None):
+        if isinstance(registros, list): # Lotes do histórico (os pedidos em aberto chegam num gerador)
+            raise OSError("disco falhou no meio da leitura")
+        return montar(registros, cardapio, ignorados, invalidos)
+    monkeypatch.setattr(Lanchonete, "_pedidos_da_carga", staticmethod(falhar_no_historico))
+
+    loja = Lanchonete("Teste", arquivo_dados=arquivo_loja, carregar=False)
+    erro = loja.carregar_etapas()
+
+    assert isinstance(erro, OSError)
+    assert not loja.carga_em_andamento
+    with open(arquivo_loja, 'rb') as f:
+        assert f.read() == original
+
+
+def test_leitura_em_partes_equivale_ao_json_load(arquivo_loja, abrir, tmp_path):
+    abrir(arquivo_loja) # Grava o feed: listas dentro de objetos no terceiro nível
+    with open(arquivo_loja, encoding='utf-8') as f:
+        assert ler_json_em_partes(arquivo_loja) == json.load(f)
+
+    caminho = tmp_path / "outro.json"
+    for texto in ('{}', ' {"a": [] , "b": {"c": {"d": [1, [2]]}}} ', '[{"x": [1, {"y": []}]}]'):
+        caminho.write_text(texto, encoding='utf-8')
+        assert ler_json_em_partes(str(caminho)) == json.loads(texto)
+    for texto in ('', '{"a": 1,}', '{"a" 1}', '{1: 2}', '{"a": [1 2]}', '{"a": [1,]}', '{"a": 1} x', '{"a": ['):
+        caminho.write_text(texto, encoding='utf-8')
+        with pytest.raises(json.JSONDecodeError):
+            ler_json_em_partes(str(caminho))
+
+
+def test_linhas_repetidas_somam_os_subtotais_gravados(arquivo_loja):
+    alterado = {}
+
+    def repetir_linha(dados):
+        pedido = next(p for p in dados["pedidos"] if p["itens"])
+        item = pedido["itens"][0]
+        # Duas linhas do mesmo produto, cobradas por um valor diferente do preço atual (ex.: promoção)
+        pedido["itens"] = [dict(item, quantidade=1, subtotal_centavos=111), dict(item, quantidade=2, subtotal_centavos=222)]
+        pedido["valor_total_centavos"] = 333
+        alterado["id_pedido"] = pedido["id_pedido"]
+    _editar(arquivo_loja, repetir_linha)
+
+    loja = Lanchonete("Teste", arquivo_dados=arquivo_loja, carregar=False)
+    assert loja.carregar_etapas() is None
+
+    pedido = loja.pedidos[alterado["id_pedido"]]
+    assert [(item.quantidade, item.subtotal_centavos) for item in pedido.itens] == [(3, 333)]
+    assert pedido.valor_total_centavos == 333
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from lanchonete import ConsultaPedidos
+
+
+def _consultas(loja) -> list:
+    """Consultas que cobrem os três índices, sozinhos e combinados."""
+    datas = sorted(p.data_hora_criacao for p in loja.pedidos.values())
+    meio, fim = datas[len(datas) // 2], datas[-1]
+    clientes = sorted(loja.clientes)[:3]
+    consultas = [loja.consulta().onde(status="Entregue"),
+                 loja.consulta().onde(status=("Pendente", "Cancelado")),
+                 loja.consulta().onde(inicio=meio),
+                 loja.consulta().onde(inicio=meio - timedelta(days=30), fim=fim, status="Entregue")]
+    for id_cliente in clientes:
+        consultas.append(loja.consulta().onde(id_cliente=id_cliente))
+        consultas.append(loja.consulta().onde(id_cliente=id_cliente, inicio=meio, status=("Entregue", "Pronto")))
+    return consultas
+
+
+def _resultado(consulta: ConsultaPedidos) -> tuple:
+    return (sorted(p.id_pedido for p in consulta.pedidos()), consulta.contar(), consulta.somar("valor_centavos"),
+            consulta.itens().somar("quantidade"))
+
+
+def _conferir_caminhos(loja):
+    for consulta in _consultas(loja):
+        esperado = _resultado(consulta.usando("varredura"))
+        assert _resultado(consulta) == esperado, consulta.filtros
+        caminhos = {"data": "inicio" in consulta.filtros or "fim" in consulta.filtros,
+                    "status": "status" in consulta.filtros, "cliente": "id_cliente" in consulta.filtros}
+        for caminho, disponivel in caminhos.items():
+            if disponivel:
+                assert _resultado(consulta.usando(caminho)) == esperado, (caminho, consulta.filtros)
+
+
+def _retencao_ate(loja, fracao: float) -> int:
+    """Dias de retenção que deixam de fora a fração mais antiga dos pedidos fechados."""
+    fechados = sorted(p.data_hora_criacao for p in loja.pedidos.values() if p.status in ("Entregue", "Cancelado"))
+    return (datetime.now().date() - fechados[int(len(fechados) * fracao)].date()).days
+
+
+def test_indices_concordam_com_a_varredura_depois_de_cada_alteracao(arquivo_loja, abrir):
+    loja = abrir(arquivo_loja)
+    _conferir_caminhos(loja)
+
+    id_cliente = sorted(loja.clientes)[0]
+    produto = next(p for p in loja.cardapio.values() if p.disponivel and p.estoque > 0)
+    _, _, pedido = loja.criar_pedido(id_cliente)
+    assert loja.adicionar_item_a_pedido(pedido.id_pedido, produto.id_produto, 1)[0]
+    _conferir_caminhos(loja)
+
+    assert loja.atualizar_status_pedido(pedido.id_pedido, "Pronto")[0]
+    _conferir_caminhos(loja)
+
+    _, _, cancelado = loja.criar_pedido(id_cliente)
+    assert loja.atualizar_status_pedido(cancelado.id_pedido, "Cancelado")[0]
+    _conferir_caminhos(loja)
+
+    total = len(loja.pedidos)
+    assert loja.compactar_historico(_retencao_ate(loja, 0.25))[0]
+    assert len(loja.pedidos) < total
+    _conferir_caminhos(loja)
+
+    total = len(loja.pedidos)
+    assert loja.arquivar_pedidos(_retencao_ate(loja, 0.5))[0]
+    assert len(loja.pedidos) < total
+    _conferir_caminhos(loja)
+
+
+def test_planejador_prefere_o_indice_mais_seletivo(arquivo_loja, abrir):
+    loja = abrir(arquivo_loja)
+    id_cliente = sorted(loja.clientes)[0]
+    caminho, lidos = loja.consulta().onde(id_cliente=id_cliente, status="Entregue").plano()
+
+    assert caminho == "cliente"
+    assert lidos == loja.consulta().onde(id_cliente=id_cliente).usando("varredura").contar()
+    assert loja.consulta().plano() == ("varredura", len(loja.pedidos))
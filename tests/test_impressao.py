@@ -0,0 +1,60 @@
+import pytest
+
+from lanchonete import DocumentoImpressao, SaidaArquivoTexto, SaidaImpressao, SaidaMemoria, SpoolerImpressao
+
+
+def ticket(id_pedido: str) -> DocumentoImpressao:
+    return DocumentoImpressao("cozinha", id_pedido, {
+        "cliente": "Ana", "hora": "12:00", "prioritario": False, "estacoes": [("Chapa", [("X-Burguer", 2)])],
+    })
+
+
+@pytest.fixture
+def spooler():
+    spooler = SpoolerImpressao()
+    spooler.ESPERA_INICIAL_S = 0.05
+    yield spooler
+    spooler.parar(timeout=5)
+
+
+def test_saida_impressao_e_abstrata():
+    with pytest.raises(TypeError):
+        SaidaImpressao()
+
+
+def test_falha_passageira_e_repetida(spooler):
+    instavel, estavel = SaidaMemoria(falhas=2), SaidaMemoria()
+
+    spooler.enfileirar(ticket("PED1"), instavel)
+    spooler.enfileirar(ticket("PED2"), estavel)
+
+    assert spooler.aguardar(timeout=5)
+    assert len(instavel.documentos) == 1 and "COZINHA PED1" in instavel.documentos[0]
+    assert len(estavel.documentos) == 1
+    assert spooler.impressos == 2
+    assert list(spooler.erros) == []
+
+
+def test_falha_definitiva_vai_para_erros(spooler):
+    quebrada = SaidaMemoria(falhas=SpoolerImpressao.TENTATIVAS)
+
+    spooler.enfileirar(ticket("PED1"), quebrada)
+
+    assert spooler.aguardar(timeout=5)
+    assert quebrada.documentos == []
+    assert spooler.impressos == 0
+    assert list(spooler.erros) == [("PED1", "cozinha", "Falha simulada da impressora.")]
+    assert spooler.versao_erros == 1
+
+
+def test_parar_imprime_toda_a_fila(tmp_path):
+    caminho = tmp_path / "cozinha.txt"
+    spooler = SpoolerImpressao()
+    saida = SaidaArquivoTexto(str(caminho))
+    for numero in range(20):
+        spooler.enfileirar(ticket(f"PED{numero}"), saida)
+
+    assert spooler.parar(timeout=5)
+    assert spooler.pendentes() == 0
+    texto = caminho.read_text(encoding="utf-8")
+    assert [f"COZINHA PED{numero}" in texto for numero in range(20)] == [True] * 20
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from lanchonete import STATUS_VALIDOS, PainelVendas
+
+
+def _entregue(loja, dias_atras: int):
+    """Pedido com itens entregue há alguns dias (o painel o conta no minuto e no dia da entrega)."""
+    _, _, pedido = loja.criar_pedido(next(iter(loja.clientes)))
+    produto = next(p for p in loja.cardapio.values() if p.estoque > 0)
+    assert loja.adicionar_item_a_pedido(pedido.id_pedido, produto.id_produto, 1)[0]
+    assert loja.atualizar_status_pedido(pedido.id_pedido, "Entregue")[0]
+    pedido.data_hora_criacao -= timedelta(days=dias_atras)
+    loja.painel = PainelVendas()
+    loja.painel.semear(loja.pedidos.values())
+    return pedido
+
+
+def test_cancelar_entrega_de_ontem_nao_mexe_no_dia_de_hoje(arquivo_loja, abrir):
+    loja = abrir(arquivo_loja)
+    pedido = _entregue(loja, 1)
+    antes = loja.painel.resumo()
+
+    assert loja.atualizar_status_pedido(pedido.id_pedido, "Cancelado")[0]
+
+    depois = loja.painel.resumo()
+    for chave in ("entregues_hoje", "receita_hoje_centavos", "ticket_medio_centavos", "receita_ultima_hora_centavos"):
+        assert depois[chave] == antes[chave]
+
+
+def test_cancelar_entrega_recente_desconta_do_painel(arquivo_loja, abrir):
+    loja = abrir(arquivo_loja)
+    pedido = _entregue(loja, 0)
+    antes = loja.painel.resumo()
+    assert pedido.transicoes[-1][0] == STATUS_VALIDOS.index("Entregue")
+
+    assert loja.atualizar_status_pedido(pedido.id_pedido, "Cancelado")[0]
+
+    depois = loja.painel.resumo()
+    assert depois["entregues_hoje"] == antes["entregues_hoje"] - 1
+    assert depois["receita_hoje_centavos"] == antes["receita_hoje_centavos"] - pedido.valor_total_centavos
+    assert depois["receita_ultima_hora_centavos"] == antes["receita_ultima_hora_centavos"] - pedido.valor_total_centavos
+    assert min(depois["entregues_hoje"], depois["receita_hoje_centavos"]) >= 0
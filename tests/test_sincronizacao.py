@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from lanchonete import ErroTransacao, Lanchonete
+from sincronizar import sincronizar
+
+
+def test_sincronizacao_completa(arquivo_loja, arquivo_vazio, abrir):
+    loja, central = abrir(arquivo_loja, "Loja"), abrir(arquivo_vazio, "Central")
+
+    success, _ = sincronizar(loja, central)
+
+    assert success
+    assert set(central.cardapio) == set(loja.cardapio)
+    assert set(central.clientes) == set(loja.clientes)
+    assert set(central.pedidos) == set(loja.pedidos)
+    pedido = next(iter(loja.pedidos.values()))
+    assert central.pedidos[pedido.id_pedido].to_dict() == pedido.to_dict()
+    assert central.versoes_origem == {loja.feed.id_origem: loja.feed.versao}
+
+
+def test_sincronizar_de_novo_nao_muda_nada(arquivo_loja, arquivo_vazio, abrir):
+    sincronizar(abrir(arquivo_loja, "Loja"), abrir(arquivo_vazio, "Central"))
+    with open(arquivo_vazio, encoding='utf-8') as f:
+        gravado = f.read()
+
+    # Outra execução do script: as duas instâncias são reabertas a partir dos arquivos
+    loja, central = abrir(arquivo_loja, "Loja"), abrir(arquivo_vazio, "Central")
+    assert loja.exportar_alteracoes(central.versoes_origem[loja.feed.id_origem])["alteracoes"] == []
+    success, message = sincronizar(loja, central)
+
+    assert success
+    assert "nada a fazer" in message
+    assert len(central.versoes_origem) == 1
+    with open(arquivo_vazio, encoding='utf-8') as f:
+        assert f.read() == gravado
+
+
+def test_arquivo_sem_feed_grava_o_feed_na_primeira_carga(arquivo_loja, abrir):
+    with open(arquivo_loja, encoding='utf-8') as f:
+        assert "feed" not in json.load(f)
+
+    primeira = abrir(arquivo_loja)
+    with open(arquivo_loja, encoding='utf-8') as f:
+        feed = json.load(f)["feed"]
+
+    assert feed["id_origem"] == primeira.feed.id_origem
+    assert abrir(arquivo_loja).feed.id_origem == primeira.feed.id_origem
+    assert primeira.feed.versao == len(primeira.cardapio) + len(primeira.clientes) + len(primeira.pedidos)
+
+
+def test_alteracoes_nos_dois_sentidos(arquivo_loja, arquivo_vazio, abrir):
+    loja, central = abrir(arquivo_loja, "Loja"), abrir(arquivo_vazio, "Central")
+    sincronizar(loja, central)
+
+    produto = next(iter(loja.cardapio.values()))
+    assert loja.atualizar_produto_info(produto.id_produto, preco_centavos=produto.preco_centavos + 100)[0]
+    id_cliente = next(iter(central.clientes))
+    _, _, pedido = central.criar_pedido(id_cliente)
+
+    assert sincronizar(loja, central)[0]
+    assert sincronizar(central, loja)[0]
+
+    assert central.cardapio[produto.id_produto].preco_centavos == produto.preco_centavos
+    assert loja.pedidos[pedido.id_pedido].id_cliente == id_cliente
+    # O que veio de um lado não volta para ele na próxima rodada
+    assert loja.exportar_alteracoes(central.versoes_origem[loja.feed.id_origem],
+                                    excluir_origem=central.feed.id_origem)["alteracoes"] == []
+    assert central.exportar_alteracoes(loja.versoes_origem[central.feed.id_origem],
+                                       excluir_origem=loja.feed.id_origem)["alteracoes"] == []
+
+
+def test_transacao_desfeita_nao_entra_no_feed(arquivo_loja, abrir):
+    loja = abrir(arquivo_loja)
+    versao = loja.feed.versao
+
+    with pytest.raises(ErroTransacao):
+        with loja.transacao():
+            _, _, pedido = loja.criar_pedido(next(iter(loja.clientes)))
+            raise ErroTransacao("desistência")
+
+    assert pedido.id_pedido not in loja.pedidos
+    assert loja.feed.versao == versao
+    assert loja.exportar_alteracoes(versao)["alteracoes"] == []
+
+
+def test_pedido_criado_durante_a_carga_fica_no_feed(arquivo_loja, abrir):
+    loja = Lanchonete("Loja", arquivo_dados=arquivo_loja, carregar=False)
+    etapas = loja.etapas_carga()
+    for etapa, conteudo in etapas:
+        loja.aplicar_etapa_carga(etapa, conteudo)
+        if etapa == "pedidos_abertos": # A interface já aceita vendas a partir daqui
+            break
+    _, _, pedido = loja.criar_pedido(next(iter(loja.clientes)))
+    assert not loja.compactar_historico(0)[0]
+    for etapa, conteudo in etapas:
+        loja.aplicar_etapa_carga(etapa, conteudo)
+
+    exportados = {a["id"] for a in loja.exportar_alteracoes(0)["alteracoes"] if a["tipo"] == "pedido"}
+    assert exportados == set(loja.pedidos)
+    assert pedido.id_pedido in exportados
+    assert abrir(arquivo_loja).feed.id_origem == loja.feed.id_origem
@@ -0,0 +1,87 @@
+import pytest
+
+from lanchonete import ErroTransacao
+
+
+def _foto(loja) -> dict:
+    """Tudo o que uma transação desfeita precisa devolver ao estado anterior."""
+    return {
+        "pedidos": {id_pedido: pedido.to_dict() for id_pedido, pedido in loja.pedidos.items()},
+        "estoque": {id_produto: produto.estoque for id_produto, produto in loja.cardapio.items()},
+        "reservas": loja.reservas.titulares(),
+        "feed": (loja.feed.versao, loja.exportar_alteracoes(0)["alteracoes"]),
+        "painel": loja.painel.resumo(),
+    }
+
+
+def _novo_pedido_com_item(loja):
+    _, _, pedido = loja.criar_pedido(next(iter(loja.clientes)))
+    produto = next(p for p in loja.cardapio.values() if p.disponivel and p.estoque > 0)
+    assert loja.adicionar_item_a_pedido(pedido.id_pedido, produto.id_produto, 1)[0]
+    return pedido
+
+
+def _abrir_com_pedidos_em_aberto(abrir, arquivo: str):
+    loja = abrir(arquivo)
+    return loja, _novo_pedido_com_item(loja), _novo_pedido_com_item(loja)
+
+
+def _alterar_tudo(loja, entregar, cancelar):
+    """Cria um pedido com item, entrega um pedido em aberto (baixa de estoque) e cancela outro (libera reservas)."""
+    novo = _novo_pedido_com_item(loja)
+    assert loja.atualizar_status_pedido(entregar.id_pedido, "Entregue")[0]
+    assert loja.atualizar_status_pedido(cancelar.id_pedido, "Cancelado")[0]
+    return novo
+
+
+def test_transacao_desfeita_restaura_pedidos_estoque_reservas_e_feed(arquivo_loja, abrir):
+    loja, entregar, cancelar = _abrir_com_pedidos_em_aberto(abrir, arquivo_loja)
+    antes = _foto(loja)
+
+    with pytest.raises(ErroTransacao):
+        with loja.transacao():
+            novo = _alterar_tudo(loja, entregar, cancelar)
+            raise ErroTransacao("desistência")
+
+    assert novo.id_pedido not in loja.pedidos
+    assert _foto(loja) == antes
+
+
+def test_transacao_aninhada_desfaz_so_o_proprio_trecho(arquivo_loja, abrir):
+    loja, entregar, cancelar = _abrir_com_pedidos_em_aberto(abrir, arquivo_loja)
+    versao = loja.feed.versao
+    id_cliente = next(iter(loja.clientes))
+
+    with loja.transacao():
+        _, _, mantido = loja.criar_pedido(id_cliente)
+        antes = _foto(loja)
+        with pytest.raises(ErroTransacao):
+            with loja.transacao():
+                desfeito = _alterar_tudo(loja, entregar, cancelar)
+                raise ErroTransacao("ponto de salvamento")
+        assert _foto(loja) == antes
+
+    assert mantido.id_pedido in loja.pedidos
+    assert desfeito.id_pedido not in loja.pedidos
+    exportados = {a["id"] for a in loja.exportar_alteracoes(versao)["alteracoes"]}
+    assert exportados == {mantido.id_pedido}
+
+
+def test_falha_na_gravacao_exigida_desfaz_tudo(arquivo_loja, abrir, monkeypatch):
+    loja, entregar, cancelar = _abrir_com_pedidos_em_aberto(abrir, arquivo_loja)
+    antes = _foto(loja)
+    with open(arquivo_loja, 'rb') as f:
+        gravado = f.read()
+
+    def falhar():
+        raise OSError("disco cheio")
+    monkeypatch.setattr(loja, "_gravar_dados", falhar)
+
+    with pytest.raises(OSError):
+        with loja.transacao(exigir_gravacao=True):
+            novo = _alterar_tudo(loja, entregar, cancelar)
+
+    assert novo.id_pedido not in loja.pedidos
+    assert _foto(loja) == antes
+    with open(arquivo_loja, 'rb') as f:
+        assert f.read() == gravado
@@ -0,0 +1,40 @@
+"""Verificação de consistência de um arquivo de dados da Lanchonete, sem abrir a interface.
+
+Confere totais dos pedidos contra os itens, referências a clientes e produtos e as
+invariantes de estoque e reservas. Sai com código 1 se encontrar alguma anomalia e com
+código 3 se o arquivo não puder ser carregado (não encontrado ou corrompido).
+
+Exemplos:
+    python verificar_dados.py lanchonete_dados.json
+    python verificar_dados.py lanchonete_dados.json --exemplos 50 --json relatorio.json
+"""
+import argparse
+import json
+import sys
+
+from lanchonete import Lanchonete
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica a consistência dos dados da Lanchonete.")
+    parser.add_argument("arquivo", help="Arquivo de dados (ex.: lanchonete_dados.json).")
+    parser.add_argument("--exemplos", type=int, default=10, help="Exemplos listados por tipo de anomalia.")
+    parser.add_argument("--json", help="Grava o relatório completo neste arquivo JSON.")
+    args = parser.parse_args()
+
+    loja = Lanchonete.abrir_sem_interface("Verificação", args.arquivo)
+    relatorio = loja.verificar_consistencia(args.exemplos)
+    print(f"{relatorio['pedidos']} pedidos e {relatorio['produtos']} produtos verificados em "
+          f"{relatorio['duracao_s']:.2f} s: {relatorio['total_anomalias']} anomalia(s).")
+    for grupo in relatorio["anomalias"].values():
+        print(f"\n{grupo['descricao']}: {grupo['quantidade']}")
+        for exemplo in grupo["exemplos"]:
+            print(f"  {exemplo}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    sys.exit(1 if relatorio["total_anomalias"] else 0)
+
+
+if __name__ == "__main__":
+    main()